@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ActivitiesConfig(AppConfig):
     name = 'activities'
+
+    def ready(self):
+        # Timesheets deleted by a cascade or a queryset delete skip Timesheet.delete(), keep the rollups current
+        from .models import connect_rollup_signals
+        connect_rollup_signals()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from activities.models import Task, Timesheet
+from core.fragments import touch
+from projects.models import ProjectBudget
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the reported / billed hour rollups of all tasks and project budgets from their timesheets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only verify the rollups, do not write them')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['reported_hours', 'billed_hours']
+
+        stale = {}
+        checked = 0
+        for model, group_by in ((Task, 'task'), (ProjectBudget, 'budget')):
+            # One grouped query for the real totals of every row
+            sums = Timesheet.rollup_values(Timesheet.objects.filter(**{f'{group_by}__isnull': False}), group_by)
+            stale[model] = []
+            for row in model.objects.only('id', *fields).order_by().iterator(chunk_size=batch_size):
+                checked += 1
+                expected = sums.get(row.id, (0, 0))
+                if (row.reported_hours, row.billed_hours) != expected:
+                    row.reported_hours, row.billed_hours = expected
+                    stale[model].append(row)
+
+        stale_count = sum(len(rows) for rows in stale.values())
+        if options['check']:
+            if stale_count:
+                raise CommandError(f'{stale_count} of {checked} timesheet rollups are stale')
+            self.stdout.write(self.style.SUCCESS(f'All {checked} timesheet rollups are up to date'))
+            return
+
+        with transaction.atomic():
+            for model, rows in stale.items():
+                model.objects.bulk_update(rows, fields, batch_size=batch_size)
+                touch(model, [row.pk for row in rows])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {stale_count} of {checked} timesheet rollups'))
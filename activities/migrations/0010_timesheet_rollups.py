@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 08:42
+
+from django.db import migrations, models
+from django.db.models import Sum, Q
+
+
+def populate_rollups(apps, schema_editor):
+    Task = apps.get_model('activities', 'Task')
+    Timesheet = apps.get_model('activities', 'Timesheet')
+    sums = {
+        task: (reported or 0, billed or 0)
+        for task, reported, billed in Timesheet.objects.order_by().values('task')
+        .annotate(reported=Sum('hours'), billed=Sum('hours', filter=Q(is_billed=True)))
+        .values_list('task', 'reported', 'billed')
+    }
+    tasks = []
+    for task in Task.objects.filter(pk__in=sums):
+        task.reported_hours, task.billed_hours = sums[task.pk]
+        tasks.append(task)
+    Task.objects.bulk_update(tasks, ['reported_hours', 'billed_hours'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0009_alter_timesheet_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='billed_hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='reported_hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+def unpin_duplicates(apps, schema_editor):
+    """Keep the newest pinned note of every owner, the tagging views used to allow several"""
+    Note = apps.get_model('activities', 'Note')
+    seen = set()
+    unpin = []
+    pinned = Note.objects.filter(tagged=True).order_by('-created_at', '-pk')
+    for pk, content_type_id, object_id in pinned.values_list('pk', 'content_type_id', 'object_id').iterator():
+        if (content_type_id, object_id) in seen:
+            unpin.append(pk)
+        seen.add((content_type_id, object_id))
+    for start in range(0, len(unpin), 500):
+        Note.objects.filter(pk__in=unpin[start:start + 500]).update(tagged=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0010_timesheet_rollups'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(unpin_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='note',
+            constraint=models.UniqueConstraint(condition=models.Q(('tagged', True)), fields=('content_type', 'object_id'), name='unique_tagged_note'),
+        ),
+    ]
@@ -1,8 +1,14 @@
-from django.db import models
+import threading
+
+from django.db import models, transaction
+from django.db.models import Case, Q, Sum, Value, When
+from django.db.models.signals import post_delete
 from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+from core.fragments import touch_parents
+
 
 class Note(models.Model):
 
@@ -23,6 +29,12 @@ class Note(models.Model):
         indexes = [
             models.Index(fields = ['content_type', 'object_id']),
         ]
+        constraints = [
+            # One pinned note per owner, the partial index also serves the pinned note lookup
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id'], condition=Q(tagged=True), name='unique_tagged_note',
+            ),
+        ]
         verbose_name = "הערה"
         verbose_name_plural = 'הערות'
         ordering = ['-created_at']
@@ -42,6 +54,10 @@ class Task(models.Model):
     urgency = models.CharField(max_length=30, choices=URGENCIES, default='low')
     is_completed = models.BooleanField(default=False)
 
+    # Timesheet rollups, maintained by Timesheet.save() and the timesheet post_delete receiver
+    reported_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    billed_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveBigIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
@@ -62,13 +78,11 @@ class Task(models.Model):
     
     @property
     def reported_timesheet(self):
-        timesheets = sum( [x.hours for x in self.timesheets.all()])
-        return timesheets
+        return self.reported_hours
 
     @property
     def billed_timesheet(self):
-        timesheets = sum( [x.hours for x in self.timesheets.all() if x.is_billed])
-        return timesheets
+        return self.billed_hours
 
 
 class Service(models.Model):
@@ -118,13 +132,81 @@ class Timesheet(models.Model):
         verbose_name_plural = 'דיווחי שעות'
         ordering = ['-created_at']
 
-
-
-
-
-
-
-
-
-
-
+    @staticmethod
+    def rollup_values(timesheets, group_by):
+        """{group id: (reported, billed)} hour sums of the timesheets, in one grouped query"""
+        rows = (
+            timesheets.order_by().values(group_by)
+            .annotate(reported=Sum('hours'), billed=Sum('hours', filter=Q(is_billed=True)))
+            .values_list(group_by, 'reported', 'billed')
+        )
+        return {group: (reported or 0, billed or 0) for group, reported, billed in rows}
+
+    @staticmethod
+    def update_rollups(task_ids=(), budget_ids=()):
+        """
+        Recalculate the stored reported / billed hours of the given tasks and budgets, touching them and
+        their parents so their cached fragments are rendered anew
+        """
+        from projects.models import ProjectBudget
+
+        for model, field, ids in ((Task, 'task', task_ids), (ProjectBudget, 'budget', budget_ids)):
+            ids = {pk for pk in ids if pk is not None}
+            if not ids:
+                continue
+            sums = Timesheet.rollup_values(Timesheet.objects.filter(**{f'{field}__in': ids}), field)
+            # One UPDATE for all the rows, the ones without timesheets left are reset to 0
+            hours = model._meta.get_field('reported_hours')
+            model.objects.filter(pk__in=ids).update(
+                reported_hours=Case(*(When(pk=pk, then=Value(reported)) for pk, (reported, _) in sums.items()),
+                                    default=Value(0), output_field=hours),
+                billed_hours=Case(*(When(pk=pk, then=Value(billed)) for pk, (_, billed) in sums.items()),
+                                  default=Value(0), output_field=hours),
+                updated_at=timezone.now(),
+            )
+            touch_parents(model, ids)
+
+    def save(self, *args, update_rollups=True, **kwargs):
+        previous = None
+        if update_rollups and self.pk:
+            # The timesheet may move to another task or budget, both sides need their totals updated
+            previous = Timesheet.objects.filter(pk=self.pk).values('task_id', 'budget_id').first()
+        super().save(*args, **kwargs)
+        if update_rollups:
+            task_ids, budget_ids = {self.task_id}, {self.budget_id}
+            if previous:
+                task_ids.add(previous['task_id'])
+                budget_ids.add(previous['budget_id'])
+            Timesheet.update_rollups(task_ids, budget_ids)
+
+
+# Task / budget ids whose timesheets were deleted, recalculated once the deleting transaction commits
+_deleted_rollups = threading.local()
+
+
+def _queue_deleted_rollups(sender, instance, **kwargs):
+    """
+    Deleted timesheets update their rollups through post_delete rather than Timesheet.delete(), which
+    cascades (a task, project or customer delete) and queryset deletes skip. A cascade deletes many
+    timesheets, so their task and budget ids are collected and recalculated once, on commit.
+    """
+    if not hasattr(_deleted_rollups, 'ids'):
+        _deleted_rollups.ids = (set(), set())
+    task_ids, budget_ids = _deleted_rollups.ids
+    task_ids.add(instance.task_id)
+    budget_ids.add(instance.budget_id)
+    # Every delete queues the flush, the first to run recalculates everything collected so far. Ids left
+    # by a rolled back transaction are recalculated by the next flush, which is harmless
+    transaction.on_commit(_flush_deleted_rollups)
+
+
+def _flush_deleted_rollups():
+    ids = getattr(_deleted_rollups, 'ids', None)
+    if ids is None:
+        return
+    del _deleted_rollups.ids
+    Timesheet.update_rollups(*ids)
+
+
+def connect_rollup_signals():
+    post_delete.connect(_queue_deleted_rollups, sender=Timesheet, dispatch_uid='timesheet-rollups-delete')
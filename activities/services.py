@@ -0,0 +1,83 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from contacts.models import Contact
+from customers.models import Customer
+from leads.models import Lead
+from projects.models import Project
+from quotes.models import Quote
+from .models import Note
+
+# Models whose detail page has a notes tab: model name -> (model, owner name, "this owner"), the names
+# fill the Hebrew texts of the notes partial
+NOTE_OWNERS = {
+    model._meta.model_name: (model, name, this)
+    for model, name, this in (
+        (Lead, 'הליד', 'הליד הזה'),
+        (Customer, 'הלקוח', 'הלקוח הזה'),
+        (Contact, 'איש הקשר', 'איש קשר זה'),
+        (Project, 'הפרויקט', 'הפרויקט הזה'),
+        (Quote, 'הצעת המחיר', 'הצעת מחיר זו'),
+    )
+}
+
+
+def pinned_note(owner):
+    """The owner's pinned (tagged) note or None, a single seek on the unique_tagged_note partial index"""
+    content_type = ContentType.objects.get_for_model(owner)
+    # At most one row matches, unordered so the index alone answers it without a sort
+    notes = Note.objects.filter(content_type=content_type, object_id=owner.pk, tagged=True).order_by()[:1]
+    return notes[0] if notes else None
+
+
+def toggle_note_tag(note_id):
+    """
+    Pin a note on its owner, or unpin it when it is already pinned. An owner has a single pinned
+    note (the unique_tagged_note constraint), so pinning unpins the owner's previous note, scoped to
+    the note's own content type. The toggle is a conditional UPDATE on the state read, so two
+    concurrent toggles of the same note don't undo each other. Returns the note's (content type id,
+    object id), None when there is no such note.
+    """
+    note = Note.objects.filter(pk=note_id).values('content_type_id', 'object_id', 'tagged').first()
+    if note is None:
+        return None
+    try:
+        _set_tag(note_id, note)
+    except IntegrityError:
+        # Another note of the owner was pinned concurrently, pin over it
+        _set_tag(note_id, note)
+    return note['content_type_id'], note['object_id']
+
+
+def _set_tag(note_id, note):
+    now = timezone.now()
+    with transaction.atomic():
+        if not note['tagged']:
+            # Unique indexes are checked row by row and a partial one can't be deferred, so the previous
+            # pin is cleared by its own statement rather than in the UPDATE that pins the note
+            Note.objects.filter(
+                content_type_id=note['content_type_id'], object_id=note['object_id'], tagged=True,
+            ).exclude(pk=note_id).update(tagged=False, updated_at=now)
+        Note.objects.filter(pk=note_id, tagged=note['tagged']).update(tagged=not note['tagged'], updated_at=now)
+
+
+def note_summary(owner):
+    """The pinned and the first note of an owner, shown in the detail page header whichever tab is open"""
+    return {
+        'tagged_note': pinned_note(owner),
+        'first_note': owner.notes.first(),
+    }
+
+
+def notes_context(owner):
+    """Context of the base/notes.html partial, rendered in the notes tab and by the notes endpoint"""
+    model_name = owner._meta.model_name
+    _, name, this = NOTE_OWNERS[model_name]
+    return {
+        'notes': owner.notes.all(),
+        'tagged_note': pinned_note(owner),
+        'notes_url': reverse('notes', args=(model_name, owner.pk)),
+        'notes_owner': {'name': name, 'this': this},
+    }
@@ -1,3 +1,103 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from customers.models import Customer
+from projects.models import Project, ProjectBudget
+from .models import Task, Timesheet
+
+
+class TimesheetRollupTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Acme', legal_id='1')
+        self.project = Project.objects.create(name='Website', customer=self.customer)
+        self.budget = ProjectBudget.objects.create(name='Design', qty=10, price=100, project=self.project)
+        self.other_budget = ProjectBudget.objects.create(name='Build', qty=10, price=100, project=self.project)
+        self.task = Task.objects.create(
+            title='Mockups', content_type=ContentType.objects.get_for_model(Project), object_id=self.project.pk,
+        )
+
+    def timesheet(self, hours, is_billed=False, budget=None):
+        return Timesheet.objects.create(
+            hours=hours, is_billed=is_billed, description='Work', task=self.task, budget=budget or self.budget,
+        )
+
+    def assertRollups(self, obj, reported, billed):
+        obj.refresh_from_db()
+        self.assertEqual((obj.reported_hours, obj.billed_hours), (Decimal(reported), Decimal(billed)))
+
+    def test_saving_updates_the_task_and_budget(self):
+        self.timesheet('2.5')
+        self.timesheet('1.5', is_billed=True)
+
+        self.assertRollups(self.task, '4', '1.5')
+        self.assertRollups(self.budget, '4', '1.5')
+
+    def test_moving_to_another_budget_updates_both(self):
+        timesheet = self.timesheet('3', is_billed=True)
+
+        timesheet.budget = self.other_budget
+        timesheet.save()
+
+        self.assertRollups(self.budget, '0', '0')
+        self.assertRollups(self.other_budget, '3', '3')
+
+    def test_deleting_updates_the_task_and_budget(self):
+        kept = self.timesheet('2')
+        deleted = self.timesheet('1', is_billed=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+
+        self.assertRollups(self.task, '2', '0')
+        self.assertRollups(self.budget, '2', '0')
+        self.assertTrue(Timesheet.objects.filter(pk=kept.pk).exists())
+
+    def test_queryset_delete_updates_the_budgets(self):
+        self.timesheet('2')
+        self.timesheet('1', budget=self.other_budget)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Timesheet.objects.filter(budget=self.budget).delete()
+
+        self.assertRollups(self.budget, '0', '0')
+        self.assertRollups(self.other_budget, '1', '0')
+        self.assertRollups(self.task, '1', '0')
+
+    def test_deleting_the_task_resets_the_budgets(self):
+        self.timesheet('2', is_billed=True)
+        self.timesheet('1', budget=self.other_budget)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.delete()
+
+        self.assertRollups(self.budget, '0', '0')
+        self.assertRollups(self.other_budget, '0', '0')
+
+
+class TaskListTests(TestCase):
+
+    def add_tasks(self, count):
+        """Tasks of projects of different customers, the rows show both"""
+        project_type = ContentType.objects.get_for_model(Project)
+        for n in range(count):
+            customer = Customer.objects.create(name=f'Customer {n}', legal_id=str(n))
+            project = Project.objects.create(name=f'Project {n}', customer=customer)
+            Task.objects.create(title=f'Task {n}', content_type=project_type, object_id=project.pk)
+
+    def queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/tasks/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_the_page(self):
+        self.add_tasks(2)
+        few = self.queries()
+        self.add_tasks(10)
 
-# Create your tests here.
+        self.assertEqual(self.queries(), few)
@@ -8,5 +8,7 @@ urlpatterns = [
     path('api/tasks/delete/<pk>', views.task_delete, name='task-delete'),
     path('api/timesheets/createudpate/<pk>', views.timesheet_create_update, name= 'timesheet-create-update'),
     path('api/timesheets/delete/<pk>', views.timesheet_delete, name= 'timesheet-delete'),
+    path('timesheets/export/', views.timesheet_export, name='timesheet-export'),
     path('api/tasks/masscomplete/', views.task_mass_complete, name='task-mass-complete'),
+    path('notes/<str:model>/<int:object_id>/', views.notes, name='notes'),
 ]
\ No newline at end of file
@@ -1,9 +1,18 @@
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from urllib.parse import urlencode
-from django.http import JsonResponse
-from .models import Service, Task, Timesheet
+from django.http import Http404, JsonResponse
+from .models import Note, Service, Task, Timesheet
+from .services import NOTE_OWNERS, notes_context, toggle_note_tag
 from projects.models import Project, ProjectBudget
+from customers.models import Customer
+from leads.models import Lead
+from quotes.models import Quote
+from core.bulk import bulk_update, BulkActionError
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response, full_name, generic_label
+from core.generic import generic_prefetch
+from django.db.models import F
 
 
 def get_service_info(request, pk):
@@ -18,6 +27,29 @@ def get_service_info(request, pk):
     return JsonResponse(info)
 
 
+def notes(request, model, object_id):
+    """
+    The notes tab of any detail page (see NOTE_OWNERS). Posting a note, or the id of a note to pin or
+    delete, returns the updated partial alone, which replaces the tab in place (x-target="notes").
+    """
+    if model not in NOTE_OWNERS:
+        raise Http404
+    owner_model = NOTE_OWNERS[model][0]
+    try:
+        owner = owner_model.objects.get(pk=object_id)
+    except owner_model.DoesNotExist:
+        raise Http404
+    if request.method == 'POST':
+        text = request.POST.get('note', '').strip()
+        if text:
+            Note.objects.create(text=text[:Note._meta.get_field('text').max_length], content_object=owner)
+        elif request.POST.get('delete', '').isdigit():
+            owner.notes.filter(pk=request.POST['delete']).delete()
+        elif request.POST.get('tag', '').isdigit() and owner.notes.filter(pk=request.POST['tag']).exists():
+            toggle_note_tag(request.POST['tag'])
+    return render(request, 'base/notes.html', notes_context(owner))
+
+
 def task_create_update(request, pk):
     taskTitle = request.POST['taskTitle']
     taskDescription = request.POST['taskDescription']
@@ -109,19 +141,85 @@ def timesheet_delete(request, pk):
         return redirect(url)
 
 
+TASK_LIST = ListSpec(
+    sort_fields=['title', 'is_completed', 'urgency'],
+    search_fields=['title', 'description'],
+    filters={'is_completed': 'is_completed', 'urgency': 'urgency'},
+)
+
+TASK_EXPORT = ExportSpec(
+    columns=[
+        ('מזהה', 'id'),
+        ('משימה', 'title'),
+        ('תיאור', 'description'),
+        ('דחיפות', 'urgency'),
+        ('הושלמה', 'is_completed'),
+        ('שייכת ל', 'related_name'),
+        ('שעות מדווחות', 'reported_hours'),
+        ('שעות שחויבו', 'billed_hours'),
+        ('תאריך יצירה', 'created_at'),
+    ],
+    choices={'urgency': Task.URGENCIES},
+)
+
 def task_list(request):
-    tasks = Task.objects.all()
+    # The rows show the project of every task and the project's customer
+    tasks = Task.objects.prefetch_related(generic_prefetch('content_object', {Project: ['customer']}))
+    page = paginate_list(request, tasks, TASK_LIST)
+    if is_rows_request(request):
+        return rows_response(request, 'projects/partials/task_rows.html', 'tasks', page)
+
     context = {
-        'tasks': tasks,
+        'tasks': page.rows,
+        'page': page,
     }
     return render(request, 'projects/task-list.html', context)
 
 
+def task_export(request):
+    tasks = Task.objects.annotate(related_name=generic_label({
+        Project: F('name'),
+        Quote: F('name'),
+        Customer: F('name'),
+        Lead: full_name(),
+    }))
+    return export_response(request, tasks, TASK_LIST, TASK_EXPORT, 'tasks')
+
+
+TIMESHEET_LIST = ListSpec(
+    sort_fields=['date', 'hours', 'is_billed'],
+    search_fields=['description', 'task__title'],
+    filters={
+        'project': 'budget__project_id',
+        'budget': 'budget_id',
+        'task': 'task_id',
+        'is_billed': 'is_billed',
+        'date_from': 'date__gte',
+        'date_to': 'date__lte',
+    },
+    default_sort='-date',
+)
+
+TIMESHEET_EXPORT = ExportSpec(columns=[
+    ('מזהה', 'id'),
+    ('תאריך', 'date'),
+    ('שעות', 'hours'),
+    ('חויב', 'is_billed'),
+    ('תיאור', 'description'),
+    ('משימה', 'task__title'),
+    ('תקציב', 'budget__name'),
+    ('פרויקט', 'budget__project__name'),
+    ('לקוח', 'budget__project__customer__name'),
+])
+
+def timesheet_export(request):
+    return export_response(request, Timesheet.objects.all(), TIMESHEET_LIST, TIMESHEET_EXPORT, 'timesheets')
+
+
 def task_mass_complete(request):
     if request.method == 'POST':
-        tasks = request.POST['tasks'].split(',')
-        for task in tasks:
-            task = Task.objects.get(pk=task)
-            task.is_completed = True
-            task.save()
+        try:
+            bulk_update(Task, request.POST['tasks'], is_completed=True)
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect('task-list')
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 08:55
+
+from django.db import migrations, models
+from core.contact_info import normalize_email, normalize_phone
+
+
+def populate_normalized_fields(apps, schema_editor):
+    Contact = apps.get_model('contacts', 'Contact')
+    rows = []
+    for row in Contact.objects.only('id', 'phone', 'email').iterator(chunk_size=1000):
+        row.phone_normalized = normalize_phone(row.phone)
+        row.email_normalized = normalize_email(row.email)
+        rows.append(row)
+    Contact.objects.bulk_update(rows, ['phone_normalized', 'email_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='email_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(populate_normalized_fields, migrations.RunPython.noop),
+    ]
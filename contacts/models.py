@@ -2,10 +2,11 @@ from django.db import models
 from activities.models import Note
 from quotes.models import Quote
 from django.contrib.contenttypes.fields import GenericRelation
+from core.models import NormalizedContactFields
 from customers.models import Customer
 
 
-class Contact(models.Model):
+class Contact(NormalizedContactFields):
 
     TYPES = (
         ('normal', 'רגיל'),
@@ -40,8 +41,3 @@ class Contact(models.Model):
     @property
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
-    
-    @property
-    def phone_number(self):
-        n = ''.join(filter(str.isdigit, self.phone))
-        return f'{n[:3]}-{n[3:6]}-{n[6:]}'
\ No newline at end of file
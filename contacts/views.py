@@ -3,16 +3,54 @@ from .models import Contact
 from .forms import ContactForm
 from django.urls import reverse
 from urllib.parse import urlencode
-from activities.models import Note
+from activities.services import notes_context
+from django.http import JsonResponse
+from core.bulk import bulk_delete, BulkActionError
+from core.fragments import Fragment
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response
+
+CONTACT_LIST = ListSpec(
+    sort_fields=['first_name'],
+    search_fields=['first_name', 'last_name', 'email', 'phone', 'customer__name'],
+    filters={'customer': 'customer_id', 'contact_type': 'contact_type'},
+)
+
+CONTACT_EXPORT = ExportSpec(
+    columns=[
+        ('מזהה', 'id'),
+        ('שם פרטי', 'first_name'),
+        ('שם משפחה', 'last_name'),
+        ('אימייל', 'email'),
+        ('טלפון', 'phone'),
+        ('תפקיד', 'role'),
+        ('סוג', 'contact_type'),
+        ('לקוח', 'customer__name'),
+        ('איש קשר ראשי', 'is_main'),
+        ('תאריך יצירה', 'created_at'),
+    ],
+    choices={'contact_type': Contact.TYPES},
+)
+
+CONTACT_ROW = Fragment('contacts/partials/list_row.html', 'contact', related=('customer',))
 
 def contact_list(request):
-    contacts = Contact.objects.all()
+    page = paginate_list(request, Contact.objects.select_related('customer'), CONTACT_LIST)
+    page.rows = CONTACT_ROW.render_many(request, page.rows)
+    if is_rows_request(request):
+        return rows_response(request, 'contacts/partials/list_rows.html', 'contacts', page)
+
     context = {
-        'contacts': contacts,
+        'contacts': page.rows,
+        'page': page,
     }
     return render(request, 'contacts/contact-list.html', context)
 
 
+def contact_export(request):
+    return export_response(request, Contact.objects.all(), CONTACT_LIST, CONTACT_EXPORT, 'contacts')
+
+
 def contact_create(request, pk=None):
     if pk == None:
         form = ContactForm()
@@ -84,59 +122,20 @@ def contact_set_main(request, pk):
 
 def contact_detail(request, pk):
     contact = Contact.objects.get(pk=pk)
-    tagged_note = contact.notes.all().filter(tagged=True).first()
 
     context = {
         'contact': contact,
-        'tagged_note': tagged_note,
+        **notes_context(contact),
     }
     return render(request, 'contacts/contact-detail.html', context)
 
 
-def contact_submit_note(request, pk):
-    contact = Contact.objects.get(pk = pk)
-    note = Note.objects.create(
-        text = request.POST['note'],
-        content_object = contact
-    )
-    base_url = reverse('contact-detail', args=(pk,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def contact_delete_note(request, noteid):
-    note = Note.objects.get(pk=noteid)
-    contact = Contact.objects.get(pk=note.object_id)
-    note.delete()
-    base_url = reverse('contact-detail', args=(contact.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-
-def contact_tag_note(request, noteid):
-    # remove tag from all Notes for this Lead
-    note = Note.objects.get(pk=noteid)
-    if note.tagged:
-        note.tagged = False
-    else:
-        all_notes = Note.objects.filter(object_id=note.content_object.id).update(tagged=False)
-        note.tagged = True
-    note.save()
-    base_url = reverse('contact-detail', args=(note.content_object.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-
 def contact_mass_delete(request):
     if request.method == "POST":
         fallback = request.POST['fallback']
-        contactList = request.POST['contactList']
-        contactList = contactList.split(',')
-        for l in contactList:
-            l = int(l)
-            contact = Contact.objects.get(pk=l)
-            contact.delete()
+        try:
+            bulk_delete(Contact, request.POST['contactList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect(fallback)
 
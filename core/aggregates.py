@@ -0,0 +1,12 @@
+from django.db.models import Subquery, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+
+def subquery_aggregate(queryset, group_by, expression, output_field=None):
+    """
+    Wrap an aggregate over a related queryset (already filtered by OuterRef) as a
+    correlated subquery, so it can be annotated on a parent queryset without joins.
+    """
+    output_field = output_field or DecimalField(max_digits=20, decimal_places=2)
+    subquery = queryset.order_by().values(group_by).annotate(value=expression).values('value')
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        # Cached fragments are keyed on updated_at, a saved or deleted child touches the parents showing it
+        from .fragments import connect_touch_signals
+        connect_touch_signals()
+        # The select choice sets are versioned by a counter bumped when their model's rows change
+        from .choices import connect_choice_signals
+        connect_choice_signals()
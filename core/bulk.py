@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.utils import timezone
+
+from core.choices import bump_choices_version
+from core.fragments import touch_parents
+
+
+class BulkActionError(ValueError):
+    """Raised when the id list of a mass action is invalid"""
+
+
+def parse_ids(raw_ids):
+    """
+    Parse the comma separated id list posted by the list views' mass actions.
+    The whole list is validated before anything is touched.
+    """
+    if isinstance(raw_ids, str):
+        raw_ids = raw_ids.split(',')
+    ids = set()
+    for raw in raw_ids:
+        raw = str(raw).strip()
+        if not raw:
+            continue
+        if not raw.isdigit():
+            raise BulkActionError(f'Invalid id: {raw}')
+        ids.add(int(raw))
+    if not ids:
+        raise BulkActionError('No ids were selected')
+    return sorted(ids)
+
+
+def _existing(model, ids):
+    queryset = model.objects.filter(pk__in=ids)
+    found = set(queryset.values_list('pk', flat=True))
+    missing = set(ids) - found
+    if missing:
+        raise BulkActionError(f'{model._meta.verbose_name} not found: {", ".join(map(str, sorted(missing)))}')
+    return queryset
+
+
+def bulk_delete(model, raw_ids):
+    """Delete all the selected rows in one transaction and return the number of deleted rows of the model"""
+    ids = parse_ids(raw_ids)
+    with transaction.atomic():
+        _, per_model = _existing(model, ids).delete()
+    return per_model.get(model._meta.label, 0)
+
+
+def bulk_update(model, raw_ids, **values):
+    """Update all the selected rows with a single UPDATE statement and return the number of updated rows"""
+    ids = parse_ids(raw_ids)
+    # update() skips auto_now, so keep updated_at current ourselves
+    if 'updated_at' not in values and any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+        values['updated_at'] = timezone.now()
+    with transaction.atomic():
+        updated = _existing(model, ids).update(**values)
+        # Nor does it send the signals touching the parents of the rows (core.fragments)
+        touch_parents(model, ids)
+    # or moving the cached select choices to a new version (core.choices)
+    bump_choices_version(model._meta.label_lower)
+    return updated
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+# Model backed choice sets served to the select widgets from select_choices
+CHOICE_MODELS = ('activities.service', 'leads.leadsource', 'customers.customer')
+CHOICES_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(label):
+    return f'select-choices-version:{label}'
+
+
+def choices_version(label):
+    """
+    Current version of a choice set, a counter kept in the cache next to the choice lists and bumped
+    when a row of the choice model itself is saved or deleted (see connect_choice_signals). The cache
+    must be shared by the workers (CACHE_URL) for them to agree on it. A counter lost from the cache
+    starts over from the clock, so it never returns to a version whose list is still cached.
+    """
+    key = _version_key(label)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_choices_version(*labels):
+    """Move choice sets to a new version, for the writes that skip the model signals (bulk_create, update())"""
+    cache.set_many({_version_key(label): time.time_ns() for label in labels if label in CHOICE_MODELS}, None)
+
+
+# Choice sets changed in the current transaction, bumped once it commits so a worker reading the new
+# version never caches the rows of before the change under it
+_changed = threading.local()
+
+
+def _queue_bump(sender, **kwargs):
+    if not hasattr(_changed, 'labels'):
+        _changed.labels = set()
+    _changed.labels.add(sender._meta.label_lower)
+    transaction.on_commit(_flush_bumps)
+
+
+def _flush_bumps():
+    labels = getattr(_changed, 'labels', None)
+    if labels is None:
+        return
+    del _changed.labels
+    bump_choices_version(*labels)
+
+
+def connect_choice_signals():
+    for label in CHOICE_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_queue_bump, sender=model, dispatch_uid=f'choices-save-{label}')
+        post_delete.connect(_queue_bump, sender=model, dispatch_uid=f'choices-delete-{label}')
+
+
+def model_choices(label):
+    """Return (version, [{value, label}]) for a choice model, built once per version"""
+    version = choices_version(label)
+    key = f'select-choices:{label}:{version}'
+    choices = cache.get(key)
+    if choices is None:
+        model = apps.get_model(label)
+        choices = [{'value': str(obj.pk), 'label': str(obj)} for obj in model._default_manager.all()]
+        cache.set(key, choices, CHOICES_TIMEOUT)
+    return version, choices
+
+
+def choices_source(label, version):
+    """Versioned URL of a choice set, `version` as returned by model_choices"""
+    return f"{reverse('select-choices', args=[label])}?v={version}"
+
+
+def select_choices(request, label):
+    if label not in CHOICE_MODELS:
+        raise Http404
+    version, choices = model_choices(label)
+    response = JsonResponse({'version': version, 'choices': choices})
+    # The versioned URL never changes content, a new version gets a new URL
+    if request.GET.get('v') == str(version):
+        patch_cache_control(response, private=True, max_age=CHOICES_TIMEOUT)
+    return response
@@ -0,0 +1,36 @@
+from functools import lru_cache
+
+import phonenumbers
+from django.conf import settings
+
+
+def default_region():
+    return getattr(settings, 'PHONE_DEFAULT_REGION', 'IL')
+
+
+def normalize_phone(phone):
+    """E.164 form of a free-text phone number ("050-123 4567" -> "+972501234567"), None when it can't be parsed"""
+    if not phone:
+        return None
+    try:
+        number = phonenumbers.parse(phone, default_region())
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_email(email):
+    """Lowercased, trimmed email, None for an empty value"""
+    email = (email or '').strip().lower()
+    return email or None
+
+
+@lru_cache(maxsize=4096)
+def format_phone(e164):
+    """Display form of a stored E.164 number, national format for local numbers ("050-123-4567")"""
+    number = phonenumbers.parse(e164)
+    if phonenumbers.region_code_for_number(number) == default_region():
+        return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.NATIONAL)
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.INTERNATIONAL)
@@ -0,0 +1,109 @@
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from contacts.models import Contact
+from core.contact_info import normalize_email, normalize_phone
+from customers.models import Customer
+from leads.models import Lead
+
+DUPLICATE_LIMIT = 10
+
+
+class Duplicates:
+    """Leads, contacts and customers matching a person or company"""
+
+    def __init__(self, leads=(), contacts=(), customers=()):
+        self.leads = list(leads)
+        self.contacts = list(contacts)
+        self.customers = list(customers)
+
+    def __bool__(self):
+        return bool(self.leads or self.contacts or self.customers)
+
+    def __len__(self):
+        return len(self.leads) + len(self.contacts) + len(self.customers)
+
+
+def _contact_match(phone, email):
+    """Q on the indexed normalized columns, None when there is nothing to match on"""
+    match = Q()
+    if phone:
+        match |= Q(phone_normalized=phone)
+    if email:
+        match |= Q(email_normalized=email)
+    return match or None
+
+
+def _customers(name=None, ids=()):
+    """Customers named `name` (case-insensitive) or with one of the ids"""
+    name = (name or '').strip().lower()
+    match = Q(pk__in=ids) if ids else Q()
+    if name:
+        # Filtering on the Lower('name') alias uses the customer_name_lower index
+        match |= Q(name_lower=name)
+    if not match:
+        return Customer.objects.none()
+    return Customer.objects.alias(name_lower=Lower('name')).filter(match)
+
+
+def find_duplicates(email=None, phone=None, company_name=None, exclude=None, limit=DUPLICATE_LIMIT):
+    """
+    Leads and contacts sharing the normalized phone or email and customers with the same name
+    (case-insensitive) or owning a matching contact. Every lookup is an index seek.
+    """
+    match = _contact_match(normalize_phone(phone), normalize_email(email))
+    leads, contacts = Lead.objects.none(), Contact.objects.none()
+    if match is not None:
+        leads = Lead.objects.filter(match).order_by('-created_at')
+        contacts = Contact.objects.filter(match).select_related('customer').order_by('-created_at')
+        if isinstance(exclude, Lead):
+            leads = leads.exclude(pk=exclude.pk)
+        elif isinstance(exclude, Contact):
+            contacts = contacts.exclude(pk=exclude.pk)
+    contacts = list(contacts[:limit])
+
+    customer_ids = {contact.customer_id for contact in contacts if contact.customer_id}
+    customers = _customers(company_name, customer_ids)
+    if isinstance(exclude, Customer):
+        customers = customers.exclude(pk=exclude.pk)
+    return Duplicates(leads[:limit], contacts, customers.order_by('name')[:limit])
+
+
+def find_lead_duplicates(lead, limit=DUPLICATE_LIMIT):
+    return find_duplicates(lead.email, lead.phone, lead.company_name, exclude=lead, limit=limit)
+
+
+def find_lead_matches(phones, emails):
+    """
+    Existing leads of a batch of normalized phones and emails, as ({phone: lead id}, {email: lead id}).
+    Two indexed IN lookups however large the batch is.
+    """
+    matches = []
+    for field, values in (('phone_normalized', phones), ('email_normalized', emails)):
+        values = {value for value in values if value}
+        rows = Lead.objects.filter(**{f'{field}__in': values}).order_by('-pk').values_list(field, 'pk') if values else []
+        # Ordered newest first, so the oldest lead of a value wins
+        matches.append(dict(rows))
+    return tuple(matches)
+
+
+def find_contact(email=None, phone=None):
+    """
+    The contact that is the same person, safe to update in place: the email matches and the phone
+    matches too or doesn't conflict (one side has none). A phone or an email alone is shared by
+    colleagues (an office line, a reused address), those matches are only reported by find_duplicates.
+    """
+    phone, email = normalize_phone(phone), normalize_email(email)
+    if not email:
+        return None
+    candidates = Contact.objects.filter(email_normalized=email).order_by('-is_main', 'pk')[:DUPLICATE_LIMIT]
+    matches = [
+        contact for contact in candidates
+        if not phone or not contact.phone_normalized or contact.phone_normalized == phone
+    ]
+    # A contact with the same phone wins over one without a phone
+    return max(matches, key=lambda contact: contact.phone_normalized == phone, default=None)
+
+
+def find_customer(name):
+    return _customers(name).order_by('pk').first()
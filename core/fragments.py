@@ -0,0 +1,201 @@
+import hashlib
+import threading
+
+from django.apps import apps
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from core.choices import CHOICE_MODELS, choices_version
+
+FRAGMENTS_TIMEOUT = 60 * 60 * 24
+
+# Child model -> the parents it is shown with (a foreign key, or the GenericForeignKey of a generic
+# relation). Saving or deleting a child touches the updated_at of its parents, and of theirs in turn, once
+# the transaction commits, so the fragments keyed on them are rendered anew. Timesheets and quote line
+# items touch their parents through the rollups they maintain (Timesheet.update_rollups, Quote.update_totals).
+TOUCH_PARENTS = {
+    'activities.task': ['content_object'],
+    'projects.projectbudget': ['project'],
+    'projects.project': ['customer'],
+    'payments.payment': ['project'],
+    'quotes.quote': ['content_object'],
+    'quotes.quote_payment': ['quote'],
+}
+
+
+class Fragment:
+    """
+    A template rendered for one object at a time and cached under the object's version. The key is made
+    of the updated_at of the object and of the related objects the template shows, the versions of the
+    choice models it shows and the template source, so it changes whenever something the fragment shows
+    does (see TOUCH_PARENTS) and stale fragments are simply never read again.
+    template - rendered with {name: object} and the request, it can't hold a CSRF token (those are per user)
+    related  - attribute paths of the related objects shown, e.g. ('project', 'project.customer')
+    versions - the choice models shown (see core.choices), e.g. ('activities.service',) for service names
+    load     - callable returning the queryset that fetches what the template needs beyond the list rows
+               (e.g. annotations), only called for the objects missing from the cache. A callable so
+               the queryset isn't built when the views are imported
+    """
+
+    def __init__(self, template, name, related=(), versions=(), load=None):
+        assert set(versions) <= set(CHOICE_MODELS), 'Only the choice models carry a version'
+        self.template = template
+        self.name = name
+        self.related = related
+        self.versions = versions
+        self.load = load
+
+    def _prefix(self):
+        # Computed once per render, the template source is cached by the template loaders
+        source = hashlib.md5(get_template(self.template).template.source.encode()).hexdigest()
+        versions = [str(choices_version(label)) for label in self.versions]
+        return ':'.join([self.template, source, *versions])
+
+    def key(self, obj, prefix):
+        parts = [_stamp(obj), *(_stamp(_resolve(obj, path)) for path in self.related)]
+        return 'fragment:' + hashlib.md5(f'{prefix}:{":".join(parts)}'.encode()).hexdigest()
+
+    def _render(self, request, obj, context):
+        return render_to_string(self.template, {self.name: obj, **context}, request=request)
+
+    def render(self, request, obj, context=None):
+        """The fragment of a single object, `context` (object -> dict) is only called on a cache miss"""
+        key = self.key(obj, self._prefix())
+        html = cache.get(key)
+        if html is None:
+            html = self._render(request, obj, context(obj) if context else {})
+            cache.set(key, html, FRAGMENTS_TIMEOUT)
+        return mark_safe(html)
+
+    def render_many(self, request, objects):
+        """The fragments of a list of objects, read with one cache round trip and rendered for the misses only"""
+        prefix = self._prefix()
+        keys = [self.key(obj, prefix) for obj in objects]
+        cached = cache.get_many(keys)
+        missed = {key: obj for key, obj in zip(keys, objects) if key not in cached}
+        if missed and self.load is not None:
+            loaded = self.load().in_bulk([obj.pk for obj in missed.values()])
+            missed = {key: loaded.get(obj.pk, obj) for key, obj in missed.items()}
+        rendered = {key: self._render(request, obj, {}) for key, obj in missed.items()}
+        cache.set_many(rendered, FRAGMENTS_TIMEOUT)
+        return [mark_safe(cached[key] if key in cached else rendered[key]) for key in keys]
+
+
+def _resolve(obj, path):
+    for attr in path.split('.'):
+        if obj is None:
+            return None
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _stamp(obj):
+    if obj is None:
+        return '-'
+    return f'{obj._meta.label_lower}.{obj.pk}@{obj.updated_at.isoformat()}'
+
+
+# Touching
+
+def _relations(model):
+    """(content type column or None, id column, parent model or None) of every parent in TOUCH_PARENTS"""
+    relations = []
+    for name in TOUCH_PARENTS.get(model._meta.label_lower, ()):
+        field = model._meta.get_field(name)
+        if isinstance(field, GenericForeignKey):
+            relations.append((model._meta.get_field(field.ct_field).attname, field.fk_field, None))
+        else:
+            relations.append((None, field.attname, field.related_model))
+    return relations
+
+
+def _parents(model, rows):
+    """{parent model: ids} of child rows given as {column: value} dicts"""
+    parents = {}
+    for type_column, id_column, parent in _relations(model):
+        for row in rows:
+            if row[id_column] is None:
+                continue
+            row_parent = parent or ContentType.objects.get_for_id(row[type_column]).model_class()
+            parents.setdefault(row_parent, set()).add(row[id_column])
+    return parents
+
+
+def _columns(model):
+    return [column for relation in _relations(model) for column in relation[:2] if column]
+
+
+def touch(model, pks):
+    """
+    Bump the updated_at of the given rows and, through TOUCH_PARENTS, of their parents. Saves and deletes
+    do it through the signals, changes made with update() or bulk_create() call it (or touch_parents()
+    when the UPDATE already sets updated_at) themselves.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if model is None or not pks:
+        return
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        model._default_manager.filter(pk__in=pks).update(updated_at=timezone.now())
+    touch_parents(model, pks)
+
+
+def touch_parents(model, pks):
+    """Touch the parents of the given rows, which are already up to date themselves"""
+    columns = _columns(model)
+    if not columns or not pks:
+        return
+    rows = model._default_manager.filter(pk__in=pks).values(*columns)
+    for parent, ids in _parents(model, rows).items():
+        touch(parent, ids)
+
+
+# Parents of the children saved or deleted in the current transaction, and the rows deleted in it, touched
+# once the transaction commits
+_pending = threading.local()
+
+
+def _queue_touch(sender, instance, deleted=False):
+    if not hasattr(_pending, 'parents'):
+        _pending.parents, _pending.deleted = {}, {}
+    if deleted:
+        _pending.deleted.setdefault(sender, set()).add(instance.pk)
+    row = {column: getattr(instance, column) for column in _columns(sender)}
+    for parent, ids in _parents(sender, [row]).items():
+        _pending.parents.setdefault(parent, set()).update(ids)
+    # Every change queues the flush, the first to run touches everything collected so far. Parents left
+    # by a rolled back transaction are touched by the next flush, which is harmless
+    transaction.on_commit(_flush_touches)
+
+
+def _flush_touches():
+    """Touch the collected parents with one UPDATE per model, skipping the rows deleted meanwhile"""
+    parents = getattr(_pending, 'parents', None)
+    if parents is None:
+        return
+    deleted = _pending.deleted
+    del _pending.parents, _pending.deleted
+    for parent, ids in parents.items():
+        touch(parent, ids - deleted.get(parent, set()))
+
+
+def _touch_parents_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _queue_touch(sender, instance)
+
+
+def _touch_parents_on_delete(sender, instance, **kwargs):
+    # A cascade deletes the children one by one, their parents are collected and touched together
+    _queue_touch(sender, instance, deleted=True)
+
+
+def connect_touch_signals():
+    for label in TOUCH_PARENTS:
+        model = apps.get_model(label)
+        post_save.connect(_touch_parents_on_save, sender=model, dispatch_uid=f'fragments-save-{label}')
+        post_delete.connect(_touch_parents_on_delete, sender=model, dispatch_uid=f'fragments-delete-{label}')
@@ -0,0 +1,20 @@
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+
+
+def content_type_of(obj):
+    """
+    Content type of a row with a generic foreign key. ContentType.objects.get_for_id() is served
+    from the process wide content type cache, while obj.content_type costs a query (or a join) per row.
+    """
+    return ContentType.objects.get_for_id(obj.content_type_id)
+
+
+def generic_prefetch(lookup, targets):
+    """
+    Prefetch of a generic foreign key: the rows are grouped by content type and every target model
+    is fetched with one pk__in query, so a list resolves its owners in O(content types) queries.
+    `targets` maps target models to the relations selected along with them, e.g. {Project: ['customer']}
+    for tasks showing their project's customer; target models missing from it are fetched plainly.
+    """
+    return GenericPrefetch(lookup, [model._default_manager.select_related(*related) for model, related in targets.items()])
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('core.instrumentation')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'HEADERS': True,
+    'LOG': True,
+    'STRICT': False,
+    'DEFAULT_QUERY_BUDGET': None,
+    'QUERY_BUDGETS': {},
+    'DUPLICATE_THRESHOLD': 2,
+}
+
+_current = ContextVar('request_stats', default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a view runs more queries than its budget allows."""
+
+
+def fingerprint(sql):
+    """
+    Normalize a SQL statement so repeated executions with different parameters
+    (the typical N+1 shape) share one fingerprint.
+    """
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestStats:
+    """Query and render timings collected while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, threshold=2):
+        return [
+            {'fingerprint': hashlib.md5(sql.encode()).hexdigest()[:10], 'count': count, 'sql': sql[:300]}
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+class InstrumentedTemplate(Template):
+    """Backend template that adds its render time to the current request stats."""
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        # Only the outermost render is timed, render_to_string calls inside a view may nest
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend returning InstrumentedTemplate instances."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, DB time, template render time and duplicate queries per request.
+
+    Results are exposed as Server-Timing / X-Query-Count headers and a JSON log line on the
+    core.instrumentation logger. Per-view budgets (keyed by URL name) are checked on every
+    request; in strict mode (the test runner) an exceeded budget raises QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        budget = self.get_budget(view_name)
+        duplicates = stats.duplicates(self.config['DUPLICATE_THRESHOLD'])
+
+        if self.config['HEADERS']:
+            response['X-Query-Count'] = str(stats.query_count)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries"',
+                f'tpl;dur={stats.template_time * 1000:.1f}',
+                f'total;dur={stats.total_time * 1000:.1f}',
+            ])
+            if duplicates:
+                response['X-Duplicate-Queries'] = str(sum(d['count'] - 1 for d in duplicates))
+
+        over_budget = budget is not None and stats.query_count > budget
+        if self.config['LOG']:
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'queries': stats.query_count,
+                'budget': budget,
+                'db_ms': round(stats.db_time * 1000, 1),
+                'template_ms': round(stats.template_time * 1000, 1),
+                'total_ms': round(stats.total_time * 1000, 1),
+                'duplicates': duplicates,
+            }
+            level = logging.WARNING if over_budget else logging.INFO
+            logger.log(level, json.dumps(record, ensure_ascii=False), extra={'request_stats': record})
+
+        if over_budget and self.config['STRICT']:
+            raise QueryBudgetExceeded(
+                f'{view_name} ran {stats.query_count} queries, budget is {budget}. '
+                f'Duplicates: {[(d["count"], d["sql"]) for d in duplicates]}'
+            )
+        return response
+
+    def get_budget(self, view_name):
+        return self.config['QUERY_BUDGETS'].get(view_name, self.config['DEFAULT_QUERY_BUDGET'])
+
@@ -0,0 +1,58 @@
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from core.listing import decode_cursor, encode_cursor, keyset_page
+
+KANBAN_PAGE_SIZE = 30
+# Cards are paged by keyset on (created_at, id), newest first
+KANBAN_SORT = '-created_at'
+KANBAN_ORDERING = (KANBAN_SORT, '-id')
+
+
+def status_counts(queryset, statuses):
+    """Return {status: count} for every status of a board from a single GROUP BY query"""
+    counts = dict(
+        queryset.order_by().values_list('status').annotate(count=Count('pk'))
+    )
+    return {key: counts.get(key, 0) for key, _ in statuses}
+
+
+def kanban_columns(queryset, statuses, page_size=KANBAN_PAGE_SIZE):
+    """
+    Build the columns of a kanban board. The first page of cards of every column is
+    fetched in one query, numbering the rows per status with ROW_NUMBER().
+    The rest of each column is loaded on demand with kanban_page(), from the column's cursor.
+    """
+    counts = status_counts(queryset, statuses)
+    ranked = queryset.annotate(
+        kanban_row = Window(RowNumber(), partition_by=F('status'), order_by=list(KANBAN_ORDERING))
+    ).filter(kanban_row__lte=page_size).order_by(*KANBAN_ORDERING)
+
+    cards = {key: [] for key, _ in statuses}
+    for obj in ranked:
+        cards.setdefault(obj.status, []).append(obj)
+
+    return [
+        {
+            'key': key,
+            'label': label,
+            'count': counts[key],
+            'cards': cards[key],
+            'has_more': counts[key] > len(cards[key]),
+            'cursor': encode_cursor(KANBAN_SORT, cards[key][-1]) if counts[key] > len(cards[key]) else None,
+        }
+        for key, label in statuses
+    ]
+
+
+def kanban_page(queryset, status, cursor=None, page_size=KANBAN_PAGE_SIZE):
+    """
+    Return (cards, next cursor or None) for the page of a kanban column after the card the cursor
+    points at, the first page without one. Keyed on the last card rather than counting the cards shown,
+    so cards dragged in or out of the column meanwhile don't shift the page. Raises ValueError for an
+    invalid cursor.
+    """
+    position = decode_cursor(cursor, KANBAN_SORT, queryset.model) if cursor else None
+    if cursor and position is None:
+        raise ValueError('Invalid cursor')
+    return keyset_page(queryset.filter(status=status), KANBAN_SORT, position, page_size)
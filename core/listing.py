@@ -0,0 +1,174 @@
+from django.core import signing
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+
+PAGE_SIZES = (10, 50, 100)
+DEFAULT_PAGE_SIZE = 50
+CURSOR_SALT = 'core.listing.cursor'
+
+
+class ListSpec:
+    """
+    What a list view lets the client do on the server side:
+    sort_fields   - whitelisted sort columns (non-null model fields)
+    search_fields - fields matched (icontains) by the `q` parameter
+    filters       - query parameter -> ORM lookup for the column filters
+    """
+
+    def __init__(self, sort_fields, search_fields=(), filters=None, default_sort='-created_at'):
+        self.sort_fields = set(sort_fields) | {default_sort.lstrip('-')}
+        self.search_fields = search_fields
+        self.filters = filters or {}
+        self.default_sort = default_sort
+
+
+class ListPage:
+    """One page of a list view, plus the state the client needs to fetch the next one"""
+
+    def __init__(self, rows, next_cursor, total_count, sort, page_size, filters, query):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.total_count = total_count
+        self.sort = sort
+        self.page_size = page_size
+        self.filters = filters
+        self.query = query
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_filtered(self):
+        return bool(self.filters or self.query)
+
+    @property
+    def client_state(self):
+        return {
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'total_count': self.total_count,
+            'row_count': len(self.rows),
+            'page_size': self.page_size,
+            'sort': self.sort,
+            'filters': self.filters,
+            'query': self.query,
+        }
+
+
+def encode_cursor(sort, obj):
+    field = obj._meta.get_field(sort.lstrip('-'))
+    return signing.dumps([sort, field.value_to_string(obj), obj.pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, sort, model):
+    """Return the (value, pk) of the last row of the previous page, or None for an invalid cursor"""
+    try:
+        cursor_sort, value, pk = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if cursor_sort != sort:
+        return None
+    try:
+        return model._meta.get_field(sort.lstrip('-')).to_python(value), pk
+    except ValidationError:
+        return None
+
+
+def list_sort(params, spec):
+    """The requested sort column if it is whitelisted, else the default one"""
+    sort = params.get('sort') or spec.default_sort
+    if sort.lstrip('-') not in spec.sort_fields:
+        sort = spec.default_sort
+    return sort
+
+
+def filter_list(params, queryset, spec):
+    """Apply the column filters and the `q` search of the request, returns (queryset, filters, query)"""
+    filters = {}
+    for name, lookup in spec.filters.items():
+        value = params.get(name)
+        if not value:
+            continue
+        try:
+            queryset = queryset.filter(**{lookup: value})
+        except (ValueError, ValidationError):
+            continue
+        filters[name] = value
+
+    query = params.get('q', '').strip()
+    if query and spec.search_fields:
+        condition = Q()
+        for field in spec.search_fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        queryset = queryset.filter(condition)
+    return queryset, filters, query
+
+
+def paginate_list(request, queryset, spec):
+    """
+    Filter, search, sort and paginate a list queryset from the request parameters.
+    Pages are fetched with keyset (cursor) pagination on (sort column, id), so every
+    page costs the same no matter how deep into the table it is. An invalid cursor, or one
+    made for another sort, is rejected with a 400 like the kanban columns do.
+    """
+    params = request.GET
+
+    sort = list_sort(params, spec)
+    try:
+        page_size = int(params.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    if page_size not in PAGE_SIZES:
+        page_size = DEFAULT_PAGE_SIZE
+
+    queryset, filters, query = filter_list(params, queryset, spec)
+
+    cursor = params.get('cursor')
+    position = decode_cursor(cursor, sort, queryset.model) if cursor else None
+    if cursor and position is None:
+        raise BadRequest('Invalid cursor')
+
+    # The total is only counted for the first page, later pages only move the cursor
+    total_count = None if position else queryset.count()
+
+    rows, next_cursor = keyset_page(queryset, sort, position, page_size)
+    return ListPage(rows, next_cursor, total_count, sort, page_size, filters, query)
+
+
+def keyset_page(queryset, sort, position, page_size):
+    """
+    Return (rows, next cursor or None) for the page of the queryset ordered by (sort column, pk)
+    that follows `position`, the decoded cursor of the previous page (None for the first page)
+    """
+    field = sort.lstrip('-')
+    descending = sort.startswith('-')
+    if position:
+        value, pk = position
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk}))
+
+    rows = list(queryset.order_by(sort, '-pk' if descending else 'pk')[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(sort, rows[-1])
+    return rows, next_cursor
+
+
+def is_rows_request(request):
+    """Infinite scroll, search and sort requests only need the rendered rows"""
+    return request.GET.get('fragment') == 'rows'
+
+
+def rows_response(request, template_name, context_name, page):
+    html = render_to_string(template_name, {context_name: page.rows}, request=request)
+    return JsonResponse({
+        'html': html,
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_more,
+        'row_count': len(page.rows),
+        'total_count': page.total_count,
+    })
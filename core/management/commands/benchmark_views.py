@@ -0,0 +1,202 @@
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import urlencode
+from contacts.models import Contact
+from core.instrumentation import RequestStats, get_config
+from customers.models import Customer
+from leads.models import Lead
+from projects.models import Project
+from quotes.models import Quote
+
+# (url name, model whose first row is used as the detail object, or the fixed url args)
+BENCHMARK_VIEWS = [
+    ('customer-list', None),
+    ('customer-card', None),
+    ('customer-detail', Customer),
+    ('lead-list', None),
+    ('lead-kanban', None),
+    ('lead-detail', Lead),
+    ('quote-list', None),
+    ('quote-kanban', None),
+    ('quote-detail', Quote),
+    ('project-list', None),
+    ('project-detail', Project),
+    ('contact-list', None),
+    ('contact-detail', Contact),
+    ('payment-list', None),
+    ('task-list', None),
+    ('lead-kanban-column', None),
+    ('quote-kanban-column', None),
+    ('select-choices', ('activities.service',)),
+    ('search', None),
+]
+# Query strings of the views that need parameters
+BENCHMARK_QUERIES = {
+    'lead-kanban-column': {'status': Lead.LEAD_STATUSES[0][0]},
+    'quote-kanban-column': {'status': Quote.STATUSES[0][0]},
+    'search': {'q': 'test'},
+}
+DATASET_MODELS = (Lead, Customer, Contact, Quote, Project)
+BASELINE_DIR = settings.BASE_DIR / 'benchmarks'
+BENCHMARK_USER = 'benchmark@jetpo.local'
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every list, detail and kanban view through the test client and record wall time, '
+        'query count and peak memory. Fails when a view runs more queries than its INSTRUMENTATION '
+        'budget, then compares against a JSON baseline and fails on regressions, or writes a new '
+        'baseline with --save.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('views', nargs='*', help='URL names to benchmark (default: all)')
+        parser.add_argument('--baseline', type=Path, help='Baseline file (default: benchmarks/baseline-<database vendor>.json)')
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per view')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative slowdown / memory growth before a view is flagged')
+        parser.add_argument('--min-delta-ms', type=float, default=5,
+                            help='Ignore time differences smaller than this (timer noise)')
+
+    def handle(self, *args, **options):
+        views = [(name, model) for name, model in BENCHMARK_VIEWS if not options['views'] or name in options['views']]
+        unknown = set(options['views']) - {name for name, model in BENCHMARK_VIEWS}
+        if unknown:
+            raise CommandError(f'Unknown views: {", ".join(sorted(unknown))}')
+
+        # Timings are only comparable on the same backend, each one keeps its own baseline
+        options['baseline'] = options['baseline'] or BASELINE_DIR / f'baseline-{connection.vendor}.json'
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(self.get_user())
+
+        results = {}
+        for name, model in views:
+            url = self.get_url(name, model)
+            if url is None:
+                self.stdout.write(self.style.WARNING(f'{name}: skipped, no {model._meta.verbose_name} rows'))
+                continue
+            results[name] = self.measure(client, url, options['repeat'])
+            self.stdout.write(
+                f"{name:<18} {results[name]['status']} {results[name]['queries']:>5} queries "
+                f"{results[name]['median_ms']:>9.1f} ms {results[name]['peak_kb']:>9.0f} KB  {url}"
+            )
+
+        # The query budgets hold whatever the baseline says, a view over budget is never saved as the baseline
+        over_budget = self.check_budgets(results)
+        for message in over_budget:
+            self.stdout.write(self.style.ERROR(message))
+        if over_budget:
+            raise CommandError(f'{len(over_budget)} views over their query budget')
+
+        report = {'dataset': self.dataset(), 'views': results}
+        if options['save']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline for {len(results)} views to {options["baseline"]}'))
+            return
+
+        if not options['baseline'].exists():
+            self.stdout.write(self.style.WARNING(f'No baseline at {options["baseline"]}, run with --save to create one'))
+            return
+        baseline = json.loads(options['baseline'].read_text())
+        if baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING(
+                f"Dataset differs from the baseline ({baseline.get('dataset')} vs {report['dataset']}), "
+                'timings are not comparable'
+            ))
+
+        regressions = self.compare(baseline['views'], results, options['tolerance'], options['min_delta_ms'])
+        for message in regressions:
+            self.stdout.write(self.style.ERROR(message))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions in {len(results)} views'))
+
+    def get_user(self):
+        User = get_user_model()
+        user = User.objects.filter(email=BENCHMARK_USER).first()
+        if user is None:
+            user = User.objects.create_superuser(BENCHMARK_USER)
+        return user
+
+    def get_url(self, name, model):
+        query = f'?{urlencode(BENCHMARK_QUERIES[name])}' if name in BENCHMARK_QUERIES else ''
+        if model is None:
+            return reverse(name) + query
+        if isinstance(model, tuple):
+            return reverse(name, args=model) + query
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+        return reverse(name, args=[pk]) + query if pk is not None else None
+
+    def check_budgets(self, results):
+        config = get_config()
+        messages = []
+        for name, result in results.items():
+            budget = config['QUERY_BUDGETS'].get(name, config['DEFAULT_QUERY_BUDGET'])
+            if budget is not None and result['queries'] > budget:
+                messages.append(f"{name}: {result['queries']} queries, budget is {budget}")
+        return messages
+
+    def dataset(self):
+        return {'vendor': connection.vendor, **{model._meta.label_lower: model.objects.count() for model in DATASET_MODELS}}
+
+    def measure(self, client, url, repeat):
+        # Warm up caches (templates, content types, choice sets) so every timed request is comparable
+        response = client.get(url)
+        # reset_queries runs on request_started, so count through an execute wrapper instead of queries_log
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            client.get(url)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # tracemalloc slows requests down, so memory is measured on a separate request
+        tracemalloc.start()
+        try:
+            client.get(url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': stats.query_count,
+            'median_ms': round(statistics.median(timings), 2),
+            'min_ms': round(min(timings), 2),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, baseline, results, tolerance, min_delta_ms):
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['status'] != before['status']:
+                regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+            # The fastest run is the least affected by scheduler and GC noise
+            if (result['min_ms'] > before['min_ms'] * (1 + tolerance)
+                    and result['min_ms'] - before['min_ms'] > min_delta_ms):
+                regressions.append(f"{name}: time {before['min_ms']} ms -> {result['min_ms']} ms")
+            if result['peak_kb'] > before['peak_kb'] * (1 + tolerance):
+                regressions.append(f"{name}: peak memory {before['peak_kb']} KB -> {result['peak_kb']} KB")
+        return regressions
@@ -0,0 +1,100 @@
+import json
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import Lower
+from contacts.models import Contact
+from customers.models import Customer
+from leads.models import Lead
+
+PERSON_MODELS = (Lead, Contact)
+KEYS = ('phone_normalized', 'email_normalized')
+
+
+class Command(BaseCommand):
+    help = (
+        'Report clusters of duplicate leads and contacts (sharing a normalized phone or email, transitively) '
+        'and customers sharing a name. Nothing is merged or deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', dest='json_path', help='Also write the clusters to this JSON file')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        clusters = self.person_clusters() + self.customer_clusters()
+
+        for number, cluster in enumerate(clusters, 1):
+            self.stdout.write(f'Cluster {number} ({len(cluster)}):')
+            for row in cluster:
+                details = ' '.join(str(row[field]) for field in ('phone', 'email', 'legal_id') if row.get(field))
+                self.stdout.write(f"  {row['type']} #{row['id']} {row['name']} {details}".rstrip())
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(clusters, file, ensure_ascii=False, indent=2)
+
+        rows = sum(len(cluster) for cluster in clusters)
+        self.stdout.write(self.style.SUCCESS(f'Found {len(clusters)} duplicate clusters covering {rows} rows'))
+
+    def duplicate_keys(self, key):
+        """Values of a normalized key used by more than one lead / contact, from grouped index scans"""
+        counts = Counter()
+        for model in PERSON_MODELS:
+            rows = model.objects.filter(**{f'{key}__isnull': False}).order_by().values(key).annotate(n=Count('pk'))
+            for row in rows.values_list(key, 'n'):
+                counts[row[0]] += row[1]
+        return {value for value, count in counts.items() if count > 1}
+
+    def person_clusters(self):
+        duplicates = {key: self.duplicate_keys(key) for key in KEYS}
+
+        # Union-find over (model, id) nodes, joined through every shared key value
+        parent = {}
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        rows = {}
+        owners = {}
+        fields = ('pk', 'first_name', 'last_name', 'phone', 'email', *KEYS)
+        for model in PERSON_MODELS:
+            for key in KEYS:
+                values = sorted(duplicates[key])
+                # Chunked IN lists keep under the SQLite bound parameter limit
+                for start in range(0, len(values), self.batch_size):
+                    chunk = values[start:start + self.batch_size]
+                    for row in model.objects.filter(**{f'{key}__in': chunk}).values(*fields):
+                        node = (model._meta.model_name, row['pk'])
+                        if node not in parent:
+                            parent[node] = node
+                            rows[node] = {
+                                'type': model._meta.model_name,
+                                'id': row['pk'],
+                                'name': ' '.join(part for part in (row['first_name'], row['last_name']) if part),
+                                'phone': row['phone'],
+                                'email': row['email'],
+                            }
+                        for shared in KEYS:
+                            if row[shared] in duplicates[shared]:
+                                owner = owners.setdefault((shared, row[shared]), node)
+                                parent[find(node)] = find(owner)
+
+        groups = defaultdict(list)
+        for node in rows:
+            groups[find(node)].append(rows[node])
+        return sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
+
+    def customer_clusters(self):
+        customers = Customer.objects.annotate(name_lower=Lower('name')).order_by()
+        names = customers.values('name_lower').annotate(n=Count('pk')).filter(n__gt=1).values_list('name_lower', flat=True)
+        groups = defaultdict(list)
+        rows = customers.filter(name_lower__in=list(names)).values('pk', 'name', 'legal_id', 'name_lower')
+        for row in rows.iterator(chunk_size=self.batch_size):
+            groups[row['name_lower']].append({'type': 'customer', 'id': row['pk'], 'name': row['name'], 'legal_id': row['legal_id']})
+        return sorted(groups.values(), key=len, reverse=True)
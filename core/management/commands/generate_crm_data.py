@@ -0,0 +1,282 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from activities.models import Note, Service, Task, Timesheet
+from contacts.models import Contact
+from core.choices import bump_choices_version
+from customers.models import Customer
+from leads.models import Lead, LeadSource
+from payments.models import Payment
+from projects.models import Project, ProjectBudget
+from quotes.models import Quote, Quote_Payment, Quote_Service
+
+FIRST_NAMES = ['נועה', 'יוסי', 'מיכל', 'דניאל', 'שירה', 'אבי', 'תמר', 'רון', 'הילה', 'עומר', 'ליאת', 'איתי']
+LAST_NAMES = ['כהן', 'לוי', 'מזרחי', 'פרץ', 'ביטון', 'אברהם', 'פרידמן', 'שפירא', 'דהן', 'גבאי']
+COMPANY_WORDS = ['טכנולוגיות', 'שיווק', 'סטודיו', 'מערכות', 'השקעות', 'פתרונות', 'דיגיטל', 'הנדסה']
+ROLES = ['מנכ"ל', 'סמנכ"ל שיווק', 'מנהלת רכש', 'בעלים', 'מנהל מוצר']
+SERVICES = [
+    ('בניית אתר', 'fix', 1, 12000), ('עיצוב לוגו', 'fix', 1, 3500), ('קידום אורגני', 'hourly', 20, 250),
+    ('ניהול קמפיינים', 'hourly', 15, 220), ('פיתוח מותאם', 'hourly', 40, 300), ('תחזוקה חודשית', 'fix', 1, 900),
+    ('צילום מוצרים', 'fix', 1, 2500), ('ייעוץ אסטרטגי', 'hourly', 10, 450),
+]
+LEAD_SOURCES = ['אתר', 'פייסבוק', 'גוגל', 'המלצה', 'לינקדאין', 'כנס', 'שיחה נכנסת']
+TASK_TITLES = ['שיחת אפיון', 'הכנת סקיצות', 'פיתוח עמוד בית', 'בדיקות', 'עדכון תוכן', 'דו"ח חודשי', 'פגישת סטטוס']
+
+# Relative weights of the status values, roughly what the production data looks like
+LEAD_STATUSES = {'new': 30, 'follow': 25, 'quote': 15, 'won': 10, 'lost': 15, 'trash': 5}
+QUOTE_STATUSES = {'draft': 25, 'sent': 30, 'won': 30, 'lost': 15}
+PROJECT_STATUSES = {'open': 50, 'completed': 35, 'canceled': 5, 'onHold': 10}
+PAYMENT_STATUSES = {'draft': 30, 'billed': 20, 'paid': 50}
+URGENCIES = {'low': 40, 'medium': 35, 'high': 20, 'critical': 5}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic CRM dataset (leads, customers, contacts, quotes, projects, payments, '
+        'tasks, timesheets and notes) for benchmarks. Counts are multiplied by --scale, '
+        '--scale 10 gives 10k leads, 5k customers, 50k quotes and 500k timesheets.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1)
+        parser.add_argument('--leads', type=int, default=1000)
+        parser.add_argument('--customers', type=int, default=500)
+        parser.add_argument('--quotes', type=int, default=5000)
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--timesheets', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed generates the same data')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        scale = options['scale']
+        counts = {name: int(options[name] * scale) for name in ('leads', 'customers', 'quotes', 'projects', 'timesheets')}
+        if counts['customers'] < 1 and (counts['projects'] or counts['timesheets']):
+            raise CommandError('Projects and timesheets need at least one customer')
+
+        with transaction.atomic():
+            self.services = self.get_or_create_services()
+            self.lead_sources = self.get_or_create_lead_sources()
+            customer_ids = self.create_customers(counts['customers'])
+            lead_ids = self.create_leads(counts['leads'])
+            won_quotes = self.create_quotes(counts['quotes'], lead_ids, customer_ids)
+            task_budgets = self.create_projects(counts['projects'], customer_ids, won_quotes)
+            self.create_timesheets(counts['timesheets'], task_budgets)
+
+            # Stored totals, rollups and the search index are maintained on save(), bulk inserts skip it
+            call_command('rebuild_quote_totals', batch_size=self.batch_size, stdout=self.stdout)
+            call_command('reconcile_timesheet_rollups', batch_size=self.batch_size, stdout=self.stdout)
+            call_command('rebuild_search_index', batch_size=self.batch_size, stdout=self.stdout)
+
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary}'))
+
+    # Helpers
+
+    def pick(self, weights):
+        return self.random.choices(list(weights), weights=list(weights.values()))[0]
+
+    def person(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def phone(self):
+        return f'05{self.random.randint(0, 8)}-{self.random.randint(1000000, 9999999)}'
+
+    def company(self):
+        return f'{self.random.choice(LAST_NAMES)} {self.random.choice(COMPANY_WORDS)}'
+
+    def bulk_create(self, model, objs):
+        """Insert in batches and return the objects (with their primary keys set)"""
+        objs = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        # bulk_create skips the signals that move the cached select choices to a new version
+        transaction.on_commit(lambda: bump_choices_version(model._meta.label_lower))
+        return objs
+
+    def notes_for(self, objs, chance=0.5):
+        content_type = ContentType.objects.get_for_model(objs[0].__class__) if objs else None
+        notes = [
+            Note(text=self.random.choice(['שיחת היכרות', 'ביקש הצעה מעודכנת', 'לחזור בשבוע הבא', 'נשלח חומר']),
+                 tagged=self.random.random() < 0.1, content_type=content_type, object_id=obj.pk)
+            for obj in objs if self.random.random() < chance
+        ]
+        self.bulk_create(Note, notes)
+
+    def chunks(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    # Generators
+
+    def get_or_create_services(self):
+        services = list(Service.objects.all())
+        if not services:
+            services = self.bulk_create(Service, [
+                Service(name=name, budget_type=budget_type, default_qty=qty, default_price=Decimal(price),
+                        is_subscription=name == 'תחזוקה חודשית')
+                for name, budget_type, qty, price in SERVICES
+            ])
+        return services
+
+    def get_or_create_lead_sources(self):
+        sources = list(LeadSource.objects.all())
+        if not sources:
+            sources = self.bulk_create(LeadSource, [LeadSource(name=name) for name in LEAD_SOURCES])
+        return sources
+
+    def create_customers(self, total):
+        customer_ids = []
+        for chunk in self.chunks(total):
+            customers = self.bulk_create(Customer, [
+                Customer(
+                    name=self.company(), legal_id=str(self.random.randint(500000000, 599999999)),
+                    lead_source=self.random.choice(self.lead_sources + [None]),
+                    website=f'https://example-{i}.co.il',
+                )
+                for i in chunk
+            ])
+            contacts = []
+            for customer in customers:
+                for n in range(self.random.randint(1, 3)):
+                    first_name, last_name = self.person()
+                    contacts.append(Contact(
+                        first_name=first_name, last_name=last_name, role=self.random.choice(ROLES),
+                        email=f'contact{customer.pk}-{n}@example.co.il', phone=self.phone(),
+                        contact_type='accounting' if n == 2 else 'normal', customer=customer, is_main=n == 0,
+                    ))
+            for contact in contacts:
+                contact.set_normalized_fields()
+            self.bulk_create(Contact, contacts)
+            self.notes_for(customers)
+            self.notes_for(contacts, chance=0.2)
+            customer_ids += [customer.pk for customer in customers]
+        return customer_ids
+
+    def create_leads(self, total):
+        lead_ids = []
+        for chunk in self.chunks(total):
+            leads = []
+            for i in chunk:
+                first_name, last_name = self.person()
+                leads.append(Lead(
+                    first_name=first_name, last_name=last_name, email=f'lead{i}-{self.random.randint(0, 10**6)}@example.co.il',
+                    phone=self.phone(), company_name=self.company(), role=self.random.choice(ROLES),
+                    status=self.pick(LEAD_STATUSES), lead_source=self.random.choice(self.lead_sources),
+                ))
+            for lead in leads:
+                lead.set_normalized_fields()
+            leads = self.bulk_create(Lead, leads)
+            self.notes_for(leads)
+            lead_ids += [lead.pk for lead in leads]
+        return lead_ids
+
+    def create_quotes(self, total, lead_ids, customer_ids):
+        """Quotes on leads and customers, each with 1-4 service lines and a payment split per line"""
+        lead_type = ContentType.objects.get_for_model(Lead)
+        customer_type = ContentType.objects.get_for_model(Customer)
+        targets = [(lead_type, lead_ids), (customer_type, customer_ids)]
+        targets = [(content_type, ids) for content_type, ids in targets if ids]
+        if total and not targets:
+            raise CommandError('Quotes need at least one lead or customer')
+
+        won_customer_quotes = []
+        for chunk in self.chunks(total):
+            quotes = []
+            for i in chunk:
+                content_type, ids = self.random.choices(targets, weights=[3, 7][-len(targets):])[0]
+                quotes.append(Quote(
+                    name=f'הצעת מחיר {i + 1}', status=self.pick(QUOTE_STATUSES),
+                    content_type=content_type, object_id=self.random.choice(ids),
+                ))
+            quotes = self.bulk_create(Quote, quotes)
+
+            quote_services = []
+            for quote in quotes:
+                for order in range(self.random.randint(1, 4)):
+                    service = self.random.choice(self.services)
+                    quote_services.append(Quote_Service(
+                        quote=quote, service=service, name=service.name, order=order,
+                        qty=Decimal(self.random.randint(1, service.default_qty * 2)),
+                        price=service.default_price,
+                    ))
+                if quote.status == 'won' and quote.content_type_id == customer_type.pk:
+                    won_customer_quotes.append((quote.pk, quote.object_id))
+            quote_services = self.bulk_create(Quote_Service, quote_services)
+
+            quote_payments = []
+            for quote_service in quote_services:
+                splits = self.random.choice([[100], [50, 50], [30, 70]])
+                for order, percent in enumerate(splits):
+                    quote_payments.append(Quote_Payment(
+                        quote_id=quote_service.quote_id, quote_service=quote_service, name=quote_service.name,
+                        order=order, percent=Decimal(percent),
+                        price=(quote_service.qty * quote_service.price * percent / 100).quantize(Decimal('0.01')),
+                    ))
+            self.bulk_create(Quote_Payment, quote_payments)
+            self.notes_for(quotes, chance=0.3)
+        return won_customer_quotes
+
+    def create_projects(self, total, customer_ids, won_quotes):
+        """
+        Projects with budgets, payments and tasks. The first projects come from won customer
+        quotes. Returns [(task id, active budget id)] for the timesheet generator.
+        """
+        project_type = ContentType.objects.get_for_model(Project)
+        task_budgets = []
+        for chunk in self.chunks(total):
+            projects = []
+            for i in chunk:
+                quote_id, customer_id = won_quotes[i] if i < len(won_quotes) else (None, self.random.choice(customer_ids))
+                service = self.random.choice(self.services)
+                projects.append(Project(
+                    name=f'{service.name} {i + 1}', service=service, status=self.pick(PROJECT_STATUSES),
+                    customer_id=customer_id, quote_id=quote_id,
+                ))
+            projects = self.bulk_create(Project, projects)
+
+            budgets, payments, tasks = [], [], []
+            for project in projects:
+                service = project.service
+                active = ProjectBudget(name=service.name, qty=Decimal(service.default_qty),
+                                       price=service.default_price, project=project)
+                budgets.append(active)
+                if self.random.random() < 0.3:
+                    budgets.append(ProjectBudget(name=f'{service.name} (קודם)', qty=Decimal(service.default_qty),
+                                                 price=service.default_price, project=project, is_active=False))
+                for n in range(self.random.randint(1, 4)):
+                    status = self.pick(PAYMENT_STATUSES)
+                    payments.append(Payment(
+                        name=f'{service.name} - תשלום {n + 1}', service=service, project=project, status=status,
+                        qty=Decimal(self.random.randint(1, 5)), price=service.default_price,
+                        invoice_date=date.today() - timedelta(days=self.random.randint(0, 365)) if status != 'draft' else None,
+                    ))
+                for n in range(self.random.randint(1, 5)):
+                    tasks.append((active, Task(
+                        title=self.random.choice(TASK_TITLES), urgency=self.pick(URGENCIES),
+                        is_completed=self.random.random() < 0.4, content_type=project_type, object_id=project.pk,
+                    )))
+            self.bulk_create(ProjectBudget, budgets)
+            self.bulk_create(Payment, payments)
+            self.bulk_create(Task, [task for budget, task in tasks])
+            self.notes_for(projects, chance=0.3)
+            task_budgets += [(task.pk, budget.pk) for budget, task in tasks]
+        return task_budgets
+
+    def create_timesheets(self, total, task_budgets):
+        if total and not task_budgets:
+            raise CommandError('Timesheets need at least one project task')
+        for chunk in self.chunks(total):
+            timesheets = []
+            for i in chunk:
+                task_id, budget_id = self.random.choice(task_budgets)
+                timesheets.append(Timesheet(
+                    task_id=task_id, budget_id=budget_id, description='עבודה שוטפת',
+                    hours=Decimal(self.random.randint(1, 16)) / 2, is_billed=self.random.random() < 0.5,
+                    date=date.today() - timedelta(days=self.random.randint(0, 365)),
+                ))
+            self.bulk_create(Timesheet, timesheets)
@@ -0,0 +1,32 @@
+from django.db import models
+from core.contact_info import format_phone, normalize_email, normalize_phone
+
+
+class NormalizedContactFields(models.Model):
+    """
+    Indexed E.164 phone and lowercased email columns, derived from the free-text phone / email
+    fields on every save. Duplicate lookups (core.dedup) match on these instead of the raw columns.
+    """
+    phone_normalized = models.CharField(max_length=20, blank=True, null=True, editable=False, db_index=True)
+    email_normalized = models.CharField(max_length=254, blank=True, null=True, editable=False, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def set_normalized_fields(self):
+        """Fill the normalized columns, call it before bulk_create since that skips save()"""
+        self.phone_normalized = normalize_phone(self.phone)
+        self.email_normalized = normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        self.set_normalized_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'phone', 'email'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized', 'email_normalized'}
+        super().save(*args, **kwargs)
+
+    @property
+    def phone_number(self):
+        if self.phone_normalized:
+            return format_phone(self.phone_normalized)
+        return self.phone or ''
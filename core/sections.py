@@ -0,0 +1,75 @@
+from django.http import Http404
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from core.fragments import Fragment
+
+
+class Section:
+    """
+    One tab of a detail page: its template and the function building its context from the page's object.
+    A `cached` tab is a core.fragments.Fragment keyed on the object's updated_at (and the `versions` of
+    the choice models it shows), so its children must touch the object (core.fragments.TOUCH_PARENTS)
+    and its template can't hold a CSRF token.
+    """
+
+    def __init__(self, template, context=None, cached=False, versions=()):
+        self.template = template
+        self.context = context or (lambda obj: {})
+        self.cached = cached
+        self.versions = versions
+
+
+class DetailSections:
+    """
+    The tabs of a detail page that are rendered on their own. The page renders the active tab only
+    (the ?section= one, `default` otherwise), every other tab is a placeholder fetched from the section
+    endpoint the first time it is opened and kept in the page from then on (base/section.html).
+    url_name    - the section endpoint, reversed with (object id, section name)
+    object_name - the context name of the page's object in the section templates
+    sections    - section name -> Section, each with the queries of its own tab only
+    """
+
+    def __init__(self, url_name, object_name, sections, default):
+        self.url_name = url_name
+        self.object_name = object_name
+        self.sections = sections
+        self.default = default
+        self.fragments = {
+            name: Fragment(section.template, object_name, versions=section.versions)
+            for name, section in sections.items() if section.cached
+        }
+
+    def active(self, request):
+        section = request.GET.get('section')
+        return section if section in self.sections else self.default
+
+    def render(self, request, obj, name):
+        """The html of a section, its context is only built when it isn't cached"""
+        section = self.sections[name]
+        if name in self.fragments:
+            return self.fragments[name].render(request, obj, section.context)
+        context = {self.object_name: obj, **section.context(obj)}
+        return render_to_string(section.template, context, request=request)
+
+    def _section(self, request, obj, name, active):
+        return {
+            'name': name,
+            'url': reverse(self.url_name, args=(obj.pk, name)),
+            'active': active,
+            'html': self.render(request, obj, name) if active else '',
+        }
+
+    def page_context(self, request, obj):
+        """Context of the detail page: the `sections` placeholders, the active one rendered"""
+        active = self.active(request)
+        return {
+            'sections': {name: self._section(request, obj, name, name == active) for name in self.sections},
+        }
+
+    def response(self, request, obj, name):
+        """A single section, as swapped into the page in place of its placeholder"""
+        if name not in self.sections:
+            raise Http404
+        return render(request, 'base/section.html', {'section': self._section(request, obj, name, True)})
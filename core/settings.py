@@ -1,4 +1,5 @@
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'theme',
     #'django_htmx',
     # My Apps
+    'core',
     'users',
     'leads',
     'activities',
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
     'contacts',
     'projects',
     'payments',
+    'search',
+    'imports',
 ]
 
 
@@ -56,6 +60,7 @@ if DEBUG:
 
 
 MIDDLEWARE = [
+    "core.instrumentation.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -92,15 +97,122 @@ TEMPLATES = [
 WSGI_APPLICATION = "core.wsgi.application"
 
 
+# Request instrumentation (core/instrumentation.py)
+# Query budgets are keyed by URL name and include the session and user lookups.
+# STRICT turns an exceeded budget into an exception, so N+1 regressions fail the test run. The test
+# runner turns it on (core/test_runner.py), INSTRUMENTATION_STRICT=1 does elsewhere.
+
+INSTRUMENTATION = {
+    'ENABLED': DEBUG or os.environ.get('INSTRUMENTATION_ENABLED') == '1',
+    'HEADERS': True,
+    'LOG': True,
+    'STRICT': os.environ.get('INSTRUMENTATION_STRICT') == '1',
+    'DEFAULT_QUERY_BUDGET': None,
+    'QUERY_BUDGETS': {
+        'customer-list': 8,
+        'customer-card': 8,
+        'lead-list': 8,
+        'lead-kanban': 10,
+        'lead-kanban-column': 8,
+        'quote-list': 10,
+        'quote-kanban': 10,
+        'quote-kanban-column': 8,
+        'project-list': 8,
+        'contact-list': 8,
+        'payment-list': 8,
+        'select-choices': 4,
+        'search': 4,
+    },
+}
+
+TEST_RUNNER = 'core.test_runner.StrictInstrumentationRunner'
+
+if INSTRUMENTATION['ENABLED']:
+    # Time template rendering through the instrumented backend
+    TEMPLATES[0]["BACKEND"] = "core.instrumentation.InstrumentedDjangoTemplates"
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('INSTRUMENTATION_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
-
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Selected with DB_ENGINE=sqlite (default) or DB_ENGINE=postgres, see database.md
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DB_POOL = os.environ.get("DB_POOL", "1") == "1"
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "jetpocrm"),
+            "USER": os.environ.get("DB_USER", "jetpocrm"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # The native pool replaces persistent connections, Django rejects using both
+            "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                    "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                    "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                } if DB_POOL else False,
+            },
+        }
+    }
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # Take the write lock when the transaction starts, so concurrent writers wait
+                # on the busy timeout instead of failing with "database is locked" mid transaction
+                "transaction_mode": "IMMEDIATE",
+                "timeout": int(os.environ.get("DB_TIMEOUT", "20")),
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA foreign_keys=ON;"
+                    "PRAGMA temp_store=MEMORY;"
+                    "PRAGMA cache_size=-20000;"
+                    "PRAGMA mmap_size=134217728;"
+                    "PRAGMA journal_size_limit=67108864;"
+                ),
+            },
+        }
+    }
+else:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE {DB_ENGINE!r}, use 'sqlite' or 'postgres'")
+
+
+# Cache
+# The cached fragments (core/fragments.py) and the select choice set versions (core/choices.py) must be
+# shared by all the worker processes, point REDIS_URL at a Redis server in production. Without it every
+# process keeps its own local memory cache, which is enough for a single process (runserver, tests).
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
     }
-}
 
 
 # Password validation
@@ -127,6 +239,13 @@ AUTH_PASSWORD_VALIDATORS = [
 
 LANGUAGE_CODE = "he-il"
 TIME_ZONE = "Israel"
+
+# Region assumed for phone numbers entered without a country code
+PHONE_DEFAULT_REGION = "IL"
+
+# Bearer tokens of the lead sources allowed to push to the lead intake API (comma separated)
+LEAD_INTAKE_TOKENS = [token for token in os.environ.get("LEAD_INTAKE_TOKENS", "").split(",") if token]
+
 USE_I18N = True
 USE_L10N = True
 USE_TZ = True
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class StrictInstrumentationRunner(DiscoverRunner):
+    """
+    Runs the tests with the request instrumentation (core.instrumentation) on in strict mode, so a view
+    running more queries than its budget fails the test that requested it
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._strict_instrumentation = override_settings(
+            INSTRUMENTATION={**settings.INSTRUMENTATION, 'ENABLED': True, 'STRICT': True},
+        )
+        self._strict_instrumentation.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._strict_instrumentation.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,464 @@
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from activities.models import Note, Service, Task, Timesheet
+from customers.models import Customer
+from leads.models import Lead
+from leads.views import LEAD_LIST
+from payments.models import Payment
+from projects.models import Project, ProjectBudget
+from quotes.forms import QuoteServiceForm
+from quotes.models import Quote, Quote_Payment, Quote_Service
+from .bulk import bulk_delete, bulk_update
+from .choices import choices_version, model_choices
+from .export import _xlsx_stream
+from .fragments import touch
+from .instrumentation import QueryBudgetExceeded
+from .kanban import kanban_columns, kanban_page
+from .listing import encode_cursor, paginate_list
+
+
+class KanbanTests(TestCase):
+
+    def setUp(self):
+        self.leads = {
+            status: [Lead.objects.create(first_name=f'{status} {n}', status=status) for n in range(count)]
+            for status, count in (('new', 7), ('follow', 1))
+        }
+        # Ties on the sort key are broken by the id
+        Lead.objects.filter(status='new').update(created_at=timezone.now())
+
+    def test_first_page_of_every_column_in_one_query(self):
+        with self.assertNumQueries(2):
+            columns = {column['key']: column for column in kanban_columns(Lead.objects.all(), Lead.LEAD_STATUSES, page_size=3)}
+
+        self.assertEqual(list(columns), [key for key, _ in Lead.LEAD_STATUSES])
+        new = columns['new']
+        self.assertEqual((new['count'], new['has_more']), (7, True))
+        self.assertEqual(new['cards'], self.leads['new'][::-1][:3])
+        self.assertEqual((columns['follow']['cards'], columns['follow']['cursor']), (self.leads['follow'], None))
+        self.assertEqual((columns['won']['count'], columns['won']['cards']), (0, []))
+
+    def test_pages_cover_the_column_without_duplicates_or_gaps(self):
+        cursor = kanban_columns(Lead.objects.all(), Lead.LEAD_STATUSES, page_size=3)[0]['cursor']
+        seen = self.leads['new'][::-1][:3]
+        while cursor:
+            cards, cursor = kanban_page(Lead.objects.all(), 'new', cursor, page_size=3)
+            seen += cards
+
+        self.assertEqual(seen, self.leads['new'][::-1])
+
+    def test_cards_moved_meanwhile_do_not_shift_the_page(self):
+        first, cursor = kanban_page(Lead.objects.all(), 'new', page_size=3)
+        Lead.objects.filter(pk=first[0].pk).update(status='follow')
+
+        cards, _ = kanban_page(Lead.objects.all(), 'new', cursor, page_size=3)
+
+        self.assertEqual(cards, self.leads['new'][::-1][3:6])
+
+    def test_invalid_cursors_are_rejected(self):
+        other_sort = encode_cursor('first_name', self.leads['new'][0])
+        for cursor in ('bogus', other_sort):
+            with self.assertRaises(ValueError):
+                kanban_page(Lead.objects.all(), 'new', cursor)
+
+    def test_column_endpoint(self):
+        _, cursor = kanban_page(Lead.objects.all(), 'new', page_size=3)
+
+        response = self.client.get('/leads/api/kanban-column', {'status': 'new', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.leads['new'][3].first_name, response.json()['html'])
+
+        for params in ({'status': 'new', 'cursor': 'bogus'}, {'status': 'unknown'}):
+            self.assertEqual(self.client.get('/leads/api/kanban-column', params).status_code, 400)
+
+
+class ListingTests(TestCase):
+
+    def setUp(self):
+        self.leads = [Lead.objects.create(first_name=name) for name in ['Dana', 'Ron', 'Avi', 'Noa', 'Tal'] * 5]
+
+    def page(self, **params):
+        return paginate_list(RequestFactory().get('/leads/table', params), Lead.objects.all(), LEAD_LIST)
+
+    def page_through(self, sort):
+        """The rows of every page, each fetched with the cursor of the previous one"""
+        page = self.page(sort=sort, page_size=10)
+        self.assertEqual(page.total_count, 25)
+        rows = page.rows
+        while page.has_more:
+            page = self.page(sort=sort, page_size=10, cursor=page.next_cursor)
+            self.assertIsNone(page.total_count)
+            rows += page.rows
+        return rows
+
+    def test_keyset_pages_cover_the_list_in_order(self):
+        # first_name has five rows per value, the pages break the ties on the id
+        rows = self.page_through('first_name')
+        self.assertEqual(rows, sorted(self.leads, key=lambda lead: (lead.first_name, lead.pk)))
+
+        rows = self.page_through('-first_name')
+        self.assertEqual(rows, sorted(self.leads, key=lambda lead: (lead.first_name, lead.pk), reverse=True))
+
+    def test_sort_and_page_size_are_whitelisted(self):
+        page = self.page(sort='email', page_size=7)
+
+        self.assertEqual((page.sort, page.page_size), ('-created_at', 50))
+
+    def test_search_and_filters(self):
+        Lead.objects.filter(first_name='Noa').update(status='won')
+
+        page = self.page(q='no', status='won')
+
+        self.assertEqual((page.total_count, page.filters, page.query), (5, {'status': 'won'}, 'no'))
+
+    def test_invalid_cursors_are_rejected(self):
+        tampered = self.page(page_size=10).next_cursor[:-2] + 'xx'
+        other_sort = self.page(sort='status', page_size=10).next_cursor
+        for cursor in ('bogus', tampered, other_sort):
+            with self.assertRaises(BadRequest):
+                self.page(page_size=10, cursor=cursor)
+
+        response = self.client.get('/leads/table', {'fragment': 'rows', 'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChoicesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name='Design', budget_type='hourly', default_qty=1, default_price=100)
+
+    def test_widgets_render_without_queries(self):
+        model_choices('activities.service')
+
+        with self.assertNumQueries(0):
+            html = ''.join(str(QuoteServiceForm(prefix=f'service-{n}')['service']) for n in range(30))
+
+        self.assertEqual(html.count('/select-choices/activities.service'), 30)
+
+    def test_saving_or_deleting_a_choice_row_moves_the_version(self):
+        version = choices_version('activities.service')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.name = 'Branding'
+            self.service.save()
+        renamed = choices_version('activities.service')
+        self.assertNotEqual(renamed, version)
+        self.assertEqual(model_choices('activities.service'), (renamed, [{'value': str(self.service.pk), 'label': 'Branding'}]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.delete()
+        self.assertEqual(model_choices('activities.service')[1], [])
+
+    def test_touching_a_customer_keeps_the_version(self):
+        customer = Customer.objects.create(name='Acme', legal_id='1')
+        project = Project.objects.create(name='Website', customer=customer)
+        version = choices_version('customers.customer')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(name='Advance', qty=1, price=100, project=project)
+
+        customer.refresh_from_db()
+        self.assertGreater(customer.updated_at, project.created_at)
+        self.assertEqual(choices_version('customers.customer'), version)
+
+    def test_a_lost_version_starts_over_from_the_clock(self):
+        version = choices_version('leads.leadsource')
+        cache.clear()
+
+        self.assertGreater(choices_version('leads.leadsource'), version)
+
+
+class InstrumentationTests(TestCase):
+
+    def test_the_test_runner_is_strict(self):
+        self.assertTrue(settings.INSTRUMENTATION['ENABLED'])
+        self.assertTrue(settings.INSTRUMENTATION['STRICT'])
+
+    def test_requests_within_budget_report_their_queries(self):
+        response = self.client.get('/leads/table')
+
+        self.assertLessEqual(int(response['X-Query-Count']), settings.INSTRUMENTATION['QUERY_BUDGETS']['lead-list'])
+
+    def test_an_exceeded_budget_raises(self):
+        Lead.objects.create(first_name='Dana')
+        budgets = {**settings.INSTRUMENTATION['QUERY_BUDGETS'], 'lead-list': 1}
+
+        with self.settings(INSTRUMENTATION={**settings.INSTRUMENTATION, 'QUERY_BUDGETS': budgets}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'lead-list ran'), self.assertLogs('core.instrumentation', 'WARNING'):
+                self.client.get('/leads/table')
+
+
+class BulkActionTests(TestCase):
+    """The mass actions run the same queries however many rows they cascade through"""
+
+    def leads(self, count):
+        lead_type = ContentType.objects.get_for_model(Lead)
+        leads = []
+        for n in range(count):
+            lead = Lead.objects.create(first_name=f'Lead {n}')
+            quote = Quote.objects.create(content_type=lead_type, object_id=lead.pk, name=f'Quote {n}')
+            line = Quote_Service.objects.create(quote=quote, name='Design', qty=1, price=1000)
+            Quote_Payment.objects.create(quote=quote, quote_service=line, name='Advance', price=500, percent=50)
+            Note.objects.create(content_type=lead_type, object_id=lead.pk, text='Called')
+            Task.objects.create(title='Follow up', content_type=lead_type, object_id=lead.pk)
+            leads.append(lead)
+        return [lead.pk for lead in leads]
+
+    def customers(self, count):
+        customers = []
+        for n in range(count):
+            customer = Customer.objects.create(name=f'Customer {n}', legal_id=str(n))
+            project = Project.objects.create(name=f'Project {n}', customer=customer)
+            budget = ProjectBudget.objects.create(name='Design', qty=10, price=100, project=project)
+            task = Task.objects.create(
+                title='Mockups', content_type=ContentType.objects.get_for_model(Project), object_id=project.pk,
+            )
+            Timesheet.objects.create(hours=2, description='Homepage', task=task, budget=budget)
+            Payment.objects.create(name='Advance', qty=1, price=100, project=project)
+            customers.append(customer)
+        return [customer.pk for customer in customers]
+
+    def queries(self, action, *args, **kwargs):
+        """The number of queries of the action, including its on commit work"""
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            action(*args, **kwargs)
+        return len(queries)
+
+    def test_deleting_leads_through_their_quotes_notes_and_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            few, many = self.leads(2), self.leads(6)
+
+        self.assertEqual(self.queries(bulk_delete, Lead, few), self.queries(bulk_delete, Lead, many))
+        self.assertFalse(Lead.objects.exists() or Quote.objects.exists() or Note.objects.exists())
+
+    def test_deleting_customers_through_their_projects_and_payments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            few, many = self.customers(2), self.customers(6)
+
+        self.assertEqual(self.queries(bulk_delete, Customer, few), self.queries(bulk_delete, Customer, many))
+        self.assertFalse(Customer.objects.exists() or Project.objects.exists())
+
+    def test_updating_tasks_touches_their_parents_together(self):
+        lead_type = ContentType.objects.get_for_model(Lead)
+        with self.captureOnCommitCallbacks(execute=True):
+            few, many = [
+                [Task.objects.create(title='Call', content_type=lead_type, object_id=pk).pk for pk in self.leads(count)]
+                for count in (2, 6)
+            ]
+
+        self.assertEqual(
+            self.queries(bulk_update, Task, few, is_completed=True),
+            self.queries(bulk_update, Task, many, is_completed=True),
+        )
+        self.assertFalse(Task.objects.filter(pk__in=few + many, is_completed=False).exists())
+
+
+class ExportTests(TestCase):
+    SPREADSHEET = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+    def setUp(self):
+        self.dana = Lead.objects.create(first_name='Dana', email='dana@example.com', status='won')
+        self.formula = Lead.objects.create(first_name='=HYPERLINK("http://x")', last_name='-1', company_name='@SUM(A1)')
+
+    def export(self, **params):
+        response = self.client.get('/leads/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def csv_rows(self, **params):
+        content = self.export(format='csv', **params).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(content[1:])))
+
+    def xlsx_rows(self, **params):
+        archive = zipfile.ZipFile(io.BytesIO(self.export(format='xlsx', **params)))
+        self.assertIsNone(archive.testzip())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        return [[''.join(cell.itertext()) for cell in row] for row in sheet.iter(f'{self.SPREADSHEET}row')]
+
+    def test_csv_header_and_choice_labels(self):
+        header, *rows = self.csv_rows(ids=str(self.dana.pk))
+
+        self.assertEqual(header[:3], ['מזהה', 'שם פרטי', 'שם משפחה'])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0][1], rows[0][3], rows[0][7]), ('Dana', 'dana@example.com', 'ליד מומר'))
+
+    def test_the_ids_narrow_the_export(self):
+        self.assertEqual(len(self.csv_rows()), 3)
+        self.assertEqual(len(self.csv_rows(ids=f'{self.dana.pk},{self.formula.pk}')), 3)
+        self.assertEqual([row[0] for row in self.csv_rows(ids=str(self.formula.pk))[1:]], [str(self.formula.pk)])
+
+        self.assertEqual(self.client.get('/leads/export/', {'ids': 'x'}).status_code, 404)
+        self.assertEqual(self.client.get('/leads/export/', {'format': 'pdf'}).status_code, 404)
+
+    def test_formulas_are_exported_as_text(self):
+        row = self.csv_rows(ids=str(self.formula.pk))[1]
+
+        self.assertEqual((row[1], row[2], row[5]), ('\'=HYPERLINK("http://x")', "'-1", "'@SUM(A1)"))
+
+        row = self.xlsx_rows(ids=str(self.formula.pk))[1]
+        self.assertEqual((row[1], row[2], row[5]), ('\'=HYPERLINK("http://x")', "'-1", "'@SUM(A1)"))
+
+    def test_xlsx_is_a_valid_workbook(self):
+        header, *rows = self.xlsx_rows()
+
+        self.assertEqual(header[:3], ['מזהה', 'שם פרטי', 'שם משפחה'])
+        self.assertEqual(len(rows), 2)
+
+    def test_sheet_names_are_escaped(self):
+        content = b''.join(_xlsx_stream(['Name'], [['Dana']], 'Tom & "Jerry" [1]:2'))
+
+        workbook = ElementTree.fromstring(zipfile.ZipFile(io.BytesIO(content)).read('xl/workbook.xml'))
+        sheet = workbook.find(f'.//{self.SPREADSHEET}sheet')
+        self.assertEqual(sheet.get('name'), 'Tom & "Jerry" 12')
+
+
+class DetailSectionsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(name='Acme', legal_id='1')
+        self.project = Project.objects.create(name='Website', customer=self.customer)
+        self.budget = ProjectBudget.objects.create(name='Design', qty=10, price=100, project=self.project)
+        Task.objects.create(
+            title='Mockups', content_type=ContentType.objects.get_for_model(Project), object_id=self.project.pk,
+        )
+
+    def sections(self, **params):
+        response = self.client.get(f'/projects/{self.project.pk}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['sections']
+
+    def test_only_the_active_section_is_rendered(self):
+        sections = self.sections()
+
+        self.assertEqual([name for name, section in sections.items() if section['active']], ['tasks'])
+        self.assertIn('Mockups', sections['tasks']['html'])
+        self.assertEqual(sections['budgets']['html'], '')
+        self.assertEqual(sections['budgets']['url'], f'/projects/{self.project.pk}/section/budgets/')
+
+        self.assertIn('Design', self.sections(section='budgets')['budgets']['html'])
+        self.assertTrue(self.sections(section='unknown')['tasks']['active'])
+
+    def test_unknown_sections_are_not_found(self):
+        response = self.client.get(f'/projects/{self.project.pk}/section/unknown/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_sections_are_rendered_anew_once_the_owner_is_touched(self):
+        url = f'/projects/{self.project.pk}/section/budgets/'
+        self.client.get(url)
+        # update() sends no signals, the cached section keeps the old name until the project is touched
+        ProjectBudget.objects.filter(pk=self.budget.pk).update(name='Branding')
+
+        self.assertNotIn('Branding', self.client.get(url).content.decode())
+
+        touch(Project, [self.project.pk])
+
+        self.assertIn('Branding', self.client.get(url).content.decode())
+
+
+class FragmentInvalidationTests(TestCase):
+    """A cached section is rendered anew once a child it shows is saved or deleted"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer = Customer.objects.create(name='Acme', legal_id='1')
+            self.project = Project.objects.create(name='Website', customer=self.customer)
+            self.budget = ProjectBudget.objects.create(name='Design', qty=10, price=100, project=self.project)
+            self.service = Service.objects.create(name='Design', budget_type='hourly', default_qty=1, default_price=100)
+
+    def section(self, app, pk, name):
+        response = self.client.get(f'/{app}/{pk}/section/{name}/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_payments_of_the_project_and_customer(self):
+        self.section('projects', self.project.pk, 'payments')
+        self.section('customers', self.customer.pk, 'payments')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.create(name='Advance payment', qty=1, price=500, project=self.project)
+
+        self.assertIn('Advance payment', self.section('projects', self.project.pk, 'payments'))
+        self.assertIn('Advance payment', self.section('customers', self.customer.pk, 'payments'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+
+        self.assertNotIn('Advance payment', self.section('projects', self.project.pk, 'payments'))
+        self.assertNotIn('Advance payment', self.section('customers', self.customer.pk, 'payments'))
+
+    def test_quote_line_items_and_service_names(self):
+        quote = Quote.objects.create(
+            content_type=ContentType.objects.get_for_model(Customer), object_id=self.customer.pk, name='Website',
+        )
+        self.section('quotes', quote.pk, 'details')
+
+        line = Quote_Service.objects.create(quote=quote, service=self.service, name='Design', qty=1, price=1234)
+        self.assertIn('1,234', self.section('quotes', quote.pk, 'details'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.name = 'Branding'
+            self.service.save()
+        self.assertIn('Branding', self.section('quotes', quote.pk, 'details'))
+
+        line.delete()
+        self.assertNotIn('Branding', self.section('quotes', quote.pk, 'details'))
+
+    def test_timesheets_of_the_project(self):
+        task = Task.objects.create(
+            title='Mockups', content_type=ContentType.objects.get_for_model(Project), object_id=self.project.pk,
+        )
+        self.section('projects', self.project.pk, 'timesheets')
+
+        Timesheet.objects.create(hours=2, description='Homepage mockup', task=task, budget=self.budget)
+
+        self.assertIn('Homepage mockup', self.section('projects', self.project.pk, 'timesheets'))
+
+    def test_touch_bumps_the_parents(self):
+        project_stamp, customer_stamp = self.project.updated_at, self.customer.updated_at
+
+        touch(ProjectBudget, [self.budget.pk])
+
+        self.project.refresh_from_db()
+        self.customer.refresh_from_db()
+        self.assertGreater(self.project.updated_at, project_stamp)
+        self.assertGreater(self.customer.updated_at, customer_stamp)
+
+    def touched(self, queries):
+        """The tables whose updated_at the queries bumped"""
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        return sorted(sql.split()[1] for sql in updates if '"updated_at"' in sql)
+
+    def test_parents_are_touched_once_per_transaction(self):
+        for count in (2, 6):
+            payments = [Payment(name=f'Payment {n}', qty=1, price=100, project=self.project) for n in range(count)]
+            Payment.objects.bulk_create(payments)
+
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                Payment.objects.filter(project=self.project).delete()
+
+            self.assertEqual(self.touched(queries), ['"customers_customer"', '"projects_project"'])
+
+    def test_deleted_parents_are_not_touched(self):
+        Payment.objects.create(name='Advance', qty=1, price=100, project=self.project)
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+
+        self.assertEqual(self.touched(queries), ['"customers_customer"'])
@@ -3,7 +3,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from activities.views import task_list
+from activities.views import task_list, task_export
+from core.choices import select_choices
 
 urlpatterns = [
     path('', include('users.urls')),
@@ -14,7 +15,11 @@ urlpatterns = [
     path('activities/', include('activities.urls')),
     path('projects/', include('projects.urls')),
     path('payments/', include('payments.urls')),
+    path('search/', include('search.urls')),
+    path('imports/', include('imports.urls')),
     path('tasks/', task_list, name='task-list'),
+    path('tasks/export/', task_export, name='task-export'),
+    path('select-choices/<str:label>/', select_choices, name='select-choices'),
     path("admin/", admin.site.urls)
 ]
 
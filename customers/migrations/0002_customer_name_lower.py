@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 08:55
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('leads', '0002_normalized_contact_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='customer_name_lower'),
+        ),
+    ]
@@ -1,9 +1,43 @@
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Sum, Count, F, Q, OuterRef, DecimalField, ExpressionWrapper
+from django.db.models.functions import Lower
+from django.contrib.contenttypes.models import ContentType
 from leads.models import LeadSource
 from django.contrib.contenttypes.fields import GenericRelation
 from activities.models import Note
 from quotes.models import Quote
+from core.aggregates import subquery_aggregate
+
+
+class CustomerQuerySet(models.QuerySet):
+
+    def with_financials(self):
+        """
+        Annotate the open quotes, open projects and paid income of every customer
+        in a single SQL statement. The annotated values are used by the list and
+        card views instead of the per-object properties.
+        """
+        from projects.models import Project
+        from payments.models import Payment
+
+        customer_type = ContentType.objects.get_for_model(self.model)
+        money = DecimalField(max_digits=20, decimal_places=2)
+        open_quotes = Quote.objects.filter(
+            content_type=customer_type,
+            object_id=OuterRef('pk'),
+            status__in=['draft', 'sent'],
+        )
+        open_projects = Project.objects.filter(customer=OuterRef('pk'), status='open')
+        paid_payments = Payment.objects.filter(project__customer=OuterRef('pk'), status='paid')
+
+        return self.annotate(
+            open_quotes_count=subquery_aggregate(open_quotes, 'object_id', Count('pk'), models.IntegerField()),
+            open_quotes_value=subquery_aggregate(open_quotes, 'object_id', Sum('subtotal')),
+            open_projects_count=subquery_aggregate(open_projects, 'customer', Count('pk'), models.IntegerField()),
+            # The active budget of each project (Project.with_budget), as Customer.open_projects counts it
+            open_projects_value=subquery_aggregate(open_projects.with_budget(), 'customer', Sum('budget_amount')),
+            total_income_value=subquery_aggregate(paid_payments, 'project__customer', Sum(F('qty') * F('price'), output_field=money)),
+        )
 
 
 class Customer(models.Model):
@@ -25,12 +59,42 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CustomerQuerySet.as_manager()
+
     def __str__(self):
         return self.name
     
     class Meta:
         verbose_name = "לקוח"
         verbose_name_plural = "לקוחות"
+        indexes = [
+            # Case-insensitive name lookups of the duplicate detection (core.dedup)
+            models.Index(Lower('name'), name='customer_name_lower'),
+        ]
+
+    def project_summary(self):
+        """Project counts and active budget totals per status, in one query"""
+        from projects.models import Project
+
+        statuses = {'active': Q(status='open'), 'complete': Q(status='completed'), 'canceled': Q(status='canceled')}
+        aggregates = {'total_count': Count('pk'), 'total_price': Sum('budget_amount')}
+        for key, condition in statuses.items():
+            aggregates[f'{key}_count'] = Count('pk', filter=condition)
+            aggregates[f'{key}_price'] = Sum('budget_amount', filter=condition)
+        summary = Project.objects.filter(customer=self).with_budget().aggregate(**aggregates)
+        return {key: value or 0 for key, value in summary.items()}
+
+    def payment_summary(self):
+        """Payment counts and totals per status over all the customer's projects, in one query"""
+        from payments.models import Payment
+
+        amount = ExpressionWrapper(F('qty') * F('price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+        aggregates = {'total_count': Count('pk'), 'total_price': Sum(amount)}
+        for status in ('draft', 'billed', 'paid'):
+            aggregates[f'{status}_count'] = Count('pk', filter=Q(status=status))
+            aggregates[f'{status}_price'] = Sum(amount, filter=Q(status=status))
+        summary = Payment.objects.filter(project__customer=self).aggregate(**aggregates)
+        return {key: value or 0 for key, value in summary.items()}
 
 
     @property
@@ -1,3 +1,57 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 
-# Create your tests here.
+from payments.models import Payment
+from projects.models import Project, ProjectBudget
+from quotes.models import Quote, Quote_Service
+from .models import Customer
+
+
+class CustomerFinancialsTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Acme', legal_id='1')
+        customer_type = ContentType.objects.get_for_model(Customer)
+        for status, price in (('draft', 100), ('sent', 250), ('won', 1000)):
+            quote = Quote.objects.create(content_type=customer_type, object_id=self.customer.pk, name=status, status=status)
+            Quote_Service.objects.create(quote=quote, name='Design', qty=1, price=price)
+
+        website = Project.objects.create(name='Website', customer=self.customer)
+        # Only the latest active budget of a project counts, as on the project page
+        ProjectBudget.objects.create(name='First', qty=1, price=100, project=website)
+        ProjectBudget.objects.create(name='Current', qty=2, price=300, project=website)
+        ProjectBudget.objects.create(name='Old', qty=5, price=100, project=website, is_active=False)
+        closed = Project.objects.create(name='Closed', customer=self.customer, status='completed')
+        ProjectBudget.objects.create(name='Closed', qty=1, price=999, project=closed)
+
+        Payment.objects.create(name='Advance', qty=1, price=400, project=website, status='paid')
+        Payment.objects.create(name='Final', qty=2, price=50, project=closed, status='paid')
+        Payment.objects.create(name='Later', qty=1, price=700, project=website, status='draft')
+        Customer.objects.create(name='Empty', legal_id='2')
+
+    def test_annotations_match_the_properties(self):
+        customers = Customer.objects.with_financials().order_by('name')
+        acme = customers.get(pk=self.customer.pk)
+
+        self.assertEqual((acme.open_quotes_count, acme.open_quotes_value), (2, Decimal('350')))
+        self.assertEqual((acme.open_projects_count, acme.open_projects_value), (1, Decimal('600')))
+        self.assertEqual(acme.total_income_value, Decimal('500'))
+
+        self.assertEqual(self.customer.open_quotes, {'count': 2, 'value': Decimal('350')})
+        self.assertEqual(self.customer.open_projects, {'count': 1, 'value': Decimal('600')})
+        self.assertEqual(self.customer.total_income, Decimal('500'))
+
+    def test_customers_without_rows_are_zero(self):
+        empty = Customer.objects.with_financials().get(name='Empty')
+
+        self.assertEqual(
+            (empty.open_quotes_count, empty.open_quotes_value, empty.open_projects_count,
+             empty.open_projects_value, empty.total_income_value),
+            (0, 0, 0, 0, 0),
+        )
+
+    def test_one_query_for_the_list(self):
+        with self.assertNumQueries(1):
+            list(Customer.objects.with_financials())
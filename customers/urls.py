@@ -8,8 +8,7 @@ urlpatterns = [
     path('<pk>/edit/<fallback>', views.customer_edit, name='customer-edit'),
     path('<pk>/delete', views.customer_delete, name='customer-delete'),
     path('massdelete/', views.customer_mass_delete, name='customer-mass-delete'),
+    path('export/', views.customer_export, name='customer-export'),
     path('<pk>/', views.customer_detail, name='customer-detail'),
-    path('<pk>/note/new', views.customer_submit_note, name='customer-submit-note'),
-    path('api/note/<noteid>/delete', views.customer_delete_note, name='customer-delete-note'),
-    path('api/note/<noteid>/tagging', views.customer_tag_note, name='customer-tag-note'),
+    path('<pk>/section/<str:section>/', views.customer_section, name='customer-section'),
 ]
\ No newline at end of file
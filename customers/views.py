@@ -1,20 +1,58 @@
 from django.shortcuts import render, redirect
-from django.urls import reverse
-from urllib.parse import urlencode
 from .models import Customer
 from .forms import CustomerForm
-from activities.models import Note
-
+from activities.services import note_summary, notes_context
+from django.http import JsonResponse
+from core.bulk import bulk_delete, BulkActionError
+from core.fragments import Fragment
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response
+from core.sections import DetailSections, Section
+
+
+CUSTOMER_LIST = ListSpec(
+    sort_fields=['name', 'legal_id'],
+    search_fields=['name', 'legal_id'],
+    filters={'lead_source': 'lead_source_id'},
+)
+
+CUSTOMER_EXPORT = ExportSpec(columns=[
+    ('מזהה', 'id'),
+    ('שם', 'name'),
+    ('ח.פ / ע.מ', 'legal_id'),
+    ('אתר', 'website'),
+    ('מקור ליד', 'lead_source__name'),
+    ('הצעות מחיר פתוחות', 'open_quotes_count'),
+    ('שווי הצעות פתוחות', 'open_quotes_value'),
+    ('פרויקטים פתוחים', 'open_projects_count'),
+    ('שווי פרויקטים פתוחים', 'open_projects_value'),
+    ('הכנסות', 'total_income_value'),
+    ('תאריך יצירה', 'created_at'),
+])
+
+# The financials are only aggregated for the rows missing from the cache
+CUSTOMER_ROW = Fragment(
+    'customers/partials/list_row.html', 'customer', related=('lead_source',),
+    load=lambda: Customer.objects.select_related('lead_source').with_financials(),
+)
 
 def customer_list(request):
-    customers = Customer.objects.all()
+    page = paginate_list(request, Customer.objects.select_related('lead_source'), CUSTOMER_LIST)
+    page.rows = CUSTOMER_ROW.render_many(request, page.rows)
+    if is_rows_request(request):
+        return rows_response(request, 'customers/partials/list_rows.html', 'customers', page)
+
     context = {
-        'customers': customers,
+        'customers': page.rows,
+        'page': page,
     }
     return render(request, 'customers/customers-list.html', context)
 
+def customer_export(request):
+    return export_response(request, Customer.objects.with_financials(), CUSTOMER_LIST, CUSTOMER_EXPORT, 'customers')
+
 def customer_card(request):
-    customers = Customer.objects.all()
+    customers = Customer.objects.with_financials()
     context = {
         'customers': customers,
     }
@@ -57,159 +95,47 @@ def customer_delete(request, pk):
         customer.delete()
         return redirect(fallback)
 
+CUSTOMER_SECTIONS = DetailSections(
+    'customer-section', 'customer',
+    sections={
+        'notes': Section('base/notes.html', notes_context),
+        'quotes': Section('customers/sections/quotes.html', lambda customer: {
+            'quotes': customer.quotes.all(),
+            'quoteInfo': customer.quotes.statistics(),
+        }, cached=True),
+        'projects': Section('customers/sections/projects.html', lambda customer: {
+            # with_budget() annotates the budget amount every card shows
+            'projects': customer.projects.select_related('service').with_budget(),
+            'projectInfo': customer.project_summary(),
+        }, cached=True, versions=('activities.service',)),
+        'contacts': Section('customers/sections/contacts.html', lambda customer: {'contacts': customer.contacts.all()}),
+        'payments': Section('customers/sections/payments.html', lambda customer: {
+            'payments': customer.payments.select_related('project'),
+            'paymentInfo': customer.payment_summary(),
+        }, cached=True),
+    },
+    default='projects',
+)
+
 def customer_detail(request, pk):
     customer = Customer.objects.get(pk=pk)
-    tagged_note = customer.notes.all().filter(tagged=True).first()
-    quote_total_price = 0
-    quote_total_count = 0
-    quote_active_price = 0
-    quote_active_count = 0
-    quote_won_price = 0
-    quote_won_count = 0
-    quote_lost_price = 0
-    quote_lost_count = 0
-    project_total_price = 0
-    project_total_count = 0
-    project_active_price = 0
-    project_active_count = 0
-    project_complete_count = 0
-    project_complete_price = 0
-    project_process_count = 0
-    project_process_price = 0
-    project_canceled_count = 0
-    project_canceled_price = 0
-    payment_total_count = 0
-    payment_total_price = 0
-    payment_draft_count = 0
-    payment_draft_price = 0
-    payment_billed_count = 0
-    payment_billed_price = 0
-    payment_paid_count = 0
-    payment_paid_price = 0
-
-
-    for p in customer.projects.all():
-        project_total_price += p.budget['amount']
-        project_total_count += 1
-        if p.status == 'completed':
-            project_complete_count += 1
-            project_complete_price += p.budget['amount']
-        if p.status == 'open':
-            project_active_count += 1
-            project_active_price += p.budget['amount']
-        if p.status == 'canceled':
-            project_canceled_count += 1
-            project_canceled_price += p.budget['amount']
-        for payment in p.payments.all():
-            payment_total_count += 1
-            payment_total_price += payment.total_price
-            if payment.status == 'draft':
-                payment_draft_count += 1
-                payment_draft_price += payment.total_price
-            if payment.status == 'billed':
-                payment_billed_count += 1
-                payment_billed_price += payment.total_price
-            if payment.status == 'paid':
-                payment_paid_count += 1
-                payment_paid_price += payment.total_price
-
-    projectInfo = {
-        'total_price': project_total_price,
-        'total_count': project_total_count,
-        'active_price': project_active_price,
-        'active_count': project_active_count,
-        'complete_count': project_complete_count,
-        'complete_price': project_complete_price,
-        'canceled_price': project_canceled_price,
-        'canceled_count': project_canceled_count
-    }
-
-    paymentInfo = {
-        'total_count': payment_total_count,
-        'total_price': payment_total_price,
-        'draft_count': payment_draft_count,
-        'draft_price': payment_draft_price,
-        'billed_count': payment_billed_count,
-        'billed_price': payment_billed_price,
-        'paid_count': payment_paid_count,
-        'paid_price': payment_paid_price,
-    }
-
-    for q in customer.quotes.all():
-        quote_total_price += q.total_price
-        quote_total_count += 1
-        if (q.status == 'draft' or q.status == 'sent'):
-            quote_active_price += q.total_price
-            quote_active_count += 1
-        elif q.status == 'won':
-            quote_won_price += q.total_price
-            quote_won_count += 1
-        elif q.status == 'lost':
-            quote_lost_price += q.total_price
-            quote_lost_count += 1
-    
-    quoteInfo = {
-        'total_price': quote_total_price,
-        'total_count': quote_total_count,
-        'active_price': quote_active_price,
-        'active_count': quote_active_count,
-        'won_price': quote_won_price,
-        'won_count': quote_won_count,
-        'lost_count': quote_lost_count,
-        'lost_price': quote_lost_price,
-    }
-
 
     context = {
         'customer': customer,
-        'tagged_note': tagged_note,
-        'quoteInfo': quoteInfo,
-        'projectInfo': projectInfo,
-        'paymentInfo': paymentInfo,
+        **note_summary(customer),
+        **CUSTOMER_SECTIONS.page_context(request, customer),
     }
     return render(request, 'customers/customer-detail.html', context)
 
-def customer_submit_note(request, pk):
-    customer = Customer.objects.get(pk = pk)
-    note = Note.objects.create(
-        text = request.POST['note'],
-        content_object = customer
-    )
-    base_url = reverse('customer-detail', args=(pk,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def customer_delete_note(request, noteid):
-    note = Note.objects.get(pk=noteid)
-    customer = Customer.objects.get(pk=note.object_id)
-    note.delete()
-    base_url = reverse('customer-detail', args=(customer.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def customer_tag_note(request, noteid):
-    # remove tag from all Notes for this Lead
-    note = Note.objects.get(pk=noteid)
-    if note.tagged:
-        note.tagged = False
-    else:
-        all_notes = Note.objects.filter(object_id=note.content_object.id).update(tagged=False)
-        note.tagged = True
-    note.save()
-    base_url = reverse('customer-detail', args=(note.content_object.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
+def customer_section(request, pk, section):
+    customer = Customer.objects.get(pk=pk)
+    return CUSTOMER_SECTIONS.response(request, customer, section)
 
 def customer_mass_delete(request):
     if request.method == "POST":
         fallback = request.POST['fallback']
-        customerList = request.POST['customerList']
-        customerList = customerList.split(',')
-        for l in customerList:
-            l = int(l)
-            customer = Customer.objects.get(pk=l)
-            customer.delete()
+        try:
+            bulk_delete(Customer, request.POST['customerList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect(fallback)
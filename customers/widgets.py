@@ -1,8 +1,22 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
+from core.choices import CHOICE_MODELS, choices_source, model_choices
 import json
 
 
+def _select_config(config):
+    """Widget state for the shared Alpine select components (static/js/custom-select.js)"""
+    return escape(json.dumps(config))
+
+
+def _selected_option(value, label):
+    if not value:
+        return ''
+    return f'<option value="{escape(value)}" selected>{escape(label)}</option>'
+
+
 class CustomFileInput(forms.FileInput):
     """
     Custom file input widget with drag-and-drop support and image preview.
@@ -173,89 +187,38 @@ class CustomSelect(forms.Select):
             attrs = {}
         attrs = {**self.attrs, **attrs}
 
-        # Build options list
-        options = []
-        for option_value, option_label in self.choices:
-            # Skip empty choice
-            if option_value == '':
-                continue
-            selected = str(option_value) == str(value) if value else False
-            options.append({
-                'value': str(option_value),
-                'label': str(option_label),
-                'selected': selected
-            })
+        value = str(value) if value else ''
+
+        # Model backed choices come from the shared, versioned choice set and are loaded
+        # by the browser once per page; small static choice lists are rendered inline
+        config = {}
+        options = None
+        if isinstance(self.choices, ModelChoiceIterator) and not self.choices.queryset.query.has_filters():
+            label = self.choices.queryset.model._meta.label_lower
+            if label in CHOICE_MODELS:
+                version, options = model_choices(label)
+                config['source'] = choices_source(label, version)
+        if options is None:
+            options = [{'value': str(option_value), 'label': str(option_label)}
+                       for option_value, option_label in self.choices if option_value != '']
+            config['options'] = options
 
         # Get selected label
         selected_label = ''
-        for opt in options:
-            if opt['selected']:
-                selected_label = opt['label']
-                break
+        if value:
+            selected_label = next((opt['label'] for opt in options if opt['value'] == value), '')
 
-        # Check if this widget should support dynamic options (integration with parent Alpine.js)
-        init_watcher = ''
+        config.update({'value': value, 'label': selected_label})
+        # This allows parent Alpine.js component to control options and selected value
         if self.allow_dynamic_options:
-            # This allows parent Alpine.js component to control options and selected value
-            init_watcher = f'''
-            init() {{
-                this.$watch('{name.replace('-', '_')}_options', (value) => {{
-                    if (value) {{
-                        this.options = value;
-                    }}
-                }});
-                this.$watch('{name.replace('-', '_')}_selected', (value) => {{
-                    if (value && value !== this.selectedValue) {{
-                        this.updateSelection(value);
-                    }}
-                }});
-            }},
-            '''
-
-        # Escape values for JavaScript
-        js_selected_label = selected_label.replace("\\", "\\\\").replace("'", "\\'").replace('"', '\\"') if selected_label else ''
-        js_value = str(value).replace("\\", "\\\\").replace("'", "\\'").replace('"', '\\"') if value else ''
-        options_json = json.dumps(options)
-
-        options_html = ''.join([f'<option value="{opt["value"]}" {"selected" if opt["selected"] else ""}>{opt["label"]}</option>' for opt in options])
-
-        # Use a unique ID for this widget instance
-        widget_id = f"cs_{name.replace('-', '_')}"
+            config['dynamic'] = name.replace('-', '_')
 
         html = f'''
-<script type="text/javascript">
-(function() {{
-    window.customSelectData_{widget_id} = function() {{
-        return {{
-            {init_watcher}
-            isOpen: false,
-            searchQuery: '{js_selected_label}',
-            selectedValue: '{js_value}',
-            selectedLabel: '{js_selected_label}',
-            highlightedIndex: -1,
-            options: {options_json},
-            get filteredOptions() {{
-                if (!this.searchQuery || this.searchQuery.trim() === '') return this.options;
-                const query = this.searchQuery.toLowerCase();
-                return this.options.filter(opt => opt.label.toLowerCase().includes(query));
-            }},
-            openDropdown() {{ this.isOpen = true; this.highlightedIndex = -1; this.searchQuery = ''; }},
-            closeDropdown() {{ this.isOpen = false; this.highlightedIndex = -1; if (!this.selectedValue) {{ this.searchQuery = ''; }} else {{ this.searchQuery = this.selectedLabel; }} }},
-            selectOption(option) {{ this.selectedValue = option.value; this.selectedLabel = option.label; this.searchQuery = option.label; this.$refs.hiddenSelect.value = option.value; this.isOpen = false; this.$refs.hiddenSelect.dispatchEvent(new Event('change', {{ bubbles: true }})); }},
-            navigateDown() {{ if (this.highlightedIndex < this.filteredOptions.length - 1) {{ this.highlightedIndex++; }} }},
-            navigateUp() {{ if (this.highlightedIndex > 0) {{ this.highlightedIndex--; }} }},
-            selectHighlighted() {{ if (this.highlightedIndex >= 0 && this.highlightedIndex < this.filteredOptions.length) {{ this.selectOption(this.filteredOptions[this.highlightedIndex]); }} }},
-            clearSelection() {{ this.selectedValue = ''; this.selectedLabel = ''; this.searchQuery = ''; this.$refs.hiddenSelect.value = ''; this.$refs.hiddenSelect.dispatchEvent(new Event('change', {{ bubbles: true }})); }}{(',' if self.allow_dynamic_options else '')}
-            {f"updateSelection(newValue) {{ const option = this.options.find(opt => opt.value === String(newValue)); if (option) {{ this.selectedValue = option.value; this.selectedLabel = option.label; this.searchQuery = option.label; this.$refs.hiddenSelect.value = option.value; }} }}" if self.allow_dynamic_options else ''}
-        }};
-    }};
-}})();
-</script>
-<div x-data="window.customSelectData_{widget_id}()" class="relative" @click.outside="closeDropdown()">
-    <!-- Hidden select input -->
+<div x-data="customSelect({_select_config(config)})" class="relative" @click.outside="closeDropdown()">
+    <!-- Hidden select input, only the selected option is rendered -->
     <select name="{name}" class="hidden" x-ref="hiddenSelect">
         <option value="">---------</option>
-        {options_html}
+        {_selected_option(value, selected_label)}
     </select>
 
     <!-- Searchable input field -->
@@ -345,90 +308,13 @@ class DynamicCustomSelect(forms.Select):
             attrs = {}
         attrs = {**self.attrs, **attrs}
 
-        # Use a unique ID for this widget instance
-        widget_id = f"dcs_{name.replace('-', '_')}"
-
-        # Escape value for JavaScript
         # If value is a Model instance (Service/Quote_Service), get its PK
         if hasattr(value, 'pk'):
-             value = value.pk
-             
-        js_value = str(value).replace("\\", "\\\\").replace("'", "\\'").replace('"', '\\"') if value else ''
+            value = value.pk
+        config = {'value': str(value) if value else ''}
 
         html = f'''
-<script type="text/javascript">
-(function() {{
-    window.dynamicCustomSelectData_{widget_id} = function() {{
-        return {{
-            isOpen: false,
-            searchQuery: '',
-            selectedValue: '{js_value}',
-            selectedLabel: '',
-            highlightedIndex: -1,
-            options: [],
-            get filteredOptions() {{
-                if (!this.searchQuery || this.searchQuery.trim() === '') return this.options;
-                const query = this.searchQuery.toLowerCase();
-                return this.options.filter(opt => opt.label.toLowerCase().includes(query));
-            }},
-            init() {{
-                // Update selected label from options on init
-                this.updateSelectedLabel();
-            }},
-            updateSelectedLabel() {{
-                const option = this.options.find(opt => opt.value === this.selectedValue);
-                this.selectedLabel = option ? option.label : '';
-                this.searchQuery = this.selectedLabel;
-            }},
-            openDropdown() {{ this.isOpen = true; this.highlightedIndex = -1; this.searchQuery = ''; }},
-            closeDropdown() {{
-                this.isOpen = false;
-                this.highlightedIndex = -1;
-                this.searchQuery = this.selectedLabel;
-            }},
-            selectOption(option) {{
-                this.selectedValue = option.value;
-                this.selectedLabel = option.label;
-                this.searchQuery = option.label;
-                this.$refs.hiddenSelect.value = option.value;
-                this.isOpen = false;
-                this.$refs.hiddenSelect.dispatchEvent(new Event('change', {{ bubbles: true }}));
-            }},
-            navigateDown() {{ if (this.highlightedIndex < this.filteredOptions.length - 1) {{ this.highlightedIndex++; }} }},
-            navigateUp() {{ if (this.highlightedIndex > 0) {{ this.highlightedIndex--; }} }},
-            selectHighlighted() {{
-                if (this.highlightedIndex >= 0 && this.highlightedIndex < this.filteredOptions.length) {{
-                    this.selectOption(this.filteredOptions[this.highlightedIndex]);
-                }}
-            }},
-            clearSelection() {{
-                this.selectedValue = '';
-                this.selectedLabel = '';
-                this.searchQuery = '';
-                this.$refs.hiddenSelect.value = '';
-                this.$refs.hiddenSelect.dispatchEvent(new Event('change', {{ bubbles: true }}));
-            }},
-            updateOptionsFromDOM() {{
-                // Called by external JavaScript to update options from DOM select
-                const selectElement = this.$refs.hiddenSelect;
-                const newOptions = [];
-                for (let i = 0; i < selectElement.options.length; i++) {{
-                    const opt = selectElement.options[i];
-                    if (opt.value) {{
-                        newOptions.push({{
-                            value: opt.value,
-                            label: opt.textContent
-                        }});
-                    }}
-                }}
-                this.options = newOptions;
-                this.updateSelectedLabel();
-            }}
-        }};
-    }};
-}})();
-</script>
-<div x-data="window.dynamicCustomSelectData_{widget_id}()" class="relative" @click.outside="closeDropdown()">
+<div x-data="dynamicCustomSelect({_select_config(config)})" class="relative" @click.outside="closeDropdown()">
     <!-- Hidden select input (will be populated by JavaScript) -->
     <select name="{name}" class="hidden payment-service-select" x-ref="hiddenSelect">
         <option value="">בחר שירות</option>
@@ -542,62 +428,30 @@ class StatusSelect(forms.Select):
             attrs = {}
         attrs = {**self.attrs, **attrs}
 
+        value = str(value) if value else ''
+
         # Build options list with status classes
         options = []
+        selected_label = ''
         for option_value, option_label in self.choices:
             # Skip empty choice
             if option_value == '':
                 continue
-            selected = str(option_value) == str(value) if value else False
+            if str(option_value) == value:
+                selected_label = str(option_label)
             options.append({
                 'value': str(option_value),
                 'label': str(option_label),
-                'selected': selected,
                 'statusClass': self.get_status_class(option_value)
             })
-
-        # Get selected option
-        selected_option = None
-        for opt in options:
-            if opt['selected']:
-                selected_option = opt
-                break
-
-        selected_option_json = json.dumps(selected_option)
-        options_json = json.dumps(options)
-
-        # Use a unique ID for this widget instance
-        widget_id = f"ss_{name.replace('-', '_')}"
+        config = {'value': value, 'options': options}
 
         html = f'''
-<script>
-function statusSelectData_{widget_id}() {{
-    return {{
-        isOpen: false,
-        searchQuery: '',
-        selectedOption: {selected_option_json},
-        highlightedIndex: -1,
-        options: {options_json},
-        get filteredOptions() {{
-            if (!this.searchQuery || this.searchQuery.trim() === '') return this.options;
-            const query = this.searchQuery.toLowerCase();
-            return this.options.filter(opt => opt.label.toLowerCase().includes(query));
-        }},
-        openDropdown() {{ this.isOpen = true; this.highlightedIndex = -1; }},
-        closeDropdown() {{ this.isOpen = false; this.highlightedIndex = -1; this.searchQuery = ''; }},
-        selectOption(option) {{ this.selectedOption = option; this.$refs.hiddenSelect.value = option.value; this.isOpen = false; this.searchQuery = ''; this.$refs.hiddenSelect.dispatchEvent(new Event('change', {{ bubbles: true }})); }},
-        navigateDown() {{ if (this.highlightedIndex < this.filteredOptions.length - 1) {{ this.highlightedIndex++; }} }},
-        navigateUp() {{ if (this.highlightedIndex > 0) {{ this.highlightedIndex--; }} }},
-        selectHighlighted() {{ if (this.highlightedIndex >= 0 && this.highlightedIndex < this.filteredOptions.length) {{ this.selectOption(this.filteredOptions[this.highlightedIndex]); }} }},
-        clearSelection() {{ this.selectedOption = null; this.searchQuery = ''; this.$refs.hiddenSelect.value = ''; this.$refs.hiddenSelect.dispatchEvent(new Event('change', {{ bubbles: true }})); }}
-    }};
-}}
-</script>
-<div x-data="statusSelectData_{widget_id}()" class="relative" @click.outside="closeDropdown()">
+<div x-data="statusSelect({_select_config(config)})" class="relative" @click.outside="closeDropdown()">
     <!-- Hidden select input -->
     <select name="{name}" class="hidden" x-ref="hiddenSelect">
         <option value="">---------</option>
-        {''.join([f'<option value="{opt["value"]}" {"selected" if opt["selected"] else ""}>{opt["label"]}</option>' for opt in options])}
+        {_selected_option(value, selected_label)}
     </select>
 
     <!-- Searchable input field -->
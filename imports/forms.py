@@ -0,0 +1,20 @@
+from django import forms
+from customers.widgets import CustomFileInput
+from .models import ImportJob
+
+
+class ImportUploadForm(forms.ModelForm):
+    class Meta:
+        model = ImportJob
+        fields = ['target', 'file', 'batch_size']
+        widgets = {
+            'target': forms.Select(attrs={'class': 'input-field'}),
+            'file': CustomFileInput(accept='.csv,text/csv'),
+            'batch_size': forms.NumberInput(attrs={'class': 'input-field', 'min': 1, 'max': 10000}),
+        }
+
+    def clean_batch_size(self):
+        batch_size = self.cleaned_data['batch_size']
+        if not 1 <= batch_size <= 10000:
+            raise forms.ValidationError('גודל אצווה בין 1 ל-10000')
+        return batch_size
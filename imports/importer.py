@@ -0,0 +1,351 @@
+import codecs
+import csv
+import io
+import logging
+import tempfile
+from itertools import islice
+
+from django import forms
+from django.core.files import File
+from django.db import models, transaction
+from django.forms import modelform_factory
+from django.utils import timezone
+
+from contacts.forms import ContactForm
+from core.choices import bump_choices_version
+from contacts.models import Contact
+from customers.forms import CustomerForm
+from customers.models import Customer
+from leads.forms import LeadForm
+from leads.models import Lead
+from leads.services import lead_source_id, lead_source_ids
+from search.index import SEARCH_MODELS, index_queryset
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Encodings tried in order on an uploaded file, Excel saves Hebrew CSV files as cp1255
+ENCODINGS = ('utf-8-sig', 'cp1255')
+DELIMITERS = ',;\t|'
+PREVIEW_ROWS = 5
+# Cell values read as True in boolean columns, anything else is False
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'v', 'x', 'כן'}
+
+
+def lead_source_resolver():
+    """Lead source id by name, unknown sources are created like the intake API does"""
+    sources = lead_source_ids()
+    return lambda value: lead_source_id(value, sources)
+
+
+def customer_resolver():
+    """Customer id by case-insensitive name or by legal id, looked up in one in-memory map"""
+    customers = {}
+    for pk, name, legal_id in Customer.objects.order_by('pk').values_list('pk', 'name', 'legal_id').iterator(chunk_size=2000):
+        for key in (name, legal_id):
+            if key and key.strip():
+                customers.setdefault(key.strip().lower(), pk)
+
+    def resolve(value):
+        if not value:
+            return None
+        if value.lower() not in customers:
+            raise forms.ValidationError(f'לקוח לא נמצא: {value}')
+        return customers[value.lower()]
+    return resolve
+
+
+class ImportSpec:
+    """
+    How rows of a file become model instances:
+    form     - the model form whose validation rules every row goes through
+    labels   - importable field -> its column headers, the first one is shown on the mapping page
+               and all of them are matched against the file header to guess the mapping
+    lookups  - foreign key field -> factory of a resolver (cell value -> id), built once per import
+               so rows are resolved from memory instead of a query per row
+    defaults - field values of the rows whose file does not map the field
+    """
+
+    def __init__(self, form, labels, lookups=None, defaults=None):
+        self.form = form
+        self.model = form._meta.model
+        self.labels = labels
+        self.lookups = lookups or {}
+        self.defaults = defaults or {}
+
+    @property
+    def fields(self):
+        return list(self.labels)
+
+    def label(self, field):
+        return self.labels[field][0]
+
+    def required_fields(self):
+        form_fields = modelform_factory(self.model, form=self.form, fields=self.fields).base_fields
+        return [field for field in self.fields if form_fields[field].required and field not in self.defaults]
+
+    def guess_mapping(self, header):
+        """Field -> column index of the header cells matching one of the field's names"""
+        columns = {_header_key(cell): index for index, cell in reversed(list(enumerate(header)))}
+        mapping = {}
+        for field, labels in self.labels.items():
+            for name in (field, *labels):
+                if _header_key(name) in columns:
+                    mapping[field] = columns[_header_key(name)]
+                    break
+        return mapping
+
+
+IMPORT_SPECS = {
+    'leads.lead': ImportSpec(
+        LeadForm,
+        labels={
+            'first_name': ('שם פרטי',),
+            'last_name': ('שם משפחה',),
+            'email': ('אימייל', 'email', 'מייל'),
+            'phone': ('טלפון', 'phone', 'נייד'),
+            'company_name': ('שם חברה', 'חברה', 'company'),
+            'role': ('תפקיד',),
+            'status': ('סטטוס',),
+            'lead_source': ('מקור ליד', 'מקור'),
+        },
+        lookups={'lead_source': lead_source_resolver},
+    ),
+    'customers.customer': ImportSpec(
+        CustomerForm,
+        labels={
+            'name': ('שם', 'שם לקוח', 'שם חברה'),
+            'legal_id': ('ח.פ / ע.מ', 'ח.פ', 'ע.מ'),
+            'website': ('אתר',),
+            'description': ('תיאור',),
+            'sumit_id': ('מזהה סאמיט',),
+            'folder_id': ('מזהה תיקייה',),
+            'folder_link': ('קישור לתיקייה',),
+            'lead_source': ('מקור ליד', 'מקור'),
+        },
+        lookups={'lead_source': lead_source_resolver},
+    ),
+    'contacts.contact': ImportSpec(
+        ContactForm,
+        labels={
+            'first_name': ('שם פרטי',),
+            'last_name': ('שם משפחה',),
+            'email': ('אימייל', 'email', 'מייל'),
+            'phone': ('טלפון', 'phone', 'נייד'),
+            'role': ('תפקיד',),
+            'contact_type': ('סוג',),
+            'customer': ('לקוח', 'שם לקוח'),
+            'is_main': ('איש קשר ראשי',),
+            'is_alerts': ('קבלת התראות',),
+        },
+        lookups={'customer': customer_resolver},
+        defaults={'contact_type': 'normal'},
+    ),
+}
+
+
+def _header_key(value):
+    return ' '.join(str(value).replace('_', ' ').split()).lower()
+
+
+# Reading the uploaded file
+
+def detect_encoding(file):
+    """The first of ENCODINGS decoding the whole file, read in chunks"""
+    for encoding in ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        file.seek(0)
+        try:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def _reader(job):
+    job.file.open('rb')
+    text = io.TextIOWrapper(job.file.file, encoding=job.encoding, errors='replace', newline='')
+    return text, csv.reader(text, delimiter=job.delimiter)
+
+
+def inspect_file(job):
+    """Detect the encoding, delimiter and header of an uploaded file and count its rows"""
+    job.file.open('rb')
+    job.encoding = detect_encoding(job.file)
+    job.file.seek(0)
+    sample = job.file.read(64 * 1024).decode(job.encoding, errors='ignore')
+    try:
+        job.delimiter = csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        job.delimiter = ','
+
+    text, reader = _reader(job)
+    try:
+        job.header = [cell.strip() for cell in next(reader, [])]
+        job.total_rows = sum(1 for row in reader if any(cell.strip() for cell in row))
+    finally:
+        text.detach()
+        job.file.close()
+    return job
+
+
+def preview_rows(job, count=PREVIEW_ROWS):
+    text, reader = _reader(job)
+    try:
+        next(reader, None)
+        return list(islice(reader, count))
+    finally:
+        text.detach()
+        job.file.close()
+
+
+# Importing
+
+class RowBuilder:
+    """Validates the mapped cells of a row with the model form and resolves its foreign keys"""
+
+    def __init__(self, spec, mapping):
+        self.spec = spec
+        self.mapping = mapping
+        self.lookups = {field: factory() for field, factory in spec.lookups.items() if field in mapping}
+        form_fields = [field for field in mapping if field not in spec.lookups]
+        # Plain widgets, the form is instantiated per row and the custom select widgets are costly to copy
+        self.form_class = modelform_factory(
+            spec.model, form=spec.form, fields=form_fields, widgets={field: forms.TextInput for field in form_fields},
+        )
+        all_fields = modelform_factory(spec.model, form=spec.form, fields=spec.fields).base_fields
+        self.required = {field for field in self.lookups if all_fields[field].required}
+        self.required_message = forms.Field.default_error_messages['required']
+        self.defaults = {field: value for field, value in spec.defaults.items() if field not in mapping}
+
+        self.cleaners = {}
+        for field in mapping:
+            model_field = spec.model._meta.get_field(field)
+            if isinstance(model_field, models.BooleanField):
+                self.cleaners[field] = lambda value: 'on' if value.lower() in TRUE_VALUES else ''
+            elif model_field.choices:
+                # Choice columns accept the stored value or its display label, as exported by the lists
+                values = {str(label).lower(): key for key, label in model_field.flatchoices}
+                values.update({str(key).lower(): key for key, _ in model_field.flatchoices})
+                self.cleaners[field] = lambda value, values=values: values.get(value.lower(), value)
+
+    def build(self, row):
+        """(instance, None) of a valid row, (None, [errors]) otherwise"""
+        cells = {field: (row[column] if column < len(row) else '').strip() for field, column in self.mapping.items()}
+        data = {
+            field: self.cleaners[field](value) if field in self.cleaners else value
+            for field, value in cells.items() if field not in self.lookups
+        }
+        form = self.form_class(data)
+        if not form.is_valid():
+            errors = []
+            for field, messages in form.errors.items():
+                prefix = f'{self.spec.label(field)}: ' if field in self.spec.labels else ''
+                errors.extend(prefix + message for message in messages)
+            return None, errors
+
+        # Resolved once the row is otherwise valid, so an invalid row never creates a lead source
+        errors = []
+        related = {}
+        for field, resolve in self.lookups.items():
+            try:
+                related[field] = resolve(cells[field])
+            except forms.ValidationError as e:
+                errors.extend(e.messages)
+                continue
+            if related[field] is None and field in self.required:
+                errors.append(f'{self.spec.label(field)}: {self.required_message}')
+        if errors:
+            return None, errors
+
+        obj = form.save(commit=False)
+        for field, pk in related.items():
+            setattr(obj, self.spec.model._meta.get_field(field).attname, pk)
+        for field, value in self.defaults.items():
+            setattr(obj, field, value)
+        if hasattr(obj, 'set_normalized_fields'):
+            # bulk_create skips save(), which fills the normalized phone / email columns
+            obj.set_normalized_fields()
+        return obj, None
+
+
+def _batches(reader, size):
+    """(first row number, rows) of the data rows, numbered as in the file with the header as row 1"""
+    number = 2
+    while True:
+        batch = list(islice(reader, size))
+        if not batch:
+            return
+        yield number, batch
+        number += len(batch)
+
+
+def run_import(job, progress=None):
+    """
+    Import the rows of a mapped job. Rows are validated with the model form of the target (see
+    IMPORT_SPECS) and inserted with bulk_create, batch_size rows at a time. Each batch commits on its
+    own and updates the job counters, so progress can be polled while the import runs and a failure
+    keeps the batches imported before it. `progress`, if given, is called with the job after each batch.
+    """
+    spec = IMPORT_SPECS[job.target]
+    ImportJob.objects.filter(pk=job.pk).update(status='running', updated_at=timezone.now())
+    job.status = 'running'
+    errors_file = io.TextIOWrapper(tempfile.TemporaryFile(), encoding='utf-8-sig', newline='')
+    errors = csv.writer(errors_file)
+    text = None
+    try:
+        builder = RowBuilder(spec, {field: int(column) for field, column in job.mapping.items()})
+        text, reader = _reader(job)
+        next(reader, None)
+        errors.writerow([*job.header, 'שורה', 'שגיאות'])
+
+        for first_number, rows in _batches(reader, job.batch_size):
+            objs = []
+            for number, row in enumerate(rows, first_number):
+                if not any(cell.strip() for cell in row):
+                    continue
+                obj, row_errors = builder.build(row)
+                if obj is None:
+                    errors.writerow([*row, number, '; '.join(row_errors)])
+                    job.failed_rows += 1
+                else:
+                    objs.append(obj)
+                job.processed_rows += 1
+
+            with transaction.atomic():
+                spec.model.objects.bulk_create(objs)
+                if spec.model._meta.label_lower in SEARCH_MODELS:
+                    # bulk_create skips the post_save handlers that keep the search index current
+                    index_queryset(spec.model.objects.filter(pk__in=[obj.pk for obj in objs]))
+            # bulk_create skips the signals that move the cached select choices (customers) to a new version
+            bump_choices_version(spec.model._meta.label_lower)
+            job.created_rows += len(objs)
+            ImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=job.processed_rows,
+                created_rows=job.created_rows,
+                failed_rows=job.failed_rows,
+                updated_at=timezone.now(),
+            )
+            if progress:
+                progress(job)
+        job.status = 'done'
+    except Exception as e:
+        logger.exception('Import %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        if text is not None:
+            text.detach()
+            job.file.close()
+
+    errors_file.flush()
+    with errors_file.detach() as raw:
+        if job.failed_rows:
+            raw.seek(0)
+            job.error_file.save(f'import-{job.pk}-errors.csv', File(raw), save=False)
+    job.save()
+    logger.info('Import %s %s: %s', job.pk, job.status, job.progress)
+    return job
@@ -0,0 +1,55 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from imports.importer import IMPORT_SPECS, inspect_file, run_import
+from imports.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Import leads, customers or contacts from a CSV file, with the same validation, batching and '
+        'error file as the import page. Columns are matched to fields by their header unless given with --map.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=list(IMPORT_SPECS))
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--map', action='append', default=[], metavar='FIELD=COLUMN',
+            help='Read FIELD from the column with this header (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        spec = IMPORT_SPECS[options['target']]
+        with open(options['path'], 'rb') as file:
+            job = ImportJob(target=options['target'], batch_size=options['batch_size'])
+            job.file.save(os.path.basename(options['path']), File(file), save=False)
+        inspect_file(job)
+
+        mapping = spec.guess_mapping(job.header)
+        for item in options['map']:
+            field, _, column = item.partition('=')
+            if field not in spec.labels:
+                raise CommandError(f'Unknown field {field}, one of: {", ".join(spec.fields)}')
+            if column not in job.header:
+                raise CommandError(f'No column {column} in the file header')
+            mapping[field] = job.header.index(column)
+        missing = [field for field in spec.required_fields() if field not in mapping]
+        if missing:
+            raise CommandError(f'No column for the required fields: {", ".join(missing)}')
+        job.mapping = mapping
+        job.save()
+
+        self.stdout.write(f'Importing {job.total_rows} rows, columns: ' + ', '.join(
+            f'{field}={job.header[column]}' for field, column in mapping.items()
+        ))
+        job = run_import(job, progress=lambda job: self.stdout.write(f'  {job.processed_rows}/{job.total_rows}'))
+
+        if job.status == 'failed':
+            raise CommandError(f'Import failed after {job.processed_rows} rows: {job.error}')
+        self.stdout.write(self.style.SUCCESS(f'Created {job.created_rows} rows, {job.failed_rows} failed'))
+        if job.error_file:
+            self.stdout.write(f'Failed rows with their errors: {job.error_file.path}')
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 09:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(choices=[('leads.lead', 'לידים'), ('customers.customer', 'לקוחות'), ('contacts.contact', 'אנשי קשר')], max_length=50)),
+                ('file', models.FileField(upload_to='imports/')),
+                ('encoding', models.CharField(default='utf-8-sig', max_length=20)),
+                ('delimiter', models.CharField(default=',', max_length=1)),
+                ('header', models.JSONField(blank=True, default=list)),
+                ('mapping', models.JSONField(blank=True, default=dict)),
+                ('batch_size', models.PositiveIntegerField(default=1000)),
+                ('status', models.CharField(choices=[('pending', 'ממתין'), ('running', 'בתהליך'), ('done', 'הושלם'), ('failed', 'נכשל')], default='pending', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_rows', models.PositiveIntegerField(default=0)),
+                ('failed_rows', models.PositiveIntegerField(default=0)),
+                ('error_file', models.FileField(blank=True, null=True, upload_to='imports/errors/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'ייבוא',
+                'verbose_name_plural': 'ייבואים',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
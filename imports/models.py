@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db import models
+
+
+class ImportJob(models.Model):
+    """
+    A CSV file uploaded for bulk import into the leads, customers or contacts. The column mapping is chosen
+    after the upload, and the import (imports.importer.run_import) keeps the progress counters current
+    batch by batch. Rows that fail validation are written with their errors to error_file.
+    """
+    TARGETS = (
+        ('leads.lead', 'לידים'),
+        ('customers.customer', 'לקוחות'),
+        ('contacts.contact', 'אנשי קשר'),
+    )
+    STATUSES = (
+        ('pending', 'ממתין'),
+        ('running', 'בתהליך'),
+        ('done', 'הושלם'),
+        ('failed', 'נכשל'),
+    )
+
+    target = models.CharField(max_length=50, choices=TARGETS)
+    file = models.FileField(upload_to='imports/')
+    encoding = models.CharField(max_length=20, default='utf-8-sig')
+    delimiter = models.CharField(max_length=1, default=',')
+    header = models.JSONField(default=list, blank=True)
+    # Model field -> index of the file column it is read from
+    mapping = models.JSONField(default=dict, blank=True)
+    batch_size = models.PositiveIntegerField(default=1000)
+
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    error_file = models.FileField(upload_to='imports/errors/', null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'ייבוא'
+        verbose_name_plural = 'ייבואים'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.get_target_display()} - {self.file.name}'
+
+    @property
+    def progress(self):
+        """Progress report polled by the import page"""
+        return {
+            'status': self.status,
+            'total': self.total_rows,
+            'processed': self.processed_rows,
+            'created': self.created_rows,
+            'failed': self.failed_rows,
+            'percent': round(self.processed_rows * 100 / self.total_rows) if self.total_rows else 100,
+            'error': self.error,
+            'has_error_file': bool(self.error_file),
+        }
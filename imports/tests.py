@@ -0,0 +1,64 @@
+import csv
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from contacts.models import Contact
+from customers.models import Customer
+from leads.models import Lead
+from .importer import IMPORT_SPECS, inspect_file, run_import
+from .models import ImportJob
+
+
+class RunImportTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def run_job(self, target, content, batch_size=1000):
+        job = ImportJob.objects.create(
+            target=target, batch_size=batch_size, file=SimpleUploadedFile('rows.csv', content.encode('utf-8-sig')),
+        )
+        inspect_file(job)
+        job.mapping = IMPORT_SPECS[target].guess_mapping(job.header)
+        job.save()
+        return run_import(job)
+
+    def error_rows(self, job):
+        with job.error_file.open('rb') as file:
+            return list(csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline='')))
+
+    def test_imports_the_valid_rows_and_reports_the_invalid_ones(self):
+        job = self.run_job('leads.lead', 'שם פרטי,אימייל,מקור\nDana,dana@example.com,Facebook\n,not an email,Website\n')
+
+        self.assertEqual((job.status, job.total_rows, job.created_rows, job.failed_rows), ('done', 2, 1, 1))
+        lead = Lead.objects.get()
+        self.assertEqual((lead.first_name, lead.email_normalized, lead.lead_source.name),
+                         ('Dana', 'dana@example.com', 'Facebook'))
+
+        header, row = self.error_rows(job)
+        self.assertEqual(header, ['שם פרטי', 'אימייל', 'מקור', 'שורה', 'שגיאות'])
+        self.assertEqual(row[:4], ['', 'not an email', 'Website', '3'])
+        self.assertIn('שם פרטי', row[4])
+        self.assertIn('אימייל', row[4])
+
+    def test_row_numbers_follow_the_file_across_batches(self):
+        job = self.run_job('leads.lead', 'שם פרטי,שם משפחה\nDana,Cohen\n\nRon,Levi\n\n,Katz\n', batch_size=2)
+
+        self.assertEqual((job.created_rows, job.failed_rows), (2, 1))
+        self.assertEqual(self.error_rows(job)[1][2], '6')
+
+    def test_an_unknown_customer_fails_the_contact_row(self):
+        customer = Customer.objects.create(name='Acme', legal_id='514000000')
+        job = self.run_job('contacts.contact', 'שם פרטי,לקוח\nDana,514000000\nRon,Nobody\n')
+
+        self.assertEqual((job.created_rows, job.failed_rows), (1, 1))
+        self.assertEqual(Contact.objects.get().customer, customer)
+        self.assertIn('Nobody', self.error_rows(job)[1][-1])
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.import_upload, name='import-upload'),
+    path('<int:pk>/', views.import_detail, name='import-detail'),
+    path('<int:pk>/mapping/', views.import_mapping, name='import-mapping'),
+    path('<int:pk>/run/', views.import_run, name='import-run'),
+    path('<int:pk>/status/', views.import_status, name='import-status'),
+    path('<int:pk>/errors/', views.import_errors, name='import-errors'),
+]
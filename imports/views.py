@@ -0,0 +1,89 @@
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import redirect, render
+from .forms import ImportUploadForm
+from .importer import IMPORT_SPECS, inspect_file, preview_rows, run_import
+from .models import ImportJob
+
+
+def import_upload(request):
+    form = ImportUploadForm(initial={'target': request.GET.get('target', 'leads.lead')})
+    if request.method == 'POST':
+        form = ImportUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            job = form.save(commit=False)
+            job.created_by = request.user if request.user.is_authenticated else None
+            job.save()
+            inspect_file(job)
+            job.mapping = IMPORT_SPECS[job.target].guess_mapping(job.header)
+            job.save()
+            return redirect('import-mapping', job.id)
+    context = {
+        'form': form,
+        'jobs': ImportJob.objects.all()[:10],
+    }
+    return render(request, 'imports/import-upload.html', context)
+
+
+def import_mapping(request, pk):
+    """Choose the column of every field, the mapping is guessed from the file header on upload"""
+    job = ImportJob.objects.get(pk=pk)
+    if job.status != 'pending':
+        return redirect('import-detail', job.id)
+    spec = IMPORT_SPECS[job.target]
+    required = spec.required_fields()
+    error = ''
+    if request.method == 'POST':
+        mapping = {}
+        for field in spec.fields:
+            column = request.POST.get(field, '')
+            if column.isdigit() and int(column) < len(job.header):
+                mapping[field] = int(column)
+        missing = [spec.label(field) for field in required if field not in mapping]
+        if missing:
+            error = f'יש לבחור עמודה לשדות החובה: {", ".join(missing)}'
+        else:
+            job.mapping = mapping
+            job.save()
+            return redirect('import-detail', job.id)
+        job.mapping = mapping
+
+    fields = [
+        {'name': field, 'label': spec.label(field), 'required': field in required, 'column': job.mapping.get(field)}
+        for field in spec.fields
+    ]
+    context = {
+        'job': job,
+        'fields': fields,
+        'preview': preview_rows(job),
+        'error': error,
+    }
+    return render(request, 'imports/import-mapping.html', context)
+
+
+def import_detail(request, pk):
+    job = ImportJob.objects.get(pk=pk)
+    return render(request, 'imports/import-detail.html', {'job': job})
+
+
+def import_run(request, pk):
+    """Run a mapped import, the page polls import-status for the progress meanwhile"""
+    if request.method == "POST":
+        job = ImportJob.objects.get(pk=pk)
+        # Claim the job, so a second request (e.g. a reloaded page) does not import the file twice
+        if not ImportJob.objects.filter(pk=pk, status='pending').update(status='running'):
+            return JsonResponse({'error': 'הייבוא כבר הורץ'}, status=400)
+        job = run_import(job)
+        return JsonResponse(job.progress)
+    return JsonResponse({'error': 'POST required'}, status=405)
+
+
+def import_status(request, pk):
+    job = ImportJob.objects.get(pk=pk)
+    return JsonResponse(job.progress)
+
+
+def import_errors(request, pk):
+    job = ImportJob.objects.get(pk=pk)
+    if not job.error_file:
+        raise Http404
+    return FileResponse(job.error_file.open('rb'), as_attachment=True, filename=f'import-{job.id}-errors.csv')
@@ -28,6 +28,23 @@ class LeadForm(forms.ModelForm):
         }
 
 
+class LeadIntakeForm(forms.ModelForm):
+    """One lead pushed to the intake API, the lead source is given by name"""
+    lead_source = forms.CharField(max_length=250, required=False)
+    key = forms.CharField(max_length=100, required=False)
+
+    class Meta:
+        model = Lead
+        fields = [
+            'first_name',
+            'last_name',
+            'email',
+            'phone',
+            'company_name',
+            'role',
+        ]
+
+
 class LeadSourceForm(forms.ModelForm):
     class Meta:
         model = LeadSource
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 08:55
+
+from django.db import migrations, models
+from core.contact_info import normalize_email, normalize_phone
+
+
+def populate_normalized_fields(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    rows = []
+    for row in Lead.objects.only('id', 'phone', 'email').iterator(chunk_size=1000):
+        row.phone_normalized = normalize_phone(row.phone)
+        row.email_normalized = normalize_email(row.email)
+        rows.append(row)
+    Lead.objects.bulk_update(rows, ['phone_normalized', 'email_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='email_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(populate_normalized_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0002_normalized_contact_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='intake_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
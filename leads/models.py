@@ -1,10 +1,27 @@
 from django.db import models
+from django.db.models import Count, OuterRef
 from activities.models import Note
 from quotes.models import Quote
 from django.contrib.contenttypes.fields import GenericRelation
+from core.models import NormalizedContactFields
+from django.contrib.contenttypes.models import ContentType
+from core.aggregates import subquery_aggregate
 
 
-class Lead(models.Model):
+class LeadQuerySet(models.QuerySet):
+
+    def with_activity_counts(self):
+        """Annotate the number of notes and quotes of every lead (used by the kanban cards)"""
+        lead_type = ContentType.objects.get_for_model(self.model)
+        notes = Note.objects.filter(content_type=lead_type, object_id=OuterRef('pk'))
+        quotes = Quote.objects.filter(content_type=lead_type, object_id=OuterRef('pk'))
+        return self.annotate(
+            notes_count=subquery_aggregate(notes, 'object_id', Count('pk'), models.IntegerField()),
+            quotes_count=subquery_aggregate(quotes, 'object_id', Count('pk'), models.IntegerField()),
+        )
+
+
+class Lead(NormalizedContactFields):
     """
     This is the lead model that get all the lead information. the leads are created from verious lead sources and
     created into the CRM from API endpoints.
@@ -27,12 +44,16 @@ class Lead(models.Model):
     status = models.CharField(max_length=50, choices=LEAD_STATUSES, default='new')
     role = models.CharField(max_length=250, blank=True, null=True)
     lead_source = models.ForeignKey('LeadSource', on_delete=models.SET_NULL, null=True, blank=True)
+    # Client supplied key of leads pushed to the intake API, a retried push with the same key is ignored
+    intake_key = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
 
     notes = GenericRelation(Note, related_query_name='notes')
     quotes = GenericRelation(Quote, related_query_name='quotes')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LeadQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'ליד'
@@ -45,10 +66,6 @@ class Lead(models.Model):
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
     
-    @property
-    def phone_number(self):
-        n = ''.join(filter(str.isdigit, self.phone))
-        return f'{n[:3]}-{n[3:6]}-{n[6:]}'
 
 
 
@@ -0,0 +1,281 @@
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from activities.models import Note, Task
+from contacts.models import Contact
+from core.bulk import BulkActionError, parse_ids
+from core.choices import model_choices
+from core.contact_info import normalize_email, normalize_phone
+from core.dedup import find_contact, find_customer, find_lead_matches
+from customers.models import Customer
+from quotes.models import Quote
+from search.index import index_queryset
+from .forms import LeadIntakeForm
+from .models import Lead, LeadSource
+
+logger = logging.getLogger(__name__)
+
+# Rows hanging off a lead through a generic relation, moved to the customer on conversion
+CONVERTED_RELATIONS = (Note, Quote, Task)
+# Leads per re-parenting UPDATE, keeps the CASE expression under the bound parameter limits
+CONVERT_BATCH_SIZE = 500
+# Most leads accepted by one intake request
+INTAKE_BATCH_LIMIT = 1000
+
+
+def customer_for_lead(lead):
+    """
+    Find or create the customer and contact a lead converts into. Existing rows are matched on the
+    case-insensitive company name and on the normalized email / phone (see core.dedup), so converting
+    a lead whose contact already exists updates that contact instead of creating a duplicate. Only a
+    contact with the same email and a matching or missing phone is reused, a weaker match (a shared
+    phone or email) gets a contact of its own and is left for the lead page's duplicates list.
+    """
+    customer = find_customer(lead.company_name)
+    if customer is None:
+        customer = Customer.objects.create(name=lead.company_name, lead_source=lead.lead_source)
+    else:
+        customer.lead_source = lead.lead_source
+        customer.save()
+
+    fields = {
+        'first_name': lead.first_name,
+        'last_name': lead.last_name,
+        'role': lead.role,
+        'customer': customer,
+        'contact_type': 'normal',
+    }
+    contact = find_contact(lead.email, lead.phone)
+    if contact is None:
+        contact = Contact.objects.create(email=lead.email, phone=lead.phone, **fields)
+    else:
+        for field, value in fields.items():
+            setattr(contact, field, value)
+        contact.phone = contact.phone or lead.phone
+        contact.save()
+    return customer, contact
+
+
+class Conversion:
+    """Result of converting leads: the customer / contact of every lead, moved row counts and step timings"""
+
+    def __init__(self):
+        self.customers = {}
+        self.contacts = {}
+        self.moved = {model._meta.model_name: 0 for model in CONVERTED_RELATIONS}
+        self.timings = {}
+
+    @contextmanager
+    def timed(self, step):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[step] = round((perf_counter() - start) * 1000, 1)
+
+    def as_dict(self):
+        return {
+            'converted': len(self.customers),
+            'customers': {lead_id: customer.pk for lead_id, customer in self.customers.items()},
+            'moved': self.moved,
+            'timings_ms': self.timings,
+        }
+
+
+def reparent(lead_customers):
+    """
+    Move the notes, quotes and tasks of every lead in {lead id: customer id} to its customer,
+    with a single UPDATE per model. update() skips save() and the post_save signals, so the
+    search index is refreshed by the caller.
+    """
+    lead_type = ContentType.objects.get_for_model(Lead)
+    customer_type = ContentType.objects.get_for_model(Customer)
+
+    # A customer keeps a single pinned note (unique_tagged_note): a lead's pinned note is unpinned when
+    # its customer already has one, or another of the leads converting into it brings one
+    pinned = set(Note.objects.filter(
+        content_type=customer_type, object_id__in=set(lead_customers.values()), tagged=True,
+    ).values_list('object_id', flat=True))
+    unpin = []
+    lead_pins = Note.objects.filter(content_type=lead_type, object_id__in=list(lead_customers), tagged=True)
+    for note_id, lead_id in lead_pins.order_by('pk').values_list('pk', 'object_id'):
+        if lead_customers[lead_id] in pinned:
+            unpin.append(note_id)
+        pinned.add(lead_customers[lead_id])
+    if unpin:
+        Note.objects.filter(pk__in=unpin).update(tagged=False)
+
+    object_id = Case(
+        *[When(object_id=lead_id, then=Value(customer_id)) for lead_id, customer_id in lead_customers.items()],
+        output_field=models.PositiveBigIntegerField(),
+    )
+    return {
+        model._meta.model_name: model.objects.filter(
+            content_type=lead_type, object_id__in=list(lead_customers),
+        ).update(content_type=customer_type, object_id=object_id)
+        for model in CONVERTED_RELATIONS
+    }
+
+
+def convert_leads(raw_ids):
+    """
+    Convert the selected leads in one transaction: match or create their customers and contacts,
+    re-parent their notes, quotes and tasks set-wise and mark them won. Either every lead is
+    converted or none is. Returns a Conversion.
+    """
+    ids = parse_ids(raw_ids)
+    conversion = Conversion()
+    with conversion.timed('total'), transaction.atomic():
+        leads = list(Lead.objects.select_for_update().select_related('lead_source').filter(pk__in=ids))
+        missing = set(ids) - {lead.pk for lead in leads}
+        if missing:
+            raise BulkActionError(f'{Lead._meta.verbose_name} not found: {", ".join(map(str, sorted(missing)))}')
+
+        with conversion.timed('customers'):
+            for lead in leads:
+                conversion.customers[lead.pk], conversion.contacts[lead.pk] = customer_for_lead(lead)
+
+        with conversion.timed('reparent'):
+            for start in range(0, len(leads), CONVERT_BATCH_SIZE):
+                batch = leads[start:start + CONVERT_BATCH_SIZE]
+                moved = reparent({lead.pk: conversion.customers[lead.pk].pk for lead in batch})
+                for name, count in moved.items():
+                    conversion.moved[name] += count
+
+        with conversion.timed('status'):
+            # update() skips auto_now, so keep updated_at current ourselves
+            Lead.objects.filter(pk__in=ids).update(status='won', updated_at=timezone.now())
+
+        with conversion.timed('search'):
+            customer_ids = {customer.pk for customer in conversion.customers.values()}
+            index_queryset(Lead.objects.filter(pk__in=ids))
+            index_queryset(Customer.objects.filter(pk__in=customer_ids))
+            index_queryset(Quote.objects.filter(
+                content_type=ContentType.objects.get_for_model(Customer), object_id__in=customer_ids,
+            ))
+
+    logger.info('Converted %s leads: %s', len(ids), conversion.as_dict())
+    return conversion
+
+
+def convert_lead(lead):
+    """Convert a single lead, returns (customer, contact)"""
+    conversion = convert_leads([lead.pk])
+    return conversion.customers[lead.pk], conversion.contacts[lead.pk]
+
+
+def lead_source_ids():
+    """{lowercased name: id} of the lead sources, built from the cached select choices"""
+    _, choices = model_choices('leads.leadsource')
+    return {choice['label'].strip().lower(): int(choice['value']) for choice in choices}
+
+
+def lead_source_id(name, sources):
+    name = (name or '').strip()
+    if not name:
+        return None
+    if name.lower() not in sources:
+        # Creating the source invalidates the cached choices for the next request
+        source = LeadSource.objects.filter(name__iexact=name).first() or LeadSource.objects.create(name=name)
+        sources[name.lower()] = source.pk
+    return sources[name.lower()]
+
+
+def ingest_leads(items, source=None):
+    """
+    Insert a batch of leads pushed to the intake API (dicts of LeadIntakeForm fields) and return
+    a result per item, in order. An item is
+      - created,
+      - existing when its key was already ingested (a retried push), or repeats an earlier key of the batch,
+      - duplicate when its phone or email matches an existing lead or an earlier item of the batch,
+      - invalid, with the form errors.
+    Keys, duplicates and lead sources are resolved with a few set-based queries and the new leads
+    are inserted with bulk_create, so the cost grows with the number of batches, not of leads.
+    """
+    try:
+        return _ingest_leads(items, source)
+    except IntegrityError:
+        # A concurrent push inserted one of the keys first, its leads are now reported as existing
+        return _ingest_leads(items, source)
+
+
+def _ingest_leads(items, source):
+    results = [None] * len(items)
+    forms = {}
+    for index, item in enumerate(items):
+        form = LeadIntakeForm(item if isinstance(item, dict) else {})
+        if form.is_valid():
+            forms[index] = form
+        else:
+            results[index] = {'status': 'invalid', 'errors': {field: list(errors) for field, errors in form.errors.items()}}
+
+    keys = {form.cleaned_data['key'] for form in forms.values() if form.cleaned_data['key']}
+    ingested = dict(Lead.objects.filter(intake_key__in=keys).values_list('intake_key', 'pk')) if keys else {}
+    by_phone, by_email = find_lead_matches(
+        [normalize_phone(form.cleaned_data['phone']) for form in forms.values()],
+        [normalize_email(form.cleaned_data['email']) for form in forms.values()],
+    )
+
+    sources = lead_source_ids()
+    # Results pointing at an earlier item of the batch, resolved once that item is inserted
+    batch_keys, batch_phones, batch_emails = {}, {}, {}
+    pending = {}
+    created = {}
+    for index, form in forms.items():
+        data = form.cleaned_data
+        key = data['key'] or None
+        if key in ingested:
+            results[index] = {'status': 'existing', 'id': ingested[key]}
+            continue
+        if key in batch_keys:
+            results[index] = {'status': 'existing'}
+            pending[index] = batch_keys[key]
+            continue
+
+        lead = form.save(commit=False)
+        lead.intake_key = key
+        lead.set_normalized_fields()
+        phone, email = lead.phone_normalized, lead.email_normalized
+        if phone in by_phone or email in by_email:
+            results[index] = {'status': 'duplicate', 'id': by_phone.get(phone) or by_email.get(email)}
+            continue
+        earlier = batch_phones.get(phone) if phone else None
+        earlier = earlier if earlier is not None else batch_emails.get(email) if email else None
+        if earlier is not None:
+            results[index] = {'status': 'duplicate'}
+            pending[index] = earlier
+            continue
+
+        lead.lead_source_id = lead_source_id(data['lead_source'] or source, sources)
+        created[index] = lead
+        results[index] = {'status': 'created'}
+        if key:
+            batch_keys[key] = index
+        if phone:
+            batch_phones[phone] = index
+        if email:
+            batch_emails[email] = index
+
+    with transaction.atomic():
+        Lead.objects.bulk_create(created.values(), batch_size=CONVERT_BATCH_SIZE)
+        # bulk_create skips the post_save handlers that keep the search index current
+        index_queryset(Lead.objects.filter(pk__in=[lead.pk for lead in created.values()]))
+
+    for index, lead in created.items():
+        results[index]['id'] = lead.pk
+    for index, earlier in pending.items():
+        results[index]['id'] = created[earlier].pk
+    for index, result in enumerate(results):
+        key = items[index].get('key') if isinstance(items[index], dict) else None
+        results[index] = {'index': index, 'key': key, **result}
+
+    summary = {status: 0 for status in ('created', 'existing', 'duplicate', 'invalid')}
+    for result in results:
+        summary[result['status']] += 1
+    return {**summary, 'results': results}
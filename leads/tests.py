@@ -1,3 +1,201 @@
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 
-# Create your tests here.
+from activities.models import Note, Task
+from contacts.models import Contact
+from customers.models import Customer
+from quotes.models import Quote
+from .models import Lead, LeadSource
+from .services import convert_leads, customer_for_lead, ingest_leads
+
+
+class IngestLeadsTests(TestCase):
+
+    def test_creates_leads_with_their_source(self):
+        result = ingest_leads([
+            {'key': 'a-1', 'first_name': 'Dana', 'email': 'dana@example.com', 'lead_source': 'Facebook'},
+        ], source='Website')
+
+        self.assertEqual(result['created'], 1)
+        lead = Lead.objects.get(pk=result['results'][0]['id'])
+        self.assertEqual(lead.intake_key, 'a-1')
+        self.assertEqual(lead.lead_source, LeadSource.objects.get(name='Facebook'))
+
+    def test_default_source_for_leads_without_one(self):
+        result = ingest_leads([{'first_name': 'Dana'}], source='Website')
+
+        self.assertEqual(Lead.objects.get(pk=result['results'][0]['id']).lead_source.name, 'Website')
+
+    def test_retried_push_is_existing(self):
+        items = [{'key': 'a-1', 'first_name': 'Dana', 'email': 'dana@example.com'}]
+        first = ingest_leads(items)
+        retry = ingest_leads(items)
+
+        self.assertEqual(retry['existing'], 1)
+        self.assertEqual(retry['results'][0]['id'], first['results'][0]['id'])
+        self.assertEqual(Lead.objects.count(), 1)
+
+    def test_repeated_key_in_a_batch_is_existing(self):
+        result = ingest_leads([
+            {'key': 'a-1', 'first_name': 'Dana'},
+            {'key': 'a-1', 'first_name': 'Dana'},
+        ])
+
+        self.assertEqual((result['created'], result['existing']), (1, 1))
+        self.assertEqual(result['results'][1]['id'], result['results'][0]['id'])
+
+    def test_matching_phone_or_email_is_duplicate(self):
+        lead = Lead.objects.create(first_name='Dana', phone='050-123 4567', email='dana@example.com')
+
+        result = ingest_leads([
+            {'first_name': 'Dana', 'phone': '+972501234567'},
+            {'first_name': 'Dana', 'email': 'DANA@example.com'},
+        ])
+
+        self.assertEqual(result['duplicate'], 2)
+        self.assertEqual([r['id'] for r in result['results']], [lead.pk, lead.pk])
+        self.assertEqual(Lead.objects.count(), 1)
+
+    def test_duplicate_within_the_batch(self):
+        result = ingest_leads([
+            {'first_name': 'Dana', 'email': 'dana@example.com'},
+            {'first_name': 'Other', 'email': 'dana@example.com'},
+        ])
+
+        self.assertEqual((result['created'], result['duplicate']), (1, 1))
+        self.assertEqual(result['results'][1]['id'], result['results'][0]['id'])
+
+    def test_invalid_items_report_their_errors(self):
+        result = ingest_leads([{'email': 'not an email'}, 'not a dict'])
+
+        self.assertEqual(result['invalid'], 2)
+        self.assertIn('first_name', result['results'][0]['errors'])
+        self.assertIn('email', result['results'][0]['errors'])
+        self.assertFalse(Lead.objects.exists())
+
+
+class LeadIntakeTests(TestCase):
+
+    def post(self, body, **headers):
+        return self.client.post('/leads/api/intake', body, content_type='application/json', headers=headers)
+
+    def test_requires_one_of_the_tokens(self):
+        body = {'leads': [{'first_name': 'Dana'}]}
+        with self.settings(LEAD_INTAKE_TOKENS=['secret']):
+            for authorization in (None, 'Bearer wrong', 'Bearer סוד', 'Basic secret'):
+                headers = {'Authorization': authorization} if authorization else {}
+                self.assertEqual(self.post(body, **headers).status_code, 401)
+
+            response = self.post(body, Authorization='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+
+    def test_rejects_malformed_bodies(self):
+        with self.settings(LEAD_INTAKE_TOKENS=['secret']):
+            for body in ('not json', {'leads': []}, {'leads': 'Dana'}):
+                self.assertEqual(self.post(body, Authorization='Bearer secret').status_code, 400)
+        self.assertFalse(Lead.objects.exists())
+
+
+class CustomerForLeadTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Acme', legal_id='1')
+        self.contact = Contact.objects.create(
+            first_name='Ron', last_name='Levi', email='ron@acme.com', phone='050-123 4567', customer=self.customer,
+        )
+
+    def lead(self, **fields):
+        return Lead.objects.create(**{'first_name': 'Dana', 'company_name': 'Other Ltd', **fields})
+
+    def test_same_email_and_phone_updates_the_contact(self):
+        customer, contact = customer_for_lead(self.lead(email='RON@acme.com', phone='+972501234567'))
+
+        self.assertEqual(contact.pk, self.contact.pk)
+        self.contact.refresh_from_db()
+        self.assertEqual((self.contact.first_name, self.contact.customer), ('Dana', customer))
+
+    def test_same_email_without_a_phone_updates_the_contact(self):
+        _, contact = customer_for_lead(self.lead(email='ron@acme.com'))
+
+        self.assertEqual(contact.pk, self.contact.pk)
+
+    def test_shared_phone_creates_a_new_contact(self):
+        _, contact = customer_for_lead(self.lead(phone='050-123 4567', email='dana@other.com'))
+
+        self.assertNotEqual(contact.pk, self.contact.pk)
+        self.contact.refresh_from_db()
+        self.assertEqual((self.contact.first_name, self.contact.customer), ('Ron', self.customer))
+
+    def test_same_email_with_another_phone_creates_a_new_contact(self):
+        _, contact = customer_for_lead(self.lead(email='ron@acme.com', phone='052-999 8888'))
+
+        self.assertNotEqual(contact.pk, self.contact.pk)
+        self.contact.refresh_from_db()
+        self.assertEqual(self.contact.first_name, 'Ron')
+
+    def test_matches_the_customer_by_name(self):
+        customer, _ = customer_for_lead(self.lead(company_name='ACME'))
+
+        self.assertEqual(customer, self.customer)
+
+
+class ConvertLeadsTests(TestCase):
+
+    def setUp(self):
+        self.lead = Lead.objects.create(first_name='Dana', company_name='Acme', email='dana@acme.com')
+
+    def attach(self, model, owner, **fields):
+        return model.objects.create(content_type=ContentType.objects.get_for_model(owner), object_id=owner.pk, **fields)
+
+    def test_moves_notes_quotes_and_tasks_to_the_customer(self):
+        note = self.attach(Note, self.lead, text='Called')
+        quote = self.attach(Quote, self.lead, name='Website')
+        task = self.attach(Task, self.lead, title='Follow up')
+
+        conversion = convert_leads([self.lead.pk])
+
+        customer = conversion.customers[self.lead.pk]
+        self.assertEqual(conversion.moved, {'note': 1, 'quote': 1, 'task': 1})
+        for obj in (note, quote, task):
+            obj.refresh_from_db()
+            self.assertEqual(obj.content_object, customer)
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.status, 'won')
+
+    def test_unpins_the_lead_note_when_the_customer_has_a_pinned_note(self):
+        customer = Customer.objects.create(name='Acme', legal_id='1')
+        customer_pin = self.attach(Note, customer, text='Customer pin', tagged=True)
+        lead_pin = self.attach(Note, self.lead, text='Lead pin', tagged=True)
+
+        convert_leads([self.lead.pk])
+
+        customer_pin.refresh_from_db()
+        lead_pin.refresh_from_db()
+        self.assertTrue(customer_pin.tagged)
+        self.assertFalse(lead_pin.tagged)
+        self.assertEqual(lead_pin.content_object, customer)
+
+    def test_keeps_the_lead_pin_when_the_customer_has_none(self):
+        lead_pin = self.attach(Note, self.lead, text='Lead pin', tagged=True)
+
+        convert_leads([self.lead.pk])
+
+        lead_pin.refresh_from_db()
+        self.assertTrue(lead_pin.tagged)
+
+    def test_leads_of_the_same_customer_keep_a_single_pin(self):
+        other = Lead.objects.create(first_name='Ron', company_name='Acme', email='ron@acme.com')
+        first = self.attach(Note, self.lead, text='First', tagged=True)
+        second = self.attach(Note, other, text='Second', tagged=True)
+
+        conversion = convert_leads([self.lead.pk, other.pk])
+
+        customer = conversion.customers[self.lead.pk]
+        self.assertEqual(conversion.customers[other.pk], customer)
+        customer_type = ContentType.objects.get_for_model(customer)
+        self.assertEqual(Note.objects.filter(content_type=customer_type, object_id=customer.pk, tagged=True).count(), 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.tagged, second.tagged), (True, False))
@@ -8,11 +8,13 @@ urlpatterns = [
     path('<pk>/edit/<fallback>', views.lead_edit, name='lead-edit'),
     path('<pk>/delete', views.lead_delete, name='lead-delete'),
     path('massdelete/', views.lead_mass_delete, name='lead-mass-delete'),
+    path('export/', views.lead_export, name='lead-export'),
+    path('massconvert/', views.lead_mass_convert, name='lead-mass-convert'),
     path('<pk>/', views.lead_detail, name='lead-detail'),
+    path('<pk>/section/<str:section>/', views.lead_section, name='lead-section'),
     path('api/leadsource/create', views.lead_source_create, name='lead-source-create'),
-    path('<pk>/note/new', views.lead_submit_note, name='lead-submit-note'),
-    path('api/note/<noteid>/delete', views.lead_delete_note, name='lead-delete-note'),
-    path('api/note/<noteid>/tagging', views.lead_tag_note, name='lead-tag-note'),
     path('api/update-status', views.lead_update_status, name='lead-update-status'),
+    path('api/kanban-column', views.lead_kanban_column, name='lead-kanban-column'),
     path('api/lead-convert/<pk>', views.lead_convert, name='lead-convert'),
+    path('api/intake', views.lead_intake, name='lead-intake'),
 ]
\ No newline at end of file
@@ -1,38 +1,92 @@
 from django.shortcuts import render, redirect
-from django.urls import reverse
-from urllib.parse import urlencode
+import hmac
 import json
+from django.conf import settings
 from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.template.loader import render_to_string
 from .models import Lead, LeadSource
 from .forms import LeadForm, LeadSourceForm
-from activities.models import Note
+from .services import convert_lead, convert_leads, ingest_leads, INTAKE_BATCH_LIMIT
+from activities.services import note_summary, notes_context
+from core.kanban import kanban_columns, kanban_page, status_counts
+from core.bulk import bulk_delete, BulkActionError
+from core.dedup import find_lead_duplicates
+from core.fragments import Fragment
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response
+from core.sections import DetailSections, Section
 
 
+LEAD_LIST = ListSpec(
+    sort_fields=['first_name', 'status'],
+    search_fields=['first_name', 'last_name', 'email', 'phone', 'company_name'],
+    filters={'status': 'status', 'lead_source': 'lead_source_id'},
+)
+
+LEAD_EXPORT = ExportSpec(
+    columns=[
+        ('מזהה', 'id'),
+        ('שם פרטי', 'first_name'),
+        ('שם משפחה', 'last_name'),
+        ('אימייל', 'email'),
+        ('טלפון', 'phone'),
+        ('חברה', 'company_name'),
+        ('תפקיד', 'role'),
+        ('סטטוס', 'status'),
+        ('מקור ליד', 'lead_source__name'),
+        ('תאריך יצירה', 'created_at'),
+    ],
+    choices={'status': Lead.LEAD_STATUSES},
+)
+
+LEAD_ROW = Fragment('leads/partials/list_row.html', 'lead', related=('lead_source',))
+
 def lead_list(request):
-    all_leads = Lead.objects.all()
+    page = paginate_list(request, Lead.objects.select_related('lead_source'), LEAD_LIST)
+    page.rows = LEAD_ROW.render_many(request, page.rows)
+    if is_rows_request(request):
+        return rows_response(request, 'leads/partials/list_rows.html', 'leads', page)
 
-    leads = all_leads
     context = {
-        'leads': leads
+        'leads': page.rows,
+        'page': page,
     }
     return render(request, 'leads/leads-list.html', context)
 
+def lead_export(request):
+    return export_response(request, Lead.objects.all(), LEAD_LIST, LEAD_EXPORT, 'leads')
+
 def lead_kanban(request):
-    all_leads = Lead.objects.all()
-    statuses = Lead.LEAD_STATUSES
-    status_dir = []
-    for s in statuses:
-        s_count = len(Lead.objects.filter(status=s[0]))
-        status_dir.append(
-            [s[0], s[1], s_count]
-        )
-    leads = all_leads
+    leads = Lead.objects.select_related('lead_source').with_activity_counts()
+    columns = kanban_columns(leads, Lead.LEAD_STATUSES)
+    counts = {column['key']: column['count'] for column in columns}
     context = {
-        'leads': leads,
-        'statuses': status_dir
+        'columns': columns,
+        'status_counts': counts,
+        'total_count': sum(counts.values()),
     }
     return render(request, 'leads/leads-kanban.html', context)
 
+def lead_kanban_column(request):
+    """
+    AJAX endpoint to lazy load the next page of cards of a kanban column
+    """
+    status = request.GET.get('status', '')
+    if status not in [s[0] for s in Lead.LEAD_STATUSES]:
+        return JsonResponse({'error': 'Invalid status'}, status=400)
+    leads = Lead.objects.select_related('lead_source').with_activity_counts()
+    try:
+        cards, next_cursor = kanban_page(leads, status, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    html = ''.join(
+        render_to_string('leads/partials/kanban_card.html', {'lead': lead}, request=request)
+        for lead in cards
+    )
+    return JsonResponse({'html': html, 'next_cursor': next_cursor, 'has_more': next_cursor is not None})
+
 def lead_create(request):
     form = LeadForm()
     leadSources = list(LeadSource.objects.values('id', 'name'))
@@ -79,98 +133,58 @@ def lead_delete(request, pk):
 
 def lead_convert(request, pk):
     lead = Lead.objects.get(pk=pk)
-    # create customer
-    from customers.models import Customer
-    from contacts.models import Contact
-    customer, created = Customer.objects.update_or_create(
-        name = lead.company_name,
-        defaults= {
-            'lead_source': lead.lead_source,
-        }
-    )
-    # pass all the Notes to the new Customer
-    for note in lead.notes.all():
-        note.content_object = customer
-        note.save()
-    # pass all Quotes to the new Customer
-    for quote in lead.quotes.all():
-        quote.content_object = customer
-        quote.save()
-
-    # Create Contact
-    contact, created = Contact.objects.update_or_create(
-        email = lead.email,
-        phone = lead.phone,
-        defaults= {
-            'first_name' : lead.first_name,
-            'last_name': lead.last_name,
-            'role': lead.role,
-            'customer': customer,
-            'contact_type' : 'normal'
-        }
-    )
+    # Create or match the customer and contact, and move the notes, quotes and tasks under it
+    customer, contact = convert_lead(lead)
+    return redirect('customer-detail', customer.id)
 
-    # Update the lead info
-    lead.status = 'won'
-    lead.save()
 
-    return redirect('customer-detail', customer.id)
+def lead_mass_convert(request):
+    if request.method == "POST":
+        fallback = request.POST['fallback']
+        try:
+            conversion = convert_leads(request.POST['leadList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse(conversion.as_dict())
+        return redirect(fallback)
 
 
 def lead_mass_delete(request):
     if request.method == "POST":
         fallback = request.POST['fallback']
-        leadList = request.POST['leadList']
-        leadList = leadList.split(',')
-        for l in leadList:
-            l = int(l)
-            lead = Lead.objects.get(pk=l)
-            lead.delete()
+        try:
+            bulk_delete(Lead, request.POST['leadList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect(fallback)
 
+LEAD_SECTIONS = DetailSections(
+    'lead-section', 'lead',
+    sections={
+        'notes': Section('base/notes.html', notes_context),
+        'quotes': Section('leads/sections/quotes.html', lambda lead: {
+            'quotes': lead.quotes.all(),
+            'quoteInfo': lead.quotes.statistics(),
+        }, cached=True),
+    },
+    default='quotes',
+)
+
 def lead_detail(request, pk):
     lead = Lead.objects.get(pk=pk)
-    tagged_note = lead.notes.all().filter(tagged=True).first()
-    quote_total_price = 0
-    quote_total_count = 0
-    quote_active_price = 0
-    quote_active_count = 0
-    quote_won_price = 0
-    quote_won_count = 0
-    quote_lost_price = 0
-    quote_lost_count = 0
-
-    for q in lead.quotes.all():
-        quote_total_price += q.total_price
-        quote_total_count += 1
-        if (q.status == 'draft' or q.status == 'sent'):
-            quote_active_price += q.total_price
-            quote_active_count += 1
-        elif q.status == 'won':
-            quote_won_price += q.total_price
-            quote_won_count += 1
-        elif q.status == 'lost':
-            quote_lost_price += q.total_price
-            quote_lost_count += 1
-
-            
-    quoteInfo = {
-        'total_price': quote_total_price,
-        'total_count': quote_total_count,
-        'active_price': quote_active_price,
-        'active_count': quote_active_count,
-        'won_price': quote_won_price,
-        'won_count': quote_won_count,
-        'lost_count': quote_lost_count,
-        'lost_price': quote_lost_price,
-    }
     context = {
         'lead': lead,
-        'tagged_note' : tagged_note,
-        'quoteInfo': quoteInfo
+        **note_summary(lead),
+        **LEAD_SECTIONS.page_context(request, lead),
+        'duplicates': find_lead_duplicates(lead),
     }
     return render(request, 'leads/lead-detail.html', context)
 
+def lead_section(request, pk, section):
+    lead = Lead.objects.get(pk=pk)
+    return LEAD_SECTIONS.response(request, lead, section)
+
 def lead_source_create(request):
     if request.method == 'POST':
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -199,40 +213,6 @@ def lead_source_create(request):
             })
     return JsonResponse({'error': 'Invalid Request'}, status=400)
 
-def lead_submit_note(request, pk):
-    lead = Lead.objects.get(pk = pk)
-    note = Note.objects.create(
-        text = request.POST['note'],
-        content_object = lead
-    )
-    base_url = reverse('lead-detail', args=(pk,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def lead_delete_note(request, noteid):
-    note = Note.objects.get(pk=noteid)
-    lead = Lead.objects.get(pk=note.object_id)
-    note.delete()
-    base_url = reverse('lead-detail', args=(lead.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def lead_tag_note(request, noteid):
-    # remove tag from all Notes for this Lead
-    note = Note.objects.get(pk=noteid)
-    if note.tagged:
-        note.tagged = False
-    else:
-        all_notes = Note.objects.filter(object_id=note.content_object.id).update(tagged=False)
-        note.tagged = True
-    note.save()
-    base_url = reverse('lead-detail', args=(note.content_object.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
 def lead_update_status(request):
     """
     AJAX endpoint to update lead status on drag-drop
@@ -263,22 +243,58 @@ def lead_update_status(request):
             lead = Lead.objects.get(pk=lead_id)
             old_status = lead.status
             lead.status = new_status
-            lead.save()
+            lead.save(update_fields=['status', 'updated_at'])
         except Lead.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Lead not found'}, status=404)
 
-        # Calculate updated counts
-        status_counts = {}
-        for status_key, _ in Lead.LEAD_STATUSES:
-            status_counts[status_key] = Lead.objects.filter(status=status_key).count()
-
-        # Return success with updated counts
+        # Return success with updated counts (single GROUP BY query)
         return JsonResponse({
             'success': True,
             'lead_id': lead_id,
             'old_status': old_status,
             'new_status': new_status,
-            'status_counts': status_counts
+            'status_counts': status_counts(Lead.objects.all(), Lead.LEAD_STATUSES)
         })
 
-    return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
\ No newline at end of file
+    return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
+
+
+def _intake_authorized(request):
+    """
+    Lead sources sending one of the LEAD_INTAKE_TOKENS as a bearer token. The endpoint is CSRF exempt,
+    so the session never authorizes it: any page could make a signed in user's browser post leads.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    # Compared as bytes, compare_digest refuses non-ASCII str
+    token = token.encode()
+    return any(hmac.compare_digest(token, allowed.encode()) for allowed in settings.LEAD_INTAKE_TOKENS)
+
+
+@csrf_exempt
+def lead_intake(request):
+    """
+    JSON endpoint the lead sources push leads to:
+    {"source": "<default lead source name>", "leads": [{"key": ..., "first_name": ..., ...}, ...]}
+    Returns the created / existing / duplicate / invalid counts and a result per lead.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    if not _intake_authorized(request):
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if isinstance(data, list):
+        data = {'leads': data}
+    items = data.get('leads') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'A non empty leads list is required'}, status=400)
+    if len(items) > INTAKE_BATCH_LIMIT:
+        return JsonResponse({'error': f'At most {INTAKE_BATCH_LIMIT} leads per request'}, status=400)
+
+    source = data.get('source')
+    return JsonResponse(ingest_leads(items, source if isinstance(source, str) else None))
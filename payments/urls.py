@@ -6,4 +6,5 @@ urlpatterns = [
     path('api/payments/delete/<pk>', views.payment_delete, name='payment-delete'),
     path('api/payments/<pk>/edit/', views.payment_edit, name='payment-edit'),
     path('api/payments/mass-delete/', views.payment_mass_delete, name='payment-mass-delete'),
+    path('export/', views.payment_export, name='payment-export'),
 ]
\ No newline at end of file
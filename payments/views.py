@@ -3,6 +3,12 @@ from django.urls import reverse
 from urllib.parse import urlencode
 from .models import Payment
 from projects.models import Project
+from django.http import JsonResponse
+from core.bulk import bulk_delete, BulkActionError
+from core.fragments import Fragment
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response
+from django.db.models import DecimalField, ExpressionWrapper, F
 
 def payment_edit(request, pk, main = False):
     if request.method == "POST":
@@ -45,22 +51,56 @@ def payment_delete(request, pk, main = False):
         url = f'{base_url}?{query_string}'
     return redirect(url)
 
+PAYMENT_LIST = ListSpec(
+    sort_fields=['id', 'name', 'status'],
+    search_fields=['name', 'project__name', 'project__customer__name'],
+    filters={'status': 'status', 'project': 'project_id'},
+)
+
+PAYMENT_EXPORT = ExportSpec(
+    columns=[
+        ('מזהה', 'id'),
+        ('שם', 'name'),
+        ('שירות', 'service__name'),
+        ('פרויקט', 'project__name'),
+        ('לקוח', 'project__customer__name'),
+        ('כמות', 'qty'),
+        ('מחיר', 'price'),
+        ('סה"כ', 'total'),
+        ('סטטוס', 'status'),
+        ('מספר חשבונית', 'sumit_invoice_number'),
+        ('תאריך חשבונית', 'invoice_date'),
+        ('מספר קבלה', 'sumit_recipt_number'),
+        ('תאריך קבלה', 'recipt_date'),
+    ],
+    choices={'status': Payment.STATUSES},
+)
+
+PAYMENT_ROW = Fragment('payments/partials/list_row.html', 'payment', related=('project', 'project.customer'))
+
 def payment_list(request):
-    payments = Payment.objects.all()
+    page = paginate_list(request, Payment.objects.select_related('project__customer'), PAYMENT_LIST)
+    page.rows = PAYMENT_ROW.render_many(request, page.rows)
+    if is_rows_request(request):
+        return rows_response(request, 'payments/partials/list_rows.html', 'payments', page)
+
     context = {
-        'payments': payments,
+        'payments': page.rows,
+        'page': page,
     }
     return render(request, 'payments/payment-list.html', context)
 
+def payment_export(request):
+    total = ExpressionWrapper(F('qty') * F('price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    return export_response(request, Payment.objects.annotate(total=total), PAYMENT_LIST, PAYMENT_EXPORT, 'payments')
+
 def payment_mass_delete(request):
     if request.method == "POST":
         fallback = request.POST['fallback']
-        paymentList = request.POST['paymentList']
-        paymentList = paymentList.split(',')
-        for l in paymentList:
-            l = int(l)
-            payment = Payment.objects.get(pk=l)
-            payment.delete()
+        try:
+            bulk_delete(Payment, request.POST['paymentList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect(fallback)
 
     
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_projectbudget_is_active'),
+        ('quotes', '0002_quote_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='quote',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='projects', to='quotes.quote'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 08:42
+
+from django.db import migrations, models
+from django.db.models import Sum, Q
+
+
+def populate_rollups(apps, schema_editor):
+    ProjectBudget = apps.get_model('projects', 'ProjectBudget')
+    Timesheet = apps.get_model('activities', 'Timesheet')
+    sums = {
+        budget: (reported or 0, billed or 0)
+        for budget, reported, billed in Timesheet.objects.filter(budget__isnull=False).order_by().values('budget')
+        .annotate(reported=Sum('hours'), billed=Sum('hours', filter=Q(is_billed=True)))
+        .values_list('budget', 'reported', 'billed')
+    }
+    budgets = []
+    for budget in ProjectBudget.objects.filter(pk__in=sums):
+        budget.reported_hours, budget.billed_hours = sums[budget.pk]
+        budgets.append(budget)
+    ProjectBudget.objects.bulk_update(budgets, ['reported_hours', 'billed_hours'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0010_timesheet_rollups'),
+        ('projects', '0004_project_quote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectbudget',
+            name='billed_hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='projectbudget',
+            name='reported_hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,40 @@
 from django.db import models
 from customers.models import Customer
-from django.db.models import Sum
+from django.db.models import Sum, F, OuterRef, Subquery, Value, DecimalField, Case, When
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.contrib.contenttypes.fields import GenericRelation
 from activities.models import Note, Task, Service
 
+BUDGET_FIELDS = ('budget_qty', 'budget_price', 'budget_amount', 'budget_hours', 'budget_reported_hours')
+
+
+class ProjectQuerySet(models.QuerySet):
+
+    def with_budget(self):
+        """
+        Annotate every project with its active budget (the budget `Project.budget` reads):
+        qty, price, amount (qty * price), budget hours (qty, hourly services only) and the hours
+        reported on it (the budget's timesheet rollup). Project.budget_figures reads these instead
+        of querying per project.
+        """
+        money = DecimalField(max_digits=20, decimal_places=2)
+        active_budget = ProjectBudget.objects.filter(project=OuterRef('pk'), is_active=True).order_by('-created_at', '-id')
+
+        def budget_value(expression):
+            subquery = Subquery(active_budget.annotate(value=expression).values('value')[:1], output_field=money)
+            return Coalesce(subquery, Value(0), output_field=money)
+
+        return self.annotate(
+            budget_qty=budget_value(F('qty')),
+            budget_price=budget_value(F('price')),
+            budget_amount=budget_value(F('qty') * F('price')),
+            budget_reported_hours=budget_value(F('reported_hours')),
+        ).annotate(
+            budget_hours=Case(When(service__budget_type='fix', then=Value(0)), default=F('budget_qty'), output_field=money),
+        )
+
+
 class Project(models.Model):
 
     STATUSES = (
@@ -18,6 +49,8 @@ class Project(models.Model):
     status = models.CharField(max_length=255, choices=STATUSES, default='open')
 
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='projects')
+    # The confirmed quote this project was created from
+    quote = models.ForeignKey('quotes.Quote', on_delete=models.SET_NULL, null=True, blank=True, related_name='projects')
     notes = GenericRelation(Note, related_query_name='notes')
     tasks = GenericRelation(Task, related_query_name='tasks')
 
@@ -27,6 +60,8 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         verbose_name = "פרויקט"
         verbose_name_plural = 'פרויקטים'
@@ -35,46 +70,40 @@ class Project(models.Model):
     def __str__(self):
         return self.name
     
+    @cached_property
+    def budget_figures(self):
+        """
+        Active budget figures of the project. Read from the with_budget() annotations when the
+        project came from such a queryset, otherwise fetched with one query.
+        """
+        if all(hasattr(self, field) for field in BUDGET_FIELDS):
+            figures = {field: getattr(self, field) for field in BUDGET_FIELDS}
+        else:
+            figures = Project.objects.with_budget().filter(pk=self.pk).values(*BUDGET_FIELDS).get()
+        hours = figures['budget_hours']
+        used = figures['budget_reported_hours']
+        figures['budget_remaining'] = hours - used
+        figures['budget_percent'] = int(used / hours * 100) if hours else 0
+        return figures
+
     @property
     def budget(self):
-        budgets = self.budgets.filter(project=self, is_active=True).first()
-        amount = 0
-        qty = 0
-        if not budgets:
-            return {
-                'hours': 0,
-                'amount': 0
-            }
-        if self.service.budget_type == 'fix':
-            amount = amount + (budgets.qty * budgets.price)
-        else:
-            qty = qty + budgets.qty
-            amount = amount + (budgets.qty * budgets.price) 
-        
-        budget = {
-            'hours': qty,
-            'amount': amount
+        return {
+            'hours': self.budget_figures['budget_hours'],
+            'amount': self.budget_figures['budget_amount'],
         }
-        return budget
-    
+
     @property
     def usage(self):
-        budget = ProjectBudget.objects.filter(project=self, is_active=True).first()
-        return budget.reported_hours
-    
+        return self.budget_figures['budget_reported_hours']
+
     @property
     def budget_remaining(self):
-        amount = self.budget.get('hours') - self.usage
-        if self.budget.get('hours') == 0:
-            percent = 0
-        else:
-            percent = self.usage / self.budget.get('hours')
-        reminder = {
-            'amount': amount,
-            'percent': int(percent*100),
+        return {
+            'amount': self.budget_figures['budget_remaining'],
+            'percent': self.budget_figures['budget_percent'],
         }
-        return reminder
-    
+
     @property
     def timesheets(self):
         from activities.models import Timesheet
@@ -83,10 +112,7 @@ class Project(models.Model):
 
     @property
     def reported_hours(self):
-        hours = self.timesheets.all().aggregate(Sum('hours'))['hours__sum']
-        if not hours:
-            return 0.00
-        return hours
+        return self.budget_figures['budget_reported_hours']
 
     @property
     def get_drive_folder_link(self):
@@ -122,6 +148,10 @@ class ProjectBudget(models.Model):
     is_active = models.BooleanField(default=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='budgets')
 
+    # Timesheet rollups, maintained by Timesheet.save() and the timesheet post_delete receiver
+    reported_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    billed_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -136,11 +166,3 @@ class ProjectBudget(models.Model):
     @property
     def total_price(self):
         return self.qty * self.price
-    
-    @property
-    def reported_hours(self):
-        timesheets = self.timesheets.all()
-        if not timesheets:
-            return 0.00
-        amount = sum([x.hours for x in timesheets])
-        return amount
@@ -1,11 +1,18 @@
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from urllib.parse import urlencode
-from activities.models import Note, Task
+from activities.models import Task, Timesheet
+from activities.services import note_summary, notes_context
 from .models import Project, ProjectBudget
 from customers.models import Customer
 from .forms import ProjectForm
 from payments.models import Payment
+from django.http import JsonResponse
+from core.bulk import bulk_delete, BulkActionError
+from core.fragments import Fragment
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response
+from core.sections import DetailSections, Section
 
 
 def project_create(request, customerId = None):
@@ -61,72 +68,89 @@ def project_delete(request, pk):
         else:
             return redirect(fallback)
         
+
+PROJECT_SECTIONS = DetailSections(
+    'project-section', 'project',
+    sections={
+        'notes': Section('base/notes.html', notes_context),
+        'tasks': Section('projects/sections/tasks.html', lambda project: {'tasks': project.tasks.all()}),
+        'timesheets': Section('projects/sections/timesheets.html', lambda project: {
+            # The timesheets of the active budget, with the task every row shows
+            'timesheets': Timesheet.objects.filter(budget__project=project, budget__is_active=True).select_related('task'),
+        }, cached=True),
+        'budgets': Section('projects/sections/budgets.html', lambda project: {'budgets': project.budgets.all()}, cached=True),
+        'payments': Section('projects/sections/payments.html', lambda project: {'payments': project.payments.all()}, cached=True),
+    },
+    default='tasks',
+)
+
+
 def project_detail(request, pk):
-    project = Project.objects.get(pk=pk)
-    tagged_note = Note.objects.filter(
-        content_type__model = 'project',
-        object_id = project.id,
-        tagged = True
-    ).first()
+    project = Project.objects.select_related('customer', 'service').with_budget().get(pk=pk)
     context = {
         'project': project,
-        'tagged_note': tagged_note,
+        **note_summary(project),
+        **PROJECT_SECTIONS.page_context(request, project),
     }
     return render(request, 'projects/project-detail.html', context)
 
 
-def project_submit_note(request, pk):
-    project = Project.objects.get(pk = pk)
-    note = Note.objects.create(
-        text = request.POST['note'],
-        content_object = project
-    )
-    base_url = reverse('project-detail', args=(pk,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def project_delete_note(request, noteid):
-    note = Note.objects.get(pk=noteid)
-    project = Project.objects.get(pk=note.object_id)
-    note.delete()
-    base_url = reverse('project-detail', args=(project.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def project_tag_note(request, noteid):
-    # remove tag from all Notes for this Lead
-    note = Note.objects.get(pk=noteid)
-    if note.tagged:
-        note.tagged = False
-    else:
-        all_notes = Note.objects.filter(object_id=note.content_object.id).update(tagged=False)
-        note.tagged = True
-    note.save()
-    base_url = reverse('project-detail', args=(note.content_object.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
+def project_section(request, pk, section):
+    project = Project.objects.get(pk=pk)
+    return PROJECT_SECTIONS.response(request, project, section)
+
+
+PROJECT_LIST = ListSpec(
+    sort_fields=['name', 'status'],
+    search_fields=['name', 'customer__name', 'service__name'],
+    filters={'status': 'status', 'customer': 'customer_id', 'service': 'service_id'},
+)
+
+PROJECT_EXPORT = ExportSpec(
+    columns=[
+        ('מזהה', 'id'),
+        ('שם', 'name'),
+        ('סטטוס', 'status'),
+        ('לקוח', 'customer__name'),
+        ('שירות', 'service__name'),
+        ('תקציב', 'budget_amount'),
+        ('שעות בתקציב', 'budget_hours'),
+        ('שעות מדווחות', 'budget_reported_hours'),
+        ('תאריך יצירה', 'created_at'),
+    ],
+    choices={'status': Project.STATUSES},
+)
+
+# The budget is only annotated for the rows missing from the cache
+PROJECT_ROW = Fragment(
+    'projects/partials/list_row.html', 'project', related=('customer', 'service'),
+    load=lambda: Project.objects.select_related('customer', 'service').with_budget(),
+)
 
 def project_list(request):
-    projects = Project.objects.all()
+    page = paginate_list(request, Project.objects.select_related('customer', 'service'), PROJECT_LIST)
+    page.rows = PROJECT_ROW.render_many(request, page.rows)
+    if is_rows_request(request):
+        return rows_response(request, 'projects/partials/list_rows.html', 'projects', page)
 
     context = {
-        'projects': projects,
+        'projects': page.rows,
+        'page': page,
     }
     return render(request, 'projects/project-list.html', context)
 
 
+def project_export(request):
+    return export_response(request, Project.objects.with_budget(), PROJECT_LIST, PROJECT_EXPORT, 'projects')
+
+
 def project_mass_delete(request):
     if request.method == "POST":
         fallback = request.POST['fallback']
-        projectList = request.POST['projectList']
-        projectList = projectList.split(',')
-        for l in projectList:
-            l = int(l)
-            project = Project.objects.get(pk=l)
-            project.delete()
+        try:
+            bulk_delete(Project, request.POST['projectList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect(fallback)
     
 
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from quotes.models import Quote
+from quotes.services import confirm_quote
+
+
+class Command(BaseCommand):
+    help = 'Confirm quotes in batch: create their customers, projects, budgets and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quote_ids', nargs='*', type=int, help='Quotes to confirm')
+        parser.add_argument('--status', help='Confirm every quote with this status (e.g. sent)')
+
+    def handle(self, *args, **options):
+        if not options['quote_ids'] and not options['status']:
+            raise CommandError('Pass quote ids or --status')
+        quote_ids = list(options['quote_ids'])
+        if options['status']:
+            quote_ids += Quote.objects.filter(status=options['status']).order_by('id').values_list('id', flat=True)
+
+        converted = 0
+        # Every quote is converted in its own transaction, a failing quote doesn't roll back the others
+        for quote_id in dict.fromkeys(quote_ids):
+            try:
+                conversion = confirm_quote(quote_id)
+            except Quote.DoesNotExist:
+                self.stderr.write(f'Quote {quote_id} does not exist')
+                continue
+            if not conversion.created:
+                self.stdout.write(f'Quote {quote_id} already confirmed, skipped')
+                continue
+            converted += 1
+            timings = ', '.join(f'{stage} {ms}ms' for stage, ms in conversion.timings.items())
+            self.stdout.write(f'Quote {quote_id}: {len(conversion.projects)} projects ({timings})')
+
+        self.stdout.write(self.style.SUCCESS(f'Confirmed {converted} quotes'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models import Sum, F
+from core.fragments import touch
+from quotes.models import Quote, Quote_Service
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached subtotal / VAT / total columns of all quotes from their service line items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only verify the cached totals, do not write them')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['subtotal', 'vat_total', 'total_with_vat']
+
+        # One grouped query for the real subtotals of every quote
+        sums = dict(
+            Quote_Service.objects.order_by().values('quote')
+            .annotate(total=Sum(F('qty') * F('price'), output_field=models.DecimalField()))
+            .values_list('quote', 'total')
+        )
+
+        checked = 0
+        stale = []
+        for quote in Quote.objects.only('id', *fields).order_by().iterator(chunk_size=batch_size):
+            checked += 1
+            expected = Quote.calculate_totals(sums.get(quote.id))
+            if (quote.subtotal, quote.vat_total, quote.total_with_vat) != expected:
+                quote.subtotal, quote.vat_total, quote.total_with_vat = expected
+                stale.append(quote)
+
+        if options['check']:
+            if stale:
+                raise CommandError(f'{len(stale)} of {checked} quotes have stale totals')
+            self.stdout.write(self.style.SUCCESS(f'All {checked} quote totals are up to date'))
+            return
+
+        with transaction.atomic():
+            Quote.objects.bulk_update(stale, fields, batch_size=batch_size)
+            touch(Quote, [quote.pk for quote in stale])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(stale)} of {checked} quote totals'))
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 08:29
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum, F
+
+
+def populate_totals(apps, schema_editor):
+    Quote = apps.get_model('quotes', 'Quote')
+    Quote_Service = apps.get_model('quotes', 'Quote_Service')
+    sums = dict(
+        Quote_Service.objects.order_by().values('quote')
+        .annotate(total=Sum(F('qty') * F('price'), output_field=models.DecimalField()))
+        .values_list('quote', 'total')
+    )
+    quotes = []
+    for quote in Quote.objects.all():
+        subtotal = Decimal(sums.get(quote.id) or 0).quantize(Decimal('0.01'))
+        quote.subtotal = subtotal
+        quote.vat_total = (subtotal * Decimal('0.18')).quantize(Decimal('0.01'))
+        quote.total_with_vat = quote.subtotal + quote.vat_total
+        quotes.append(quote)
+    Quote.objects.bulk_update(quotes, ['subtotal', 'vat_total', 'total_with_vat'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='total_with_vat',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='vat_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0002_quote_totals'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quote',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='total_with_vat',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='vat_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+    ]
@@ -1,7 +1,52 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Sum, F, Count, OuterRef
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from activities.models import Note, Task, Service
+from core.aggregates import subquery_aggregate
+from core.fragments import touch_parents
+from core.generic import content_type_of
+
+VAT_RATE = Decimal('0.18')
+
+# Summary group of every quote status in the detail page statistics
+QUOTE_STATUS_GROUPS = {
+    'draft': 'active',
+    'sent': 'active',
+    'won': 'won',
+    'lost': 'lost',
+}
+
+
+class QuoteQuerySet(models.QuerySet):
+
+    def with_notes_count(self):
+        """Annotate the number of notes of every quote (used by the kanban cards)"""
+        quote_type = ContentType.objects.get_for_model(self.model)
+        notes = Note.objects.filter(content_type=quote_type, object_id=OuterRef('pk'))
+        return self.annotate(
+            notes_count=subquery_aggregate(notes, 'object_id', Count('pk'), models.IntegerField()),
+        )
+
+    def statistics(self):
+        """
+        Quote counts and subtotals (total / active / won / lost) from one GROUP BY status query.
+        Works on any owner's generic relation, e.g. lead.quotes.statistics() or customer.quotes.statistics()
+        """
+        stats = {f'{group}_{measure}': 0 for group in ('total', 'active', 'won', 'lost') for measure in ('count', 'price')}
+        rows = self.order_by().values('status').annotate(count=Count('pk'), price=Sum('subtotal'))
+        for row in rows:
+            price = row['price'] or 0
+            stats['total_count'] += row['count']
+            stats['total_price'] += price
+            group = QUOTE_STATUS_GROUPS.get(row['status'])
+            if group:
+                stats[f'{group}_count'] += row['count']
+                stats[f'{group}_price'] += price
+        return stats
+
 
 class Quote(models.Model):
 
@@ -31,9 +76,16 @@ class Quote(models.Model):
     folder_id = models.CharField(max_length=255, null=True, blank=True)
     folder_link = models.CharField(max_length=255, null=True, blank=True)
 
+    # Cached totals, kept in sync by Quote_Service.save()/delete() through update_totals()
+    subtotal = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    vat_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    total_with_vat = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = QuoteQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields = ['content_type', 'object_id']),
@@ -45,26 +97,48 @@ class Quote(models.Model):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def calculate_totals(subtotal):
+        """Return the (subtotal, vat, total with vat) triple for a services subtotal"""
+        subtotal = Decimal(subtotal or 0).quantize(Decimal('0.01'))
+        vat = (subtotal * VAT_RATE).quantize(Decimal('0.01'))
+        return subtotal, vat, subtotal + vat
+
+    def update_totals(self):
+        """
+        Recalculate the cached totals from the service line items with one aggregate query
+        and store them with a single UPDATE, which also touches the quote and its owner so their cached
+        fragments are rendered anew.
+        """
+        subtotal = self.quote_services.aggregate(
+            total = Sum(F('qty') * F('price'), output_field=models.DecimalField())
+        )['total']
+        self.subtotal, self.vat_total, self.total_with_vat = self.calculate_totals(subtotal)
+        Quote.objects.filter(pk=self.pk).update(
+            subtotal = self.subtotal,
+            vat_total = self.vat_total,
+            total_with_vat = self.total_with_vat,
+            updated_at = timezone.now(),
+        )
+        touch_parents(Quote, [self.pk])
+
     @property
     def total_price(self):
-        """Calculate total from sum of all service line items"""
-        tAmount = 0
-        for s in self.quote_services.all():
-            tAmount = tAmount + s.total_price
-        return tAmount
+        """Total of all service line items (cached on the quote row)"""
+        return self.subtotal
 
 
     @property
     def related_to(self):
-        return f'{self.content_object} ({self.content_type.name})'
+        return f'{self.content_object} ({content_type_of(self).name})'
 
     @property
     def vat_amount(self):
-        return float(self.total_price) * 0.18
+        return float(self.vat_total)
 
     @property
     def total_wvat_price(self):
-        return float(self.total_price) + self.vat_amount
+        return float(self.total_with_vat)
 
     @property
     def quote_number(self):
@@ -96,6 +170,17 @@ class Quote_Service(models.Model):
     def __str__(self):
         return f'{self.name} | {self.quote.quote_number}'
 
+    def save(self, *args, update_totals=True, **kwargs):
+        super().save(*args, **kwargs)
+        if update_totals:
+            self.quote.update_totals()
+
+    def delete(self, *args, update_totals=True, **kwargs):
+        result = super().delete(*args, **kwargs)
+        if update_totals:
+            self.quote.update_totals()
+        return result
+
     @property
     def total_price(self):
         return self.qty * self.price
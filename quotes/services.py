@@ -0,0 +1,146 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Prefetch
+
+from core.dedup import find_customer
+from core.fragments import touch
+from customers.models import Customer
+from leads.services import customer_for_lead
+from payments.models import Payment
+from projects.models import Project, ProjectBudget
+from search.index import index_queryset
+from .models import Quote, Quote_Payment, Quote_Service
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteConversion:
+    """Result of confirming a quote: the customer, its projects and how long each stage took"""
+
+    def __init__(self, quote, customer, projects, created):
+        self.quote = quote
+        self.customer = customer
+        self.projects = projects
+        self.created = created
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def _confirmed_customer(quote):
+    """The customer a won quote was confirmed into, looked up without creating anything"""
+    if quote.content_type_id == ContentType.objects.get_for_model(Customer).id:
+        return quote.content_object
+    lead = quote.content_object
+    return find_customer(lead.company_name) if lead else None
+
+
+def _customer_for(quote):
+    """Return the quote's customer, converting the quote's lead into a customer and contact if needed"""
+    if quote.content_type_id == ContentType.objects.get_for_model(Customer).id:
+        return quote.content_object
+
+    customer, contact = customer_for_lead(quote.content_object)
+    return customer
+
+
+def confirm_quote(quote_id):
+    """
+    Confirm a quote in one transaction: create the customer/contact if needed, then one project
+    per service line item with its budget and payments, inserted with one statement per table.
+    Confirming an already converted (or won) quote returns its existing projects without creating anything.
+    """
+    with transaction.atomic():
+        # Lock the quote so two concurrent confirmations can't both convert it
+        quote = (
+            Quote.objects.select_for_update()
+            .select_related('content_type')
+            .get(pk=quote_id)
+        )
+
+        existing = list(quote.projects.select_related('customer'))
+        if existing:
+            conversion = QuoteConversion(quote, existing[0].customer, existing, created=False)
+            logger.info('Quote %s was already confirmed, %s projects', quote.pk, len(existing))
+            return conversion
+        if quote.status == 'won':
+            # Confirmed before projects were linked to their quote (Project.quote), find them by name
+            conversion = QuoteConversion(quote, _confirmed_customer(quote), [], created=False)
+            if conversion.customer is not None:
+                names = [f"{quote.name} - {name}" for name in quote.quote_services.values_list('name', flat=True)]
+                conversion.projects = list(Project.objects.filter(customer=conversion.customer, name__in=names))
+            logger.info('Quote %s was already won, %s projects', quote.pk, len(conversion.projects))
+            return conversion
+
+        conversion = QuoteConversion(quote, None, [], created=True)
+
+        with conversion.stage('load'):
+            quote_services = list(
+                Quote_Service.objects.filter(quote=quote)
+                .prefetch_related(Prefetch('payments', queryset=Quote_Payment.objects.order_by('order', 'id')))
+                .order_by('order', 'id')
+            )
+
+        with conversion.stage('customer'):
+            conversion.customer = _customer_for(quote)
+
+        # Create multiple projects (one per service line item)
+        with conversion.stage('projects'):
+            conversion.projects = Project.objects.bulk_create([
+                Project(
+                    name = f"{quote.name} - {quote_service.name}",
+                    service_id = quote_service.service_id,
+                    status = 'open',
+                    customer = conversion.customer,
+                    quote = quote,
+                )
+                for quote_service in quote_services
+            ])
+
+        with conversion.stage('budgets'):
+            ProjectBudget.objects.bulk_create([
+                ProjectBudget(
+                    project = project,
+                    qty = quote_service.qty,
+                    price = quote_service.price,
+                    is_active = True,
+                    name = quote_service.name
+                )
+                for project, quote_service in zip(conversion.projects, quote_services)
+            ])
+
+        with conversion.stage('payments'):
+            Payment.objects.bulk_create([
+                Payment(
+                    name = payment.name,
+                    service_id = quote_service.service_id,
+                    qty = 1,  # Payments don't have qty in quote
+                    price = payment.price,
+                    project = project,
+                    status = 'draft'
+                )
+                for project, quote_service in zip(conversion.projects, quote_services)
+                for payment in quote_service.payments.all()
+            ])
+
+        with conversion.stage('status'):
+            quote.status = 'won'
+            quote.save(update_fields=['status', 'updated_at'])
+            # The projects, budgets and payments were bulk created without signals, touch the customer showing them
+            touch(Customer, [conversion.customer.pk])
+
+        with conversion.stage('index'):
+            # bulk_create skips the post_save handlers that keep the search index current
+            index_queryset(Project.objects.filter(pk__in=[project.pk for project in conversion.projects]))
+            index_queryset(Customer.objects.filter(pk=conversion.customer.pk))
+
+    logger.info('Confirmed quote %s into %s projects %s', quote.pk, len(conversion.projects), conversion.timings)
+    return conversion
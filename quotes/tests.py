@@ -1,3 +1,97 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 
-# Create your tests here.
+from customers.models import Customer
+from leads.models import Lead
+from payments.models import Payment
+from projects.models import Project
+from .models import Quote, Quote_Payment, Quote_Service
+from .services import confirm_quote
+
+
+def quote_for(owner, **fields):
+    return Quote.objects.create(content_type=ContentType.objects.get_for_model(owner), object_id=owner.pk, **fields)
+
+
+class QuoteTotalsTests(TestCase):
+
+    def setUp(self):
+        self.quote = quote_for(Customer.objects.create(name='Acme', legal_id='1'), name='Website')
+
+    def assertTotals(self, subtotal, vat, total):
+        self.quote.refresh_from_db()
+        self.assertEqual(
+            (self.quote.subtotal, self.quote.vat_total, self.quote.total_with_vat),
+            (Decimal(subtotal), Decimal(vat), Decimal(total)),
+        )
+
+    def test_adding_line_items_updates_the_totals(self):
+        Quote_Service.objects.create(quote=self.quote, name='Design', qty=2, price='1000')
+        Quote_Service.objects.create(quote=self.quote, name='Hosting', qty=3, price='99.99')
+
+        self.assertTotals('2299.97', '413.99', '2713.96')
+
+    def test_editing_and_deleting_line_items_updates_the_totals(self):
+        design = Quote_Service.objects.create(quote=self.quote, name='Design', qty=2, price='1000')
+        hosting = Quote_Service.objects.create(quote=self.quote, name='Hosting', qty=1, price='100')
+
+        design.qty = 1
+        design.save()
+        self.assertTotals('1100', '198', '1298')
+
+        hosting.delete()
+        self.assertTotals('1000', '180', '1180')
+
+        design.delete()
+        self.assertTotals('0', '0', '0')
+
+    def test_large_totals_keep_their_precision(self):
+        Quote_Service.objects.create(quote=self.quote, name='Platform', qty='9999.99', price='99999999.99')
+
+        self.assertTotals('999998999900.00', '179999819982.00', '1179998819882.00')
+
+
+class ConfirmQuoteTests(TestCase):
+
+    def setUp(self):
+        self.lead = Lead.objects.create(first_name='Dana', company_name='Acme', email='dana@acme.com')
+        self.quote = quote_for(self.lead, name='Website')
+        design = Quote_Service.objects.create(quote=self.quote, name='Design', qty=1, price='1000')
+        Quote_Service.objects.create(quote=self.quote, name='Build', qty=2, price='500')
+        Quote_Payment.objects.create(quote=self.quote, quote_service=design, name='Advance', price='500', percent=50)
+
+    def test_creates_the_customer_and_a_project_per_line_item(self):
+        conversion = confirm_quote(self.quote.pk)
+
+        self.assertTrue(conversion.created)
+        self.assertEqual(conversion.customer.name, 'Acme')
+        self.assertEqual(
+            sorted(project.name for project in conversion.projects), ['Website - Build', 'Website - Design'],
+        )
+        self.assertEqual(Payment.objects.filter(project__quote=self.quote).count(), 1)
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.status, 'won')
+
+    def test_confirming_again_returns_the_existing_projects(self):
+        first = confirm_quote(self.quote.pk)
+        again = confirm_quote(self.quote.pk)
+
+        self.assertFalse(again.created)
+        self.assertEqual({p.pk for p in again.projects}, {p.pk for p in first.projects})
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_a_quote_won_before_projects_were_linked_is_not_converted_again(self):
+        customer = Customer.objects.create(name='Acme', legal_id='1')
+        project = Project.objects.create(name='Website - Design', customer=customer)
+        Project.objects.create(name='Website - Other', customer=customer)
+        Quote.objects.filter(pk=self.quote.pk).update(status='won')
+
+        conversion = confirm_quote(self.quote.pk)
+
+        self.assertFalse(conversion.created)
+        self.assertEqual((conversion.customer, conversion.projects), (customer, [project]))
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertFalse(Payment.objects.exists())
+
@@ -1,25 +1,37 @@
 from django.shortcuts import render, redirect
-from django.urls import reverse
-from urllib.parse import urlencode
 from .models import Quote
-from customers.models import Customer
-from contacts.models import Contact
-from projects.models import Project, ProjectBudget
-from payments.models import Payment
 from .forms import QuoteForm, ServiceFormSet, PaymentFormSet, QuoteServiceForm, QuotePaymentForm
 from django.contrib.contenttypes.models import ContentType
-from activities.models import Note
-from django.http import JsonResponse
+from django.db.models import F
+from activities.services import note_summary, notes_context
+from django.http import Http404, JsonResponse
 from django.template.loader import render_to_string
+from core.kanban import kanban_columns, kanban_page, status_counts
+from core.bulk import bulk_delete, BulkActionError
+from core.fragments import Fragment
+from core.listing import ListSpec, paginate_list, is_rows_request, rows_response
+from core.export import ExportSpec, export_response, full_name, generic_label
+from .services import confirm_quote
+from contacts.models import Contact
+from customers.models import Customer
+from leads.models import Lead
+from core.generic import content_type_of
+from core.sections import DetailSections, Section
+
+# Models a quote can be created for, by the model name in the quote-create URL
+QUOTE_OWNERS = {model._meta.model_name: model for model in (Lead, Customer)}
 
 
 def quote_create(request, object_id, content_type):
     form = QuoteForm()
     service_formset = ServiceFormSet()
     payment_formset = PaymentFormSet()
-    content_type_id = ContentType.objects.get(model = content_type).id
-    contentType = ContentType.objects.get_for_id(content_type_id)
-    targetObject = contentType.get_object_for_this_type(pk=object_id)
+    model = QUOTE_OWNERS.get(content_type)
+    if model is None:
+        raise Http404
+    # get_for_model() is served from the content type cache, no query once warm
+    contentType = ContentType.objects.get_for_model(model)
+    targetObject = model.objects.get(pk=object_id)
     if request.method == 'POST':
         form = QuoteForm(request.POST)
         service_formset = ServiceFormSet(request.POST)
@@ -40,7 +52,7 @@ def quote_create(request, object_id, content_type):
             for i, s_form in enumerate(service_formset.forms):
                 if s_form in service_formset.deleted_forms or (s_form.cleaned_data and s_form.cleaned_data.get('DELETE')):
                     if s_form.instance.pk:
-                        s_form.instance.delete()
+                        s_form.instance.delete(update_totals=False)
                     continue
                 
                 # Check if form has data (is valid/bound)
@@ -50,9 +62,12 @@ def quote_create(request, object_id, content_type):
                 service = s_form.save(commit=False)
                 service.quote = quote
                 service.order = i  # Assign order based on formset position
-                service.save()
+                service.save(update_totals=False)
                 service_map_by_index[i] = service
 
+            # Totals are recalculated once after all line items are saved
+            quote.update_totals()
+
             # Save and link payments
             for i, payment_form in enumerate(payment_formset.forms):
                 if payment_form in payment_formset.deleted_forms or (payment_form.cleaned_data and payment_form.cleaned_data.get('DELETE')):
@@ -113,7 +128,7 @@ def quote_edit(request, pk, fallback):
             for i, s_form in enumerate(service_formset.forms):
                 if s_form in service_formset.deleted_forms or (s_form.cleaned_data and s_form.cleaned_data.get('DELETE')):
                     if s_form.instance.pk:
-                        s_form.instance.delete()
+                        s_form.instance.delete(update_totals=False)
                     continue
 
                 if not s_form.is_valid() or not s_form.cleaned_data:
@@ -122,10 +137,13 @@ def quote_edit(request, pk, fallback):
                 service = s_form.save(commit=False)
                 service.quote = quote
                 service.order = i
-                service.save()
+                service.save(update_totals=False)
                 
                 service_map_by_index[i] = service
                 service_map_by_id[str(service.pk)] = service
+
+            # Totals are recalculated once after all line items are saved
+            quote.update_totals()
             
             
             for i, payment_form in enumerate(payment_formset.forms):
@@ -174,7 +192,7 @@ def quote_edit(request, pk, fallback):
         'service_formset': service_formset,
         'payment_formset': payment_formset,
         'form_header': 'עריכת הצעת מחיר',
-        'contentType': quote.content_type,
+        'contentType': content_type_of(quote),
         'targetObject': quote.content_object,
         'quote': quote
     }
@@ -192,92 +210,120 @@ def quote_delete(request, pk):
             return redirect(fallback)
 
 
+QUOTE_SECTIONS = DetailSections(
+    'quote-section', 'quote',
+    sections={
+        'details': Section('quotes/sections/details.html', lambda quote: {
+            'quote_services': quote.quote_services.select_related('service'),
+            'quote_payments': quote.quote_payments.select_related('quote_service'),
+        }, cached=True, versions=('activities.service',)),
+        'notes': Section('base/notes.html', notes_context),
+    },
+    default='details',
+)
+
+
 def quote_detail(request, pk):
     quote = Quote.objects.get(pk=pk)
-    tagged_note = Note.objects.filter(
-        content_type__model = 'quote',
-        object_id = quote.id,
-        tagged = True
-    ).first()
     context = {
         'quote': quote,
-        'tagged_note': tagged_note,
-        'related_to_url': quote.content_type.model + "-detail"
+        **note_summary(quote),
+        **QUOTE_SECTIONS.page_context(request, quote),
+        'related_to_url': content_type_of(quote).model + "-detail"
     }
     return render(request, 'quotes/quote-detail.html', context)
 
 
-def quote_submit_note(request, pk):
-    quote = Quote.objects.get(pk = pk)
-    note = Note.objects.create(
-        text = request.POST['note'],
-        content_object = quote
-    )
-    base_url = reverse('quote-detail', args=(pk,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def quote_delete_note(request, noteid):
-    note = Note.objects.get(pk=noteid)
-    quote = Quote.objects.get(pk=note.object_id)
-    note.delete()
-    base_url = reverse('quote-detail', args=(quote.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
-
-def quote_tag_note(request, noteid):
-    # remove tag from all Notes for this Lead
-    note = Note.objects.get(pk=noteid)
-    if note.tagged:
-        note.tagged = False
-    else:
-        all_notes = Note.objects.filter(object_id=note.content_object.id).update(tagged=False)
-        note.tagged = True
-    note.save()
-    base_url = reverse('quote-detail', args=(note.content_object.id,))
-    query_string = urlencode({'section': 'notes'})
-    url = f'{base_url}?{query_string}'
-    return redirect(url)
+def quote_section(request, pk, section):
+    quote = Quote.objects.get(pk=pk)
+    return QUOTE_SECTIONS.response(request, quote, section)
+
+
+QUOTE_LIST = ListSpec(
+    sort_fields=['id', 'name', 'status', 'subtotal'],
+    search_fields=['name'],
+    filters={'status': 'status'},
+)
+
+QUOTE_EXPORT = ExportSpec(
+    columns=[
+        ('מזהה', 'id'),
+        ('שם', 'name'),
+        ('סטטוס', 'status'),
+        ('שייך ל', 'related_name'),
+        ('סכום', 'subtotal'),
+        ('מע"מ', 'vat_total'),
+        ('סה"כ כולל מע"מ', 'total_with_vat'),
+        ('תאריך יצירה', 'created_at'),
+    ],
+    choices={'status': Quote.STATUSES},
+)
+
+QUOTE_ROW = Fragment('quotes/partials/list_row.html', 'quote', related=('content_object',))
 
 def quote_list(request):
-    quotes = Quote.objects.all()
+    quotes = Quote.objects.prefetch_related('content_object')
+    page = paginate_list(request, quotes, QUOTE_LIST)
+    page.rows = QUOTE_ROW.render_many(request, page.rows)
+    if is_rows_request(request):
+        return rows_response(request, 'quotes/partials/list_rows.html', 'quotes', page)
 
     context = {
-        'quotes': quotes,
+        'quotes': page.rows,
+        'page': page,
     }
     return render(request, 'quotes/quote-list.html', context)
 
+def quote_export(request):
+    quotes = Quote.objects.annotate(related_name=generic_label({
+        Customer: F('name'),
+        Lead: full_name(),
+        Contact: full_name(),
+    }))
+    return export_response(request, quotes, QUOTE_LIST, QUOTE_EXPORT, 'quotes')
+
 def quote_mass_delete(request):
     if request.method == "POST":
         fallback = request.POST['fallback']
-        quoteList = request.POST['quoteList']
-        quoteList = quoteList.split(',')
-        for l in quoteList:
-            l = int(l)
-            quote = Quote.objects.get(pk=l)
-            quote.delete()
+        try:
+            bulk_delete(Quote, request.POST['quoteList'])
+        except BulkActionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         return redirect(fallback)
 
 
 def quote_kanban(request):
-    all_quotes = Quote.objects.all()
-    statuses = Quote.STATUSES
-    status_dir = []
-    for s in statuses:
-        s_count = len(Quote.objects.filter(status=s[0]))
-        status_dir.append(
-            [s[0], s[1], s_count]
-        )
-    quotes = all_quotes
+    quotes = Quote.objects.prefetch_related('content_object').with_notes_count()
+    columns = kanban_columns(quotes, Quote.STATUSES)
+    counts = {column['key']: column['count'] for column in columns}
     context = {
-        'quotes': quotes,
-        'statuses': status_dir
+        'columns': columns,
+        'status_counts': counts,
+        'total_count': sum(counts.values()),
     }
     return render(request, 'quotes/quote-kanban.html', context)
 
 
+def quote_kanban_column(request):
+    """
+    AJAX endpoint to lazy load the next page of cards of a kanban column
+    """
+    status = request.GET.get('status', '')
+    if status not in [s[0] for s in Quote.STATUSES]:
+        return JsonResponse({'error': 'Invalid status'}, status=400)
+    quotes = Quote.objects.prefetch_related('content_object').with_notes_count()
+    try:
+        cards, next_cursor = kanban_page(quotes, status, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    html = ''.join(
+        render_to_string('quotes/partials/kanban_card.html', {'quote': quote}, request=request)
+        for quote in cards
+    )
+    return JsonResponse({'html': html, 'next_cursor': next_cursor, 'has_more': next_cursor is not None})
+
+
 def quote_update_status(request):
     """
     AJAX endpoint to update quote status on drag-drop
@@ -308,22 +354,17 @@ def quote_update_status(request):
             quote = Quote.objects.get(pk=quote_id)
             old_status = quote.status
             quote.status = new_status
-            quote.save()
+            quote.save(update_fields=['status', 'updated_at'])
         except Quote.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Qutoe not found'}, status=404)
 
-        # Calculate updated counts
-        status_counts = {}
-        for status_key, _ in Quote.STATUSES:
-            status_counts[status_key] = Quote.objects.filter(status=status_key).count()
-
-        # Return success with updated counts
+        # Return success with updated counts (single GROUP BY query)
         return JsonResponse({
             'success': True,
             'lead_id': quote_id,
             'old_status': old_status,
             'new_status': new_status,
-            'status_counts': status_counts
+            'status_counts': status_counts(Quote.objects.all(), Quote.STATUSES)
         })
 
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
@@ -334,65 +375,12 @@ def quote_confirm(request, pk):
     Confirm a quote: create customer/contact if needed, then create multiple projects
     (one per service line item) with associated payments
     """
-    quote = Quote.objects.get(pk=pk)
-
-    # Create or get the customer
-    if quote.content_type == ContentType.objects.get_for_model(Customer):
-        customer = quote.content_object
-    else:
-        # Convert lead to customer
-        customer, created = Customer.objects.update_or_create(
-            name = quote.content_object.company_name,
-            defaults= {
-                'lead_source': quote.content_object.lead_source,
-            }
-        )
-        # create or get the contact (if lead)
-        contact, created = Contact.objects.update_or_create(
-            email = quote.content_object.email,
-            phone = quote.content_object.phone,
-            defaults= {
-                'first_name' : quote.content_object.first_name,
-                'last_name': quote.content_object.last_name,
-                'role': quote.content_object.role,
-                'customer': customer,
-                'contact_type' : 'normal'
-            }
-        )
-
-    # Create multiple projects (one per service line item)
-    for quote_service in quote.quote_services.all():
-        project = Project.objects.create(
-            name = f"{quote.name} - {quote_service.name}",
-            service = quote_service.service,
-            status = 'open',
-            customer = customer
-        )
-        # Create budget for each project
-        ProjectBudget.objects.create(
-            project = project,
-            qty = quote_service.qty,
-            price = quote_service.price,
-            is_active = True,
-            name = quote_service.name
-        )
-
-        # Create payments linked to this service's project
-        for payment in quote_service.payments.all():
-            Payment.objects.create(
-                name = payment.name,
-                service = quote_service.service,
-                qty = 1,  # Payments don't have qty in quote
-                price = payment.price,
-                project = project,
-                status = 'draft'
-            )
-
-    # update the quote to won
-    quote.status = 'won'
-    quote.save()
+    conversion = confirm_quote(pk)
+    if conversion.customer is None:
+        # A quote won before projects were linked to it, whose customer can't be found
+        return redirect('quote-detail', pk)
     # go to the customer page
-    return redirect('customer-detail', customer.id)
+    return redirect('customer-detail', conversion.customer.id)
 
 
 def get_service_form_row(request):
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    name = 'search'
+
+    def ready(self):
+        # Keep the search index current on every ORM save / delete of an indexed model or a note
+        from .index import connect_search_signals
+        connect_search_signals()
@@ -0,0 +1,345 @@
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Case, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+
+from .models import SearchEntry
+
+MIN_QUERY_LENGTH = 2
+
+# Full-text structures created by migration 0001, the PostgreSQL expression must match the GIN index
+FTS_TABLE = 'search_searchentry_fts'
+PG_DOCUMENT = (
+    "(setweight(to_tsvector('simple', name), 'A') || "
+    "setweight(to_tsvector('simple', body), 'B') || "
+    "setweight(to_tsvector('simple', notes), 'C'))"
+)
+
+_NIQQUD = re.compile('[\u0591-\u05c7]')
+# Gershayim / geresh inside a word: מנכ"ל, צ'ק
+_ABBREVIATION_MARKS = re.compile('(?<=[\u05d0-\u05ea])["\'\u05f3\u05f4](?=[\u05d0-\u05ea])')
+_FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+_HEBREW_WORD = re.compile('[\u05d0-\u05ea]+')
+# One letter prepositions / conjunctions written attached to the next word: ו ה ב ל מ ש כ
+_HEBREW_PREFIXES = 'והבלמשכ'
+_TOKENS = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """
+    Lowercase, drop niqqud and abbreviation marks and fold Hebrew final letters, so "שָׁלוֹם", "שלום"
+    and a typed prefix "שלו" all share the same form. Applied to the index and the query alike.
+    """
+    text = unicodedata.normalize('NFKC', str(text)).lower()
+    text = _NIQQUD.sub('', text)
+    text = _ABBREVIATION_MARKS.sub('', text)
+    return text.translate(_FINAL_LETTERS)
+
+
+def tokenize(text):
+    return _TOKENS.findall(normalize(text))
+
+
+def document(values, phones=()):
+    """
+    Normalized index text for the values. Hebrew words are also indexed without up to two attached
+    prefixes ("ולקוח" -> "לקוח") and phone numbers as plain digits in local and international form.
+    """
+    words = []
+    for token in tokenize(' '.join(str(value) for value in values if value)):
+        words.append(token)
+        for _ in range(2):
+            if len(token) > 3 and token[0] in _HEBREW_PREFIXES and _HEBREW_WORD.fullmatch(token):
+                token = token[1:]
+                words.append(token)
+    for phone in phones:
+        digits = re.sub(r'\D', '', phone or '')
+        if digits.startswith('972'):
+            words += [digits, '0' + digits[3:]]
+        elif digits.startswith('0'):
+            words += [digits, '972' + digits[1:]]
+        elif digits:
+            words.append(digits)
+    return ' '.join(words)
+
+
+class SearchModel:
+    """
+    How a model is indexed: the detail url, a function returning its display and search text,
+    related rows to load with it and the dependent rows whose entries show its name.
+    """
+
+    def __init__(self, url_name, describe, select_related=(), prefetch_related=(), dependents=None):
+        self.url_name = url_name
+        self.describe = describe
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+        self.dependents = dependents or (lambda obj: [])
+
+
+def _full_name(obj):
+    return ' '.join(part for part in (obj.first_name, obj.last_name) if part)
+
+
+def _describe_lead(lead):
+    return {
+        'title': _full_name(lead),
+        'subtitle': lead.company_name or lead.email or '',
+        'values': [lead.first_name, lead.last_name, lead.email, lead.company_name, lead.role, lead.phone],
+        'phones': [lead.phone],
+    }
+
+
+def _describe_customer(customer):
+    return {
+        'title': customer.name,
+        'subtitle': customer.legal_id,
+        'values': [customer.name, customer.legal_id, customer.website],
+    }
+
+
+def _describe_contact(contact):
+    customer_name = contact.customer.name if contact.customer else ''
+    return {
+        'title': _full_name(contact),
+        'subtitle': customer_name or contact.email or '',
+        'values': [contact.first_name, contact.last_name, contact.email, contact.role, contact.phone, customer_name],
+        'phones': [contact.phone],
+    }
+
+
+def _describe_quote(quote):
+    related = str(quote.content_object) if quote.content_object else ''
+    return {
+        'title': quote.name,
+        'subtitle': f'{quote.quote_number} · {related}' if related else quote.quote_number,
+        'values': [quote.name, quote.quote_number, related],
+    }
+
+
+def _describe_project(project):
+    return {
+        'title': project.name,
+        'subtitle': project.customer.name,
+        'values': [project.name, project.customer.name, project.service.name if project.service else ''],
+    }
+
+
+SEARCH_MODELS = {
+    'leads.lead': SearchModel('lead-detail', _describe_lead, dependents=lambda lead: [lead.quotes.all()]),
+    'customers.customer': SearchModel(
+        'customer-detail', _describe_customer,
+        dependents=lambda customer: [customer.contacts.all(), customer.projects.all(), customer.quotes.all()],
+    ),
+    'contacts.contact': SearchModel('contact-detail', _describe_contact, select_related=['customer']),
+    'quotes.quote': SearchModel('quote-detail', _describe_quote, prefetch_related=['content_object']),
+    'projects.project': SearchModel('project-detail', _describe_project, select_related=['customer', 'service']),
+}
+
+
+# Indexing
+
+def _notes_text(content_type, ids):
+    from activities.models import Note
+
+    notes = defaultdict(list)
+    rows = Note.objects.filter(content_type=content_type, object_id__in=ids).order_by().values_list('object_id', 'text')
+    for object_id, text in rows:
+        notes[object_id].append(text)
+    return notes
+
+
+def index_objects(model, objs):
+    """Replace the search entries of the objects (of one model) with one delete and one bulk insert"""
+    if not objs:
+        return
+    spec = SEARCH_MODELS[model._meta.label_lower]
+    content_type = ContentType.objects.get_for_model(model)
+    ids = [obj.pk for obj in objs]
+    notes = _notes_text(content_type, ids)
+
+    entries = []
+    for obj in objs:
+        described = spec.describe(obj)
+        entries.append(SearchEntry(
+            content_type=content_type,
+            object_id=obj.pk,
+            title=described['title'][:255],
+            subtitle=(described.get('subtitle') or '')[:255],
+            name=document([described['title']]),
+            body=document(described['values'], described.get('phones', ())),
+            notes=document(notes.get(obj.pk, ())),
+        ))
+    with transaction.atomic():
+        SearchEntry.objects.filter(content_type=content_type, object_id__in=ids).delete()
+        SearchEntry.objects.bulk_create(entries)
+
+
+def index_queryset(queryset, batch_size=1000):
+    """Index every row of the queryset in batches, returns the number of indexed rows"""
+    model = queryset.model
+    spec = SEARCH_MODELS[model._meta.label_lower]
+    queryset = queryset.select_related(*spec.select_related).prefetch_related(*spec.prefetch_related).order_by('pk')
+    count = 0
+    batch = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) == batch_size:
+            index_objects(model, batch)
+            count += len(batch)
+            batch = []
+    index_objects(model, batch)
+    return count + len(batch)
+
+
+def unindex(model, ids):
+    SearchEntry.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=ids).delete()
+
+
+def rebuild_index(batch_size=1000):
+    """Drop and rebuild the whole index, returns {model label: indexed rows}"""
+    SearchEntry.objects.all().delete()
+    return {
+        label: index_queryset(apps.get_model(label)._default_manager.all(), batch_size)
+        for label in SEARCH_MODELS
+    }
+
+
+# Signals, keep the index current on every save / delete done through the ORM
+
+def _index_instance(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_queryset(sender._default_manager.filter(pk=instance.pk))
+    for queryset in SEARCH_MODELS[sender._meta.label_lower].dependents(instance):
+        index_queryset(queryset)
+
+
+# Rows deleted and parents of the notes saved or deleted in the current transaction, (un)indexed with one
+# query per model once the transaction commits, so a cascade doesn't reindex a parent for every note and
+# unindex every row on its own
+_pending = threading.local()
+
+
+def _queue(kind, model, pk):
+    if not hasattr(_pending, 'deleted'):
+        _pending.deleted, _pending.note_parents = {}, {}
+    getattr(_pending, kind).setdefault(model, set()).add(pk)
+    # Every change queues the flush, the first to run handles everything collected so far
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    deleted = getattr(_pending, 'deleted', None)
+    if deleted is None:
+        return
+    note_parents = _pending.note_parents
+    del _pending.deleted, _pending.note_parents
+    for model, ids in deleted.items():
+        # Rows left by a rolled back transaction still exist and keep their entries
+        SearchEntry.objects.filter(
+            content_type=ContentType.objects.get_for_model(model), object_id__in=ids,
+        ).exclude(object_id__in=model._default_manager.filter(pk__in=ids).values('pk')).delete()
+    for model, ids in note_parents.items():
+        ids -= deleted.get(model, set())
+        if ids:
+            index_queryset(model._default_manager.filter(pk__in=ids))
+
+
+def _unindex_instance(sender, instance, **kwargs):
+    _queue('deleted', sender, instance.pk)
+
+
+def _index_note_parent(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+    if model is not None and model._meta.label_lower in SEARCH_MODELS:
+        _queue('note_parents', model, instance.object_id)
+
+
+def connect_search_signals():
+    for label in SEARCH_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_index_instance, sender=model, dispatch_uid=f'search-save-{label}')
+        post_delete.connect(_unindex_instance, sender=model, dispatch_uid=f'search-delete-{label}')
+    note = apps.get_model('activities.note')
+    post_save.connect(_index_note_parent, sender=note, dispatch_uid='search-save-note')
+    post_delete.connect(_index_note_parent, sender=note, dispatch_uid='search-delete-note')
+
+
+# Searching
+
+@lru_cache
+def _has_fts5(database):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def _fts5_rows(words, limit):
+    # Every word must match as a prefix, name matches rank above fields and fields above notes
+    match = ' '.join(f'"{word}"*' for word in words)
+    sql = (
+        f'SELECT e.content_type_id, e.object_id, e.title, e.subtitle FROM {FTS_TABLE} '
+        f'JOIN search_searchentry e ON e.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0) LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, limit])
+        return cursor.fetchall()
+
+
+def _postgres_rows(words, limit):
+    tsquery = ' & '.join(f'{word}:*' for word in words)
+    sql = (
+        f'SELECT content_type_id, object_id, title, subtitle FROM search_searchentry '
+        f"WHERE {PG_DOCUMENT} @@ to_tsquery('simple', %s) "
+        f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s)) DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, tsquery, limit])
+        return cursor.fetchall()
+
+
+def _fallback_rows(words, limit):
+    """Substring match for backends without a full-text index"""
+    entries = SearchEntry.objects.all()
+    for word in words:
+        entries = entries.filter(Q(name__contains=word) | Q(body__contains=word) | Q(notes__contains=word))
+    entries = entries.annotate(
+        rank=Case(When(name__contains=words[0], then=Value(0)), default=Value(1))
+    ).order_by('rank', 'title')
+    return entries.values_list('content_type_id', 'object_id', 'title', 'subtitle')[:limit]
+
+
+def search(query, limit=10):
+    """Ranked mixed results for a typeahead query: [{type, type_label, title, subtitle, url}]"""
+    words = tokenize(query)
+    if len(''.join(words)) < MIN_QUERY_LENGTH:
+        return []
+
+    if connection.vendor == 'postgresql':
+        rows = _postgres_rows(words, limit)
+    elif connection.vendor == 'sqlite' and _has_fts5(connection.settings_dict['NAME']):
+        rows = _fts5_rows(words, limit)
+    else:
+        rows = _fallback_rows(words, limit)
+
+    results = []
+    for content_type_id, object_id, title, subtitle in rows:
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        results.append({
+            'type': model._meta.model_name,
+            'type_label': str(model._meta.verbose_name),
+            'title': title,
+            'subtitle': subtitle,
+            'url': reverse(SEARCH_MODELS[model._meta.label_lower].url_name, args=[object_id]),
+        })
+    return results
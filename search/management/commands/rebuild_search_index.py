@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from search.index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the global search index from all leads, customers, contacts, quotes and projects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = rebuild_index(options['batch_size'])
+        summary = ', '.join(f'{count} {label}' for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {summary}'))
@@ -0,0 +1,90 @@
+# Generated by Django 6.0 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.db import migrations, models, OperationalError
+
+FTS_TABLE = 'search_searchentry_fts'
+PG_DOCUMENT = (
+    "(setweight(to_tsvector('simple', name), 'A') || "
+    "setweight(to_tsvector('simple', body), 'B') || "
+    "setweight(to_tsvector('simple', notes), 'C'))"
+)
+
+SQLITE_FTS = [
+    # External content table over search_searchentry, kept in sync by triggers
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, body, notes, content='search_searchentry', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )""",
+    f"""CREATE TRIGGER search_searchentry_ai AFTER INSERT ON search_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, body, notes) VALUES (new.id, new.name, new.body, new.notes);
+    END""",
+    f"""CREATE TRIGGER search_searchentry_ad AFTER DELETE ON search_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, body, notes) VALUES ('delete', old.id, old.name, old.body, old.notes);
+    END""",
+    f"""CREATE TRIGGER search_searchentry_au AFTER UPDATE ON search_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, body, notes) VALUES ('delete', old.id, old.name, old.body, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, name, body, notes) VALUES (new.id, new.name, new.body, new.notes);
+    END""",
+]
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS search_searchentry_ai',
+    'DROP TRIGGER IF EXISTS search_searchentry_ad',
+    'DROP TRIGGER IF EXISTS search_searchentry_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX search_searchentry_document ON search_searchentry USING GIN ({PG_DOCUMENT})')
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQLITE_FTS:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5, search falls back to substring matching
+            for sql in SQLITE_FTS_DROP:
+                schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_searchentry_document')
+    elif vendor == 'sqlite':
+        for sql in SQLITE_FTS_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('name', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('notes', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'רשומת חיפוש',
+                'verbose_name_plural': 'רשומות חיפוש',
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+
+
+class SearchEntry(models.Model):
+    """
+    One row per searchable CRM object. title / subtitle are shown in the results, name / body / notes hold
+    the normalized text (see search.index.normalize) that the full-text index is built on:
+    an FTS5 table on SQLite and a GIN tsvector index on PostgreSQL (migration 0001).
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    name = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    notes = models.TextField(blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'רשומת חיפוש'
+        verbose_name_plural = 'רשומות חיפוש'
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='unique_search_entry'),
+        ]
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,103 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from activities.models import Note
+from customers.models import Customer
+from leads.models import Lead
+from leads.services import ingest_leads
+from quotes.models import Quote, Quote_Service
+from quotes.services import confirm_quote
+from .index import document, search
+from .models import SearchEntry
+
+
+def titles(query):
+    return [(result['type'], result['title']) for result in search(query)]
+
+
+class DocumentTests(TestCase):
+
+    def test_hebrew_prefixes_final_letters_and_phones(self):
+        words = document(['ולקוחות שָׁלוֹם'], phones=['050-1234567']).split()
+
+        self.assertIn('לקוחות', words)
+        self.assertIn('שלומ', words)
+        self.assertIn('0501234567', words)
+        self.assertIn('972501234567', words)
+
+
+class SearchTests(TestCase):
+
+    def test_short_queries_return_nothing(self):
+        Customer.objects.create(name='Acme', legal_id='1')
+
+        self.assertEqual(search('a'), [])
+
+    def test_saved_and_deleted_rows(self):
+        customer = Customer.objects.create(name='Acme Industries', legal_id='514000000')
+
+        self.assertEqual(titles('acm ind'), [('customer', 'Acme Industries')])
+        self.assertEqual(search('514000000')[0]['url'], f'/customers/{customer.pk}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.delete()
+        self.assertEqual(titles('acme'), [])
+
+    def test_notes_make_their_parent_searchable(self):
+        lead = Lead.objects.create(first_name='Dana')
+        with self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.create(content_type=ContentType.objects.get_for_model(lead), object_id=lead.pk, text='Kiwi farm')
+
+        self.assertEqual(titles('kiwi'), [('lead', 'Dana')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        self.assertEqual(titles('kiwi'), [])
+
+    def test_cascades_unindex_once_and_skip_deleted_parents(self):
+        lead_type = ContentType.objects.get_for_model(Lead)
+        for name in ('Dana', 'Ron', 'Avi'):
+            lead = Lead.objects.create(first_name=name)
+            for n in range(3):
+                Note.objects.create(content_type=lead_type, object_id=lead.pk, text=f'Note {n}')
+            Quote.objects.create(content_type=lead_type, object_id=lead.pk, name=f'{name} quote')
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            Lead.objects.all().delete()
+
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(len([query for query in sql if query.startswith('DELETE FROM "search_searchentry"')]), 2)
+        self.assertFalse([query for query in sql if query.startswith('INSERT')])
+        self.assertFalse(SearchEntry.objects.exists())
+
+    def test_rolled_back_deletes_keep_their_entries(self):
+        customer = Customer.objects.create(name='Acme', legal_id='1')
+        try:
+            with transaction.atomic():
+                customer.delete()
+                raise ValueError
+        except ValueError:
+            pass
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Other', legal_id='2').delete()
+
+        self.assertEqual(titles('acme'), [('customer', 'Acme')])
+
+    def test_bulk_ingested_leads_are_searchable(self):
+        ingest_leads([{'first_name': 'Dana', 'phone': '050-1234567'}, {'first_name': 'Ron', 'company_name': 'Zebra'}])
+
+        self.assertEqual(titles('+972501234567'), [('lead', 'Dana')])
+        self.assertEqual(titles('zebra'), [('lead', 'Ron')])
+
+    def test_confirmed_quote_projects_and_customer_are_searchable(self):
+        lead = Lead.objects.create(first_name='Dana', company_name='Zebra')
+        quote = Quote.objects.create(content_type=ContentType.objects.get_for_model(lead), object_id=lead.pk, name='Portal')
+        Quote_Service.objects.create(quote=quote, name='Design', qty=1, price=1000)
+
+        confirm_quote(quote.pk)
+
+        self.assertIn(('project', 'Portal - Design'), titles('portal design'))
+        self.assertIn(('customer', 'Zebra'), titles('zebra'))
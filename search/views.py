@@ -0,0 +1,10 @@
+from django.http import JsonResponse
+from .index import search as search_index
+
+SEARCH_LIMIT = 12
+
+
+def search(request):
+    """Typeahead endpoint, ranked leads / customers / contacts / quotes / projects matching ?q="""
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'query': query, 'results': search_index(query, limit=SEARCH_LIMIT)})
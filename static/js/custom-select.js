@@ -0,0 +1,183 @@
+// Shared Alpine components for the select widgets in customers/widgets.py.
+// The widgets only render their name and selected value; model backed choices are
+// fetched once per page from the versioned select-choices endpoint.
+const selectChoicesRequests = {};
+
+function loadSelectChoices(url) {
+    if (!selectChoicesRequests[url]) {
+        selectChoicesRequests[url] = fetch(url)
+            .then(response => response.json())
+            .then(data => data.choices);
+    }
+    return selectChoicesRequests[url];
+}
+
+const selectNavigation = {
+    navigateDown() { if (this.highlightedIndex < this.filteredOptions.length - 1) { this.highlightedIndex++; } },
+    navigateUp() { if (this.highlightedIndex > 0) { this.highlightedIndex--; } },
+    selectHighlighted() {
+        if (this.highlightedIndex >= 0 && this.highlightedIndex < this.filteredOptions.length) {
+            this.selectOption(this.filteredOptions[this.highlightedIndex]);
+        }
+    },
+    // The hidden select only renders the selected option, add the chosen one before selecting it
+    setHiddenValue(value, label) {
+        const select = this.$refs.hiddenSelect;
+        if (value && !Array.from(select.options).some(opt => opt.value === value)) {
+            select.add(new Option(label, value));
+        }
+        select.value = value;
+    }
+};
+
+document.addEventListener('alpine:init', () => {
+    Alpine.data('customSelect', (config) => ({
+        ...selectNavigation,
+        isOpen: false,
+        searchQuery: config.label,
+        selectedValue: config.value,
+        selectedLabel: config.label,
+        highlightedIndex: -1,
+        options: config.options || [],
+        source: config.source || null,
+        get filteredOptions() {
+            if (!this.searchQuery || this.searchQuery.trim() === '') return this.options;
+            const query = this.searchQuery.toLowerCase();
+            return this.options.filter(opt => opt.label.toLowerCase().includes(query));
+        },
+        init() {
+            // Dynamic options are controlled by the parent Alpine component
+            if (!config.dynamic) return;
+            this.$watch(config.dynamic + '_options', (value) => {
+                if (value) {
+                    this.options = value;
+                    this.source = null;
+                }
+            });
+            this.$watch(config.dynamic + '_selected', (value) => {
+                if (value && value !== this.selectedValue) {
+                    this.updateSelection(value);
+                }
+            });
+        },
+        loadOptions() {
+            if (!this.source) return;
+            const source = this.source;
+            this.source = null;
+            loadSelectChoices(source).then(options => { this.options = options; });
+        },
+        openDropdown() { this.loadOptions(); this.isOpen = true; this.highlightedIndex = -1; this.searchQuery = ''; },
+        closeDropdown() { this.isOpen = false; this.highlightedIndex = -1; if (!this.selectedValue) { this.searchQuery = ''; } else { this.searchQuery = this.selectedLabel; } },
+        selectOption(option) {
+            this.selectedValue = option.value;
+            this.selectedLabel = option.label;
+            this.searchQuery = option.label;
+            this.setHiddenValue(option.value, option.label);
+            this.isOpen = false;
+            this.$refs.hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
+        },
+        clearSelection() {
+            this.selectedValue = '';
+            this.selectedLabel = '';
+            this.searchQuery = '';
+            this.$refs.hiddenSelect.value = '';
+            this.$refs.hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
+        },
+        updateSelection(newValue) {
+            const option = this.options.find(opt => opt.value === String(newValue));
+            if (option) {
+                this.selectedValue = option.value;
+                this.selectedLabel = option.label;
+                this.searchQuery = option.label;
+                this.setHiddenValue(option.value, option.label);
+            }
+        }
+    }));
+
+    Alpine.data('dynamicCustomSelect', (config) => ({
+        ...selectNavigation,
+        isOpen: false,
+        searchQuery: '',
+        selectedValue: config.value,
+        selectedLabel: '',
+        highlightedIndex: -1,
+        options: [],
+        get filteredOptions() {
+            if (!this.searchQuery || this.searchQuery.trim() === '') return this.options;
+            const query = this.searchQuery.toLowerCase();
+            return this.options.filter(opt => opt.label.toLowerCase().includes(query));
+        },
+        init() {
+            // Update selected label from options on init
+            this.updateSelectedLabel();
+        },
+        updateSelectedLabel() {
+            const option = this.options.find(opt => opt.value === this.selectedValue);
+            this.selectedLabel = option ? option.label : '';
+            this.searchQuery = this.selectedLabel;
+        },
+        openDropdown() { this.isOpen = true; this.highlightedIndex = -1; this.searchQuery = ''; },
+        closeDropdown() {
+            this.isOpen = false;
+            this.highlightedIndex = -1;
+            this.searchQuery = this.selectedLabel;
+        },
+        selectOption(option) {
+            this.selectedValue = option.value;
+            this.selectedLabel = option.label;
+            this.searchQuery = option.label;
+            this.setHiddenValue(option.value, option.label);
+            this.isOpen = false;
+            this.$refs.hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
+        },
+        clearSelection() {
+            this.selectedValue = '';
+            this.selectedLabel = '';
+            this.searchQuery = '';
+            this.$refs.hiddenSelect.value = '';
+            this.$refs.hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
+        },
+        updateOptionsFromDOM() {
+            // Called by external JavaScript to update options from DOM select
+            const selectElement = this.$refs.hiddenSelect;
+            const newOptions = [];
+            for (let i = 0; i < selectElement.options.length; i++) {
+                const opt = selectElement.options[i];
+                if (opt.value) {
+                    newOptions.push({ value: opt.value, label: opt.textContent });
+                }
+            }
+            this.options = newOptions;
+            this.updateSelectedLabel();
+        }
+    }));
+
+    Alpine.data('statusSelect', (config) => ({
+        ...selectNavigation,
+        isOpen: false,
+        searchQuery: '',
+        selectedOption: config.options.find(opt => opt.value === config.value) || null,
+        highlightedIndex: -1,
+        options: config.options,
+        get filteredOptions() {
+            if (!this.searchQuery || this.searchQuery.trim() === '') return this.options;
+            const query = this.searchQuery.toLowerCase();
+            return this.options.filter(opt => opt.label.toLowerCase().includes(query));
+        },
+        openDropdown() { this.isOpen = true; this.highlightedIndex = -1; },
+        closeDropdown() { this.isOpen = false; this.highlightedIndex = -1; this.searchQuery = ''; },
+        selectOption(option) {
+            this.selectedOption = option;
+            this.setHiddenValue(option.value, option.label);
+            this.isOpen = false;
+            this.searchQuery = '';
+            this.$refs.hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
+        },
+        clearSelection() {
+            this.selectedOption = null;
+            this.searchQuery = '';
+            this.$refs.hiddenSelect.value = '';
+            this.$refs.hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+    }));
+});
@@ -0,0 +1,35 @@
+// Sidebar typeahead over the search endpoint (search/views.py). Requests are debounced in the
+// template and a response is only applied when it belongs to the latest query.
+document.addEventListener('alpine:init', () => {
+    Alpine.data('globalSearch', (url) => ({
+        query: '',
+        results: [],
+        isOpen: false,
+        highlightedIndex: -1,
+        latestQuery: '',
+        search() {
+            const query = this.query.trim();
+            this.latestQuery = query;
+            if (query.length < 2) {
+                this.results = [];
+                this.isOpen = false;
+                return;
+            }
+            fetch(`${url}?${new URLSearchParams({q: query})}`, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+                .then(response => response.json())
+                .then(data => {
+                    if (data.query !== this.latestQuery) return;
+                    this.results = data.results;
+                    this.highlightedIndex = data.results.length ? 0 : -1;
+                    this.isOpen = true;
+                });
+        },
+        navigateDown() { if (this.highlightedIndex < this.results.length - 1) { this.highlightedIndex++; } },
+        navigateUp() { if (this.highlightedIndex > 0) { this.highlightedIndex--; } },
+        openHighlighted() {
+            const result = this.results[this.highlightedIndex];
+            if (result) { window.location.href = result.url; }
+        },
+        close() { this.isOpen = false; }
+    }));
+});
@@ -150,17 +150,6 @@ function getCookie(name) {
 
 // Helper function to update status count badges
 function updateStatusCounts(statusCounts) {
-    const statusPills = document.querySelectorAll('span[name="status-count"]');
-
-    // Update each pill by finding the corresponding column
-    statusPills.forEach(function(pill) {
-        // Find the parent column to get the status from its ID
-        const column = pill.closest('.bg-gray-50').querySelector('.status-column');
-        if (column && column.id) {
-            const status = column.id.replace('-column', '');
-            if (statusCounts[status] !== undefined) {
-                pill.textContent = statusCounts[status];
-            }
-        }
-    });
+    // The board handler keeps the counts of the columns (including cards that were not loaded yet)
+    window.dispatchEvent(new CustomEvent('kanban-status-counts', { detail: statusCounts }));
 }
@@ -0,0 +1,93 @@
+// Server side list rows: search, sort and infinite scroll on top of the keyset paginated list views.
+// Merge into the page handler with {...listRows(url), ...}. The initial state comes from the
+// "list-state" json_script rendered by the view, the rows live in the tbody with id "list-rows".
+function listRows(url) {
+    const state = JSON.parse(document.getElementById('list-state').textContent);
+    return {
+        listUrl: url,
+        nextCursor: state.next_cursor,
+        hasMore: state.has_more,
+        totalCount: state.total_count,
+        rowCount: state.row_count,
+        pageSize: String(state.page_size),
+        sort: state.sort,
+        filters: state.filters,
+        searchQuery: state.query,
+        loadingRows: false,
+
+        // Build the rows request for the current search, sort and filters
+        rowsUrl(cursor) {
+            const params = new URLSearchParams(this.filters);
+            params.set('fragment', 'rows');
+            params.set('sort', this.sort);
+            params.set('page_size', this.pageSize);
+            if (this.searchQuery && this.searchQuery.trim() !== '') {
+                params.set('q', this.searchQuery.trim());
+            }
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            return `${this.listUrl}?${params}`;
+        },
+
+        fetchRows(cursor) {
+            this.loadingRows = true;
+            return fetch(this.rowsUrl(cursor), {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+                .then(response => response.json())
+                .then(data => {
+                    this.nextCursor = data.next_cursor;
+                    this.hasMore = data.has_more;
+                    this.loadingRows = false;
+                    return data;
+                })
+                .catch(() => {
+                    this.loadingRows = false;
+                });
+        },
+
+        // Replace the rows (search / sort / page size changed)
+        reloadRows() {
+            this.fetchRows(null).then(data => {
+                if (!data) return;
+                document.getElementById('list-rows').innerHTML = data.html;
+                this.totalCount = data.total_count;
+                this.rowCount = data.row_count;
+            });
+        },
+
+        // Append the next page (infinite scroll)
+        loadMoreRows() {
+            if (!this.hasMore || this.loadingRows) return;
+            this.fetchRows(this.nextCursor).then(data => {
+                if (!data) return;
+                document.getElementById('list-rows').insertAdjacentHTML('beforeend', data.html);
+                this.rowCount += data.row_count;
+            });
+        },
+
+        // Export of the rows matching the current search, sort and filters, only the selected ones if any
+        exportUrl(url, format) {
+            const params = new URLSearchParams(this.filters);
+            params.set('format', format);
+            params.set('sort', this.sort);
+            if (this.searchQuery && this.searchQuery.trim() !== '') {
+                params.set('q', this.searchQuery.trim());
+            }
+            if (this.selectedIds && this.selectedIds.length > 0) {
+                params.set('ids', this.selectedIds.join(','));
+            }
+            return `${url}?${params}`;
+        },
+
+        sortBy(field) {
+            this.sort = this.sort === field ? '-' + field : field;
+            this.reloadRows();
+        },
+
+        sortIndicator(field) {
+            if (this.sort === field) return '▲';
+            if (this.sort === '-' + field) return '▼';
+            return '';
+        }
+    }
+}